@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+# a grant outlives a delete in other worker processes for at most this long;
+# the blob is removed by then or shortly after, so the window stays short
+DRAWING_ACCESS_TTL_SECONDS = int(os.environ.get("DRAWING_ACCESS_TTL_SECONDS", 60))
+DRAWING_ACCESS_MAX_ENTRIES = int(os.environ.get("DRAWING_ACCESS_MAX_ENTRIES", 50000))
+
+
+@dataclass(frozen=True)
+class DrawingFile:
+    """What serving a drawing's file needs, detached from any session."""
+
+    drawingId: int
+    filePath: str
+
+
+class DrawingAccessCache:
+    """LRU cache of granted (user, drawing) file accesses.
+
+    Only grants are cached; a denied or missing drawing is looked up again
+    on every request. Entries expire after the TTL and are dropped at once
+    when their drawing is deleted in this process.
+    """
+
+    def __init__(self, ttlSeconds: int, maxEntries: int):
+        self.ttlSeconds = ttlSeconds
+        self.maxEntries = maxEntries
+        self._entries: OrderedDict[tuple[int, int], tuple[DrawingFile, float]] = (
+            OrderedDict()
+        )
+        self._byDrawing: dict[int, set[int]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, userId: int, drawingId: int) -> DrawingFile | None:
+        key = (userId, drawingId)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            drawingFile, expiresAt = entry
+            if expiresAt <= now:
+                self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return drawingFile
+
+    def put(self, userId: int, drawingFile: DrawingFile) -> None:
+        if self.maxEntries <= 0:
+            return
+        key = (userId, drawingFile.drawingId)
+        expiresAt = time.monotonic() + self.ttlSeconds
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (drawingFile, expiresAt)
+            self._byDrawing.setdefault(drawingFile.drawingId, set()).add(userId)
+            while len(self._entries) > self.maxEntries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidateDrawings(self, drawingIds) -> None:
+        with self._lock:
+            for drawingId in drawingIds:
+                for userId in list(self._byDrawing.get(drawingId, ())):
+                    self._drop((userId, drawingId))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._byDrawing.clear()
+
+    def _drop(self, key: tuple[int, int]) -> None:
+        self._entries.pop(key)
+        userId, drawingId = key
+        users = self._byDrawing.get(drawingId)
+        if users is not None:
+            users.discard(userId)
+            if not users:
+                del self._byDrawing[drawingId]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.maxEntries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+drawingAccessCache = DrawingAccessCache(
+    DRAWING_ACCESS_TTL_SECONDS, DRAWING_ACCESS_MAX_ENTRIES
+)
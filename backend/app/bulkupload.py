@@ -0,0 +1,175 @@
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from fastapi import UploadFile
+
+from .uploads import (
+    MAX_UPLOAD_BYTES,
+    UPLOAD_CHUNK_SIZE,
+    StoredUpload,
+    UploadTooLarge,
+    UploadWriter,
+    probeDimensions,
+)
+
+MAX_BULK_FILES = int(os.environ.get("MAX_BULK_FILES", 500))
+# header probes are I/O bound and overlap with streaming the next file
+PROBE_WORKERS = int(os.environ.get("PROBE_WORKERS", 8))
+PROGRESS_TTL_SECONDS = int(os.environ.get("BULK_PROGRESS_TTL_SECONDS", 3600))
+
+_ZIP_SIGNATURE = b"PK\x03\x04"
+
+
+class TooManyFiles(ValueError):
+    pass
+
+
+@dataclass
+class BulkProgress:
+    total: int = 0
+    processed: int = 0
+    failed: int = 0
+    done: bool = False
+    updatedAt: float = field(default_factory=time.monotonic)
+
+
+class ProgressTracker:
+    """In-process progress of bulk uploads, keyed by owner and client id.
+
+    Entries are dropped PROGRESS_TTL_SECONDS after their last update.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._entries: dict[tuple[int, str], BulkProgress] = {}
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float) -> None:
+        expired = [k for k, v in self._entries.items() if now - v.updatedAt > self.ttl]
+        for key in expired:
+            del self._entries[key]
+
+    def start(self, ownerId: int, progressId: str) -> BulkProgress:
+        progress = BulkProgress()
+        with self._lock:
+            self._prune(progress.updatedAt)
+            self._entries[(ownerId, progressId)] = progress
+        return progress
+
+    def get(self, ownerId: int, progressId: str) -> BulkProgress | None:
+        with self._lock:
+            return self._entries.get((ownerId, progressId))
+
+
+progressTracker = ProgressTracker(PROGRESS_TTL_SECONDS)
+
+
+@dataclass
+class BulkItem:
+    fileName: str
+    stored: StoredUpload | None = None
+    width: int | None = None
+    height: int | None = None
+    error: str | None = None
+
+
+def _isZip(fileobj) -> bool:
+    head = fileobj.read(len(_ZIP_SIGNATURE))
+    fileobj.seek(0)
+    return head == _ZIP_SIGNATURE
+
+
+def _listSources(
+    files: list[UploadFile],
+) -> list[tuple[str, object, zipfile.ZipInfo | None]]:
+    # (fileName, file object or open archive, archive member); only the
+    # ZIP central directory is read here
+    sources = []
+    for upload in files:
+        if not _isZip(upload.file):
+            sources.append((upload.filename or "upload", upload.file, None))
+            continue
+        try:
+            archive = zipfile.ZipFile(upload.file)
+        except zipfile.BadZipFile:
+            sources.append((upload.filename or "upload.zip", None, None))
+            continue
+        for info in archive.infolist():
+            name = os.path.basename(info.filename)
+            if info.is_dir() or not name or name.startswith(".") or (
+                info.filename.startswith("__MACOSX/")
+            ):
+                continue
+            sources.append((name, archive, info))
+    if len(sources) > MAX_BULK_FILES:
+        raise TooManyFiles(f"At most {MAX_BULK_FILES} files per bulk upload")
+    return sources
+
+
+def storeEntry(source, info: zipfile.ZipInfo | None, maxBytes: int) -> StoredUpload:
+    if info is not None and info.file_size > maxBytes:
+        # the declared size is checked first; UploadWriter still enforces
+        # the cap on the bytes actually inflated
+        raise UploadTooLarge("File too large")
+    stream = source.open(info) if info is not None else source
+    writer = UploadWriter(maxBytes)
+    try:
+        while True:
+            chunk = stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            writer.write(chunk)
+        return writer.commit()
+    except BaseException:
+        writer.discard()
+        raise
+    finally:
+        if info is not None:
+            stream.close()
+
+
+def storeBulkUpload(
+    files: list[UploadFile],
+    progress: BulkProgress | None = None,
+    maxBytes: int = MAX_UPLOAD_BYTES,
+) -> list[BulkItem]:
+    """Stream every file (or ZIP member) into static/uploads.
+
+    Blocking. Files are stored one after another while their headers are
+    probed for dimensions on a small thread pool. Failures are recorded
+    per item and do not stop the rest of the batch.
+    """
+    progress = progress or BulkProgress()
+    sources = _listSources(files)
+    progress.total = len(sources)
+    progress.updatedAt = time.monotonic()
+
+    items: list[BulkItem] = []
+    probes: list[Future | None] = []
+    with ThreadPoolExecutor(max_workers=PROBE_WORKERS) as probePool:
+        for fileName, source, info in sources:
+            item = BulkItem(fileName=fileName)
+            items.append(item)
+            probes.append(None)
+            try:
+                if source is None:
+                    raise ValueError("Invalid ZIP archive")
+                item.stored = storeEntry(source, info, maxBytes)
+                probes[-1] = probePool.submit(probeDimensions, item.stored.path)
+            except (ValueError, zipfile.BadZipFile, RuntimeError, OSError) as e:
+                item.error = str(e) or type(e).__name__
+                progress.failed += 1
+            progress.processed += 1
+            progress.updatedAt = time.monotonic()
+
+        for item, probe in zip(items, probes):
+            if probe is not None:
+                item.width, item.height = probe.result()
+
+    for source in {id(s): s for _, s, info in sources if info is not None}.values():
+        source.close()
+    return items
@@ -0,0 +1,160 @@
+import heapq
+import itertools
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterable
+
+logger = logging.getLogger("e_eye.cleanup")
+
+CLEANUP_MAX_ATTEMPTS = int(os.environ.get("CLEANUP_MAX_ATTEMPTS", 5))
+CLEANUP_RETRY_BASE_SECONDS = float(os.environ.get("CLEANUP_RETRY_BASE_SECONDS", 1.0))
+
+
+def removePath(path: Path) -> None:
+    # raises on anything but "already gone" so the queue can retry
+    try:
+        if path.is_dir() and not path.is_symlink():
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class CleanupQueue:
+    """Removes files and directories on a background thread.
+
+    Failed removals are retried with exponential backoff up to
+    maxAttempts times, then logged and dropped. A job may carry a skip
+    check that runs right before removal, e.g. to keep an upload that
+    was referenced again after it was queued. Jobs are local paths by
+    default; a job with its own remove callable can target anything else,
+    such as a key in a storage backend.
+    """
+
+    def __init__(self, maxAttempts: int, retryBaseSeconds: float):
+        self.maxAttempts = maxAttempts
+        self.retryBaseSeconds = retryBaseSeconds
+        self._heap: list = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._stopping = False
+        self._busy = False
+        self.removed = 0
+        self.skipped = 0
+        self.retried = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(
+                target=self._run, name="file-cleanup", daemon=True
+            )
+            self._thread.start()
+
+    def enqueue(
+        self,
+        paths: Iterable,
+        skipIf: Callable[[], bool] | None = None,
+        remove: Callable[[object], None] = removePath,
+    ) -> None:
+        now = time.monotonic()
+        with self._cond:
+            for path in paths:
+                if remove is removePath:
+                    path = Path(path)
+                job = (now, next(self._seq), path, skipIf, 1, remove)
+                heapq.heappush(self._heap, job)
+            self._cond.notify()
+        self.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    if self._heap:
+                        wait = self._heap[0][0] - time.monotonic()
+                        if wait <= 0:
+                            break
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+                if self._stopping:
+                    return
+                _due, _seq, path, skipIf, attempt, remove = heapq.heappop(
+                    self._heap
+                )
+                self._busy = True
+            try:
+                self._process(path, skipIf, attempt, remove)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _process(self, path, skipIf, attempt: int, remove) -> None:
+        try:
+            if skipIf is not None and skipIf():
+                self.skipped += 1
+                return
+            remove(path)
+            self.removed += 1
+        except Exception:
+            if attempt >= self.maxAttempts:
+                self.failed += 1
+                logger.exception("giving up on %s after %d attempts", path, attempt)
+                return
+            self.retried += 1
+            due = time.monotonic() + self.retryBaseSeconds * 2 ** (attempt - 1)
+            with self._cond:
+                heapq.heappush(
+                    self._heap,
+                    (due, next(self._seq), path, skipIf, attempt + 1, remove),
+                )
+                self._cond.notify()
+
+    def waitIdle(self, timeout: float | None = None) -> bool:
+        # True once nothing is due or running; jobs waiting on a retry
+        # delay count as pending
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._heap or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def stop(self, timeout: float = 5.0) -> None:
+        # jobs still pending after the timeout are logged and dropped
+        self.waitIdle(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        if self._heap:
+            logger.warning("dropping %d pending file removals", len(self._heap))
+
+    def stats(self) -> dict:
+        with self._cond:
+            pending = len(self._heap)
+        return {
+            "pending": pending,
+            "removed": self.removed,
+            "skipped": self.skipped,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+
+cleanupQueue = CleanupQueue(CLEANUP_MAX_ATTEMPTS, CLEANUP_RETRY_BASE_SECONDS)
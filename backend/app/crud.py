@@ -1,6 +1,11 @@
-from sqlalchemy.orm import Session
-from . import models, schemas
-from argon2 import PasswordHasher, exceptions
+from collections import Counter
+
+from sqlalchemy import bindparam, delete, func, insert, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, joinedload
+from . import models, schemas, search, uploads
+from .passwords import Hasher
+from argon2.exceptions import VerifyMismatchError
 from datetime import datetime, timedelta, UTC
 from typing import Any
 import json
@@ -10,6 +15,7 @@ import hashlib
 import os
 
 from .schemas import ProjectCreate
+from .tokencache import UserSnapshot, tokenCache
 
 JWT_SECRET = os.environ.get("JWT_SECRET", "E-eye")
 if JWT_SECRET == "E-eye":
@@ -23,8 +29,6 @@ if JWT_SECRET == "E-eye":
 JWT_ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTS = 120
 
-Hasher = PasswordHasher()
-
 
 def hashPassword(rawPassword: str) -> str:
     return Hasher.hash(rawPassword)
@@ -33,7 +37,7 @@ def hashPassword(rawPassword: str) -> str:
 def verifyPassword(hashedPassword: str, rawPassword: str) -> bool:
     try:
         return Hasher.verify(hashedPassword, rawPassword)
-    except exceptions.VerifyMismatchError:
+    except VerifyMismatchError:
         return False
     except Exception:
         # Any unexpected error treat as verification failure
@@ -44,8 +48,11 @@ def getUserByEmail(db: Session, email: str) -> models.User | None:
     return db.query(models.User).filter(models.User.email == email).first()
 
 
-def createUser(db: Session, userIn: schemas.UserCreate) -> models.User:
-    hashed = hashPassword(userIn.password)
+def createUser(
+    db: Session, userIn: schemas.UserCreate, hashedPassword: str | None = None
+) -> models.User:
+    # callers on the request path hash in the password pool beforehand
+    hashed = hashedPassword or hashPassword(userIn.password)
     dbUser = models.User(email=userIn.email, hashedPassword=hashed)
     from sqlalchemy.exc import IntegrityError
 
@@ -59,6 +66,13 @@ def createUser(db: Session, userIn: schemas.UserCreate) -> models.User:
     return dbUser
 
 
+def updatePasswordHash(db: Session, userId: int, hashedPassword: str) -> None:
+    db.query(models.User).filter(models.User.id == userId).update(
+        {models.User.hashedPassword: hashedPassword}, synchronize_session=False
+    )
+    db.commit()
+
+
 def _encodeBase64url(data: bytes) -> str:
     encoded = base64.urlsafe_b64encode(data)
     return encoded.rstrip(b"=").decode("ascii")
@@ -124,13 +138,24 @@ def createAccessToken(
     return f"{signingInput}.{signatureEncoded}"
 
 
-def getCurrentUser(token: str, db: Session) -> models.User | str | None:
+def getCachedUser(token: str) -> UserSnapshot | None:
+    # verified before and not yet expired: skip parsing, HMAC and SELECT
+    headerB64, _, rest = token.partition(".")
+    payloadB64, _, signatureB64 = rest.partition(".")
+    if not signatureB64:
+        return None
+    return tokenCache.get(signatureB64, f"{headerB64}.{payloadB64}")
+
+
+def verifyAccessToken(token: str) -> tuple[dict[str, Any], str, str]:
+    """Check format, expiry and signature; return (payload, signature, input)."""
     try:
         parts = token.split(".")
         if len(parts) != 3:
             raise ValueError("Illegal format")
 
         headerB64, payloadB64, signatureB64 = parts
+        signatureInput = f"{headerB64}.{payloadB64}"
 
         header = json.loads(_decodeBase64url(headerB64))
         payload = json.loads(_decodeBase64url(payloadB64))
@@ -143,7 +168,6 @@ def getCurrentUser(token: str, db: Session) -> models.User | str | None:
         if header.get("alg") != "HS256":
             raise ValueError("Illegal format")
 
-        signatureInput = f"{headerB64}.{payloadB64}"
         signature = hmac.new(
             JWT_SECRET.encode("utf-8"), signatureInput.encode("utf-8"), hashlib.sha256
         ).digest()
@@ -151,11 +175,7 @@ def getCurrentUser(token: str, db: Session) -> models.User | str | None:
         if not hmac.compare_digest(signature, _decodeBase64url(signatureB64)):
             raise ValueError("Has been changed")
 
-        sub = payload.get("sub")
-        if sub is None:
-            return None
-
-        return db.query(models.User).filter(models.User.id == sub).first()
+        return payload, signatureB64, signatureInput
     except ValueError:
         # bubble up token-related errors as ValueError
         raise
@@ -164,12 +184,81 @@ def getCurrentUser(token: str, db: Session) -> models.User | str | None:
         raise ValueError("Illegal token")
 
 
+def getCurrentUser(token: str, db: Session) -> UserSnapshot | None:
+    cached = getCachedUser(token)
+    if cached is not None:
+        return cached
+
+    payload, signatureB64, signatureInput = verifyAccessToken(token)
+    sub = payload.get("sub")
+    if sub is None:
+        return None
+
+    user = db.query(models.User).filter(models.User.id == sub).first()
+    if user is None:
+        return None
+
+    snapshot = UserSnapshot.fromUser(user)
+    if snapshot.isActive:
+        tokenCache.put(signatureB64, signatureInput, snapshot, int(payload["exp"]))
+    return snapshot
+
+
+def setUserActive(db: Session, userId: int, isActive: bool) -> models.User | None:
+    user = db.query(models.User).filter(models.User.id == userId).first()
+    if user is None:
+        return None
+    user.isActive = isActive
+    db.commit()
+    db.refresh(user)
+    # cached tokens would otherwise keep a deactivated user signed in
+    tokenCache.invalidateUser(userId)
+    return user
+
+
+def _bumpProjectsVersion(db: Session, ownerId: int) -> None:
+    db.execute(
+        update(models.User)
+        .where(models.User.id == ownerId)
+        .values(projectsVersion=models.User.projectsVersion + 1)
+    )
+
+
+def _bumpDrawingsVersion(db: Session, projectId) -> None:
+    # projectId may also be a scalar subquery
+    db.execute(
+        update(models.Project)
+        .where(models.Project.id == projectId)
+        .values(drawingsVersion=models.Project.drawingsVersion + 1)
+    )
+
+
+def getProjectsVersion(db: Session, ownerId: int) -> int:
+    version = (
+        db.query(models.User.projectsVersion)
+        .filter(models.User.id == ownerId)
+        .scalar()
+    )
+    return version or 0
+
+
+def getOwnerDrawingsVersion(db: Session, ownerId: int) -> tuple[int, int]:
+    # (projectsVersion, sum of drawingsVersion): the first moves whenever
+    # the set of projects changes, the second whenever a drawing does
+    projectsVersion = getProjectsVersion(db, ownerId)
+    drawingsVersion = db.query(
+        func.coalesce(func.sum(models.Project.drawingsVersion), 0)
+    ).filter(models.Project.ownerId == ownerId).scalar()
+    return projectsVersion, drawingsVersion
+
+
 def createProject(
     db: Session, ownerId: int, projectIn: ProjectCreate
 ) -> models.Project:
     project = models.Project(name=projectIn.name, ownerId=ownerId)
 
     db.add(project)
+    _bumpProjectsVersion(db, ownerId)
     db.commit()
     db.refresh(project)
 
@@ -185,6 +274,29 @@ def listProjectsByOwner(db: Session, ownerId: int) -> list[models.Project]:
     )
 
 
+def _keysetPage(query, model, columns, limit, after):
+    # newest first by (createdAt, id); limit + 1 rows tell the caller
+    # whether another page exists
+    if columns is not None:
+        # always load the keyset columns so the next cursor can be built
+        names = list(dict.fromkeys(["id", "createdAt", *columns]))
+        query = query.with_entities(*[getattr(model, name) for name in names])
+    if after is not None:
+        query = query.filter(tuple_(model.createdAt, model.id) < tuple_(*after))
+    return query.order_by(model.createdAt.desc(), model.id.desc()).limit(limit + 1).all()
+
+
+def pageProjectsByOwner(
+    db: Session,
+    ownerId: int,
+    limit: int,
+    after: tuple[datetime, int] | None = None,
+    columns: list[str] | None = None,
+) -> list:
+    query = db.query(models.Project).filter(models.Project.ownerId == ownerId)
+    return _keysetPage(query, models.Project, columns, limit, after)
+
+
 def getProjectByIdAndOwner(
     db: Session, projectId: int, ownerId: int
 ) -> models.Project | None:
@@ -195,6 +307,122 @@ def getProjectByIdAndOwner(
     )
 
 
+# bound on the number of values bound into a single IN (...)
+_IN_CHUNK = 500
+
+
+def _chunks(values: list, size: int = _IN_CHUNK):
+    for i in range(0, len(values), size):
+        yield values[i : i + size]
+
+
+_BLOBS = models.Blob.__table__
+
+
+def _blobsInsert(db: Session):
+    # INSERT ... ON CONFLICT is spelled the same by both dialects
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(_BLOBS)
+    return sqlite.insert(_BLOBS)
+
+
+def _retainBlob(db: Session, filePath: str | None, size: int | None = None) -> None:
+    _retainBlobs(db, [{"filePath": filePath, "size": size}])
+
+
+def _retainBlobs(db: Session, drawingsIn: list[dict]) -> None:
+    """Add one reference per drawing, creating blob rows as needed.
+
+    A single upsert per blob, so concurrent uploads of the same content
+    neither collide on the insert nor lose an increment.
+    """
+    counts = Counter()
+    firstSeen = {}
+    for d in drawingsIn:
+        sha256 = uploads.contentHash(d.get("filePath"))
+        if sha256 is not None:
+            counts[sha256] += 1
+            firstSeen.setdefault(sha256, d)
+    if not counts:
+        return
+    now = datetime.now(UTC)
+    stmt = _blobsInsert(db)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[_BLOBS.c.sha256],
+        set_={"refCount": _BLOBS.c.refCount + stmt.excluded.refCount},
+    )
+    db.execute(
+        stmt,
+        [
+            {
+                "sha256": sha256,
+                "filePath": firstSeen[sha256]["filePath"],
+                "size": firstSeen[sha256].get("size"),
+                "refCount": count,
+                "createdAt": now,
+            }
+            for sha256, count in counts.items()
+        ],
+    )
+
+
+def _releaseBlobs(db: Session, filePaths: list[str]) -> list[str]:
+    """Drop one reference per path; return the paths no longer referenced.
+
+    Must run after the owning drawings are deleted in the same transaction.
+    Counts are decremented in place and a blob row is removed only once
+    its count reaches zero, so a concurrent retain is never lost.
+    """
+    counts = Counter(p for p in filePaths if p)
+    hashes = {p: uploads.contentHash(p) for p in counts}
+    byHash = Counter()
+    for filePath, count in counts.items():
+        if hashes[filePath] is not None:
+            byHash[hashes[filePath]] += count
+    legacy = [p for p in counts if hashes[p] is None]
+
+    unreferenced = []
+    if byHash:
+        db.execute(
+            update(_BLOBS)
+            .where(_BLOBS.c.sha256 == bindparam("blobHash"))
+            .values(refCount=_BLOBS.c.refCount - bindparam("released")),
+            [{"blobHash": h, "released": n} for h, n in byHash.items()],
+        )
+        gone = set()
+        for chunk in _chunks(list(byHash)):
+            gone.update(
+                db.execute(
+                    delete(_BLOBS)
+                    .where(_BLOBS.c.sha256.in_(chunk), _BLOBS.c.refCount <= 0)
+                    .returning(_BLOBS.c.sha256)
+                ).scalars()
+            )
+        unreferenced.extend(p for p in counts if hashes[p] in gone)
+
+    # legacy uploads have no blob row; keep the ones still referenced
+    stillUsed = set()
+    for chunk in _chunks(legacy):
+        stillUsed.update(
+            row.filePath
+            for row in db.query(models.Drawing.filePath)
+            .filter(models.Drawing.filePath.in_(chunk))
+            .distinct()
+        )
+    unreferenced.extend(p for p in legacy if p not in stillUsed)
+    return unreferenced
+
+
+def isFileReferenced(db: Session, filePath: str) -> bool:
+    sha256 = uploads.contentHash(filePath)
+    if sha256 is not None and db.get(models.Blob, sha256) is not None:
+        return True
+    return (
+        db.query(models.Drawing.id).filter(models.Drawing.filePath == filePath).first()
+        is not None
+    )
+
+
 def createDrawing(db: Session, projectId: int, drawingIn: dict) -> models.Drawing:
     drawing = models.Drawing(
         projectId=projectId,
@@ -202,14 +430,121 @@ def createDrawing(db: Session, projectId: int, drawingIn: dict) -> models.Drawin
         filePath=drawingIn.get("filePath"),
         width=drawingIn.get("width"),
         height=drawingIn.get("height"),
+        tileStatus=drawingIn.get("tileStatus"),
         scale=drawingIn.get("scale"),
     )
     db.add(drawing)
+    _retainBlob(db, drawing.filePath, drawingIn.get("size"))
+    _bumpDrawingsVersion(db, projectId)
     db.commit()
     db.refresh(drawing)
     return drawing
 
 
+def createDrawings(
+    db: Session, projectId: int, drawingsIn: list[dict]
+) -> list[models.Drawing]:
+    # one multi-row INSERT ... RETURNING and a single commit for the batch
+    if not drawingsIn:
+        return []
+    rows = [
+        {
+            "projectId": projectId,
+            "name": d.get("name"),
+            "filePath": d.get("filePath"),
+            "width": d.get("width"),
+            "height": d.get("height"),
+            "tileStatus": d.get("tileStatus"),
+            "scale": d.get("scale"),
+        }
+        for d in drawingsIn
+    ]
+    # executemany RETURNING rows are unordered unless asked; created drawings
+    # are reported back in request order
+    stmt = insert(models.Drawing).returning(
+        models.Drawing, sort_by_parameter_order=True
+    )
+    drawings = list(db.scalars(stmt, rows))
+    _retainBlobs(db, drawingsIn)
+    _bumpDrawingsVersion(db, projectId)
+    db.commit()
+    return drawings
+
+
+def importProject(
+    db: Session, ownerId: int, name: str, drawingsIn, batchSize: int = 1000
+) -> tuple[models.Project, int]:
+    """Create a project and its drawings in one transaction.
+
+    drawingsIn may be any iterable of drawing dicts; it is consumed in
+    batches of executemany INSERTs so it never has to fit in memory.
+    """
+    project = models.Project(name=name, ownerId=ownerId)
+    db.add(project)
+    db.flush()
+    count = 0
+    batch = []
+    for d in drawingsIn:
+        batch.append(d)
+        if len(batch) >= batchSize:
+            count += _insertDrawingRows(db, project.id, batch)
+            batch = []
+    if batch:
+        count += _insertDrawingRows(db, project.id, batch)
+    _bumpProjectsVersion(db, ownerId)
+    _bumpDrawingsVersion(db, project.id)
+    db.commit()
+    db.refresh(project)
+    return project, count
+
+
+def _insertDrawingRows(db: Session, projectId: int, drawingsIn: list[dict]) -> int:
+    rows = [
+        {
+            "projectId": projectId,
+            "name": d.get("name"),
+            "filePath": d.get("filePath"),
+            "width": d.get("width"),
+            "height": d.get("height"),
+            "tileStatus": d.get("tileStatus"),
+            "scale": d.get("scale"),
+            "createdAt": d.get("createdAt") or datetime.now(UTC),
+        }
+        for d in drawingsIn
+    ]
+    db.execute(insert(models.Drawing), rows)
+    _retainBlobs(db, drawingsIn)
+    return len(rows)
+
+
+def iterProjectFilePaths(db: Session, projectId: int, batchSize: int = 1000):
+    return db.execute(
+        select(models.Drawing.filePath)
+        .where(models.Drawing.projectId == projectId)
+        .distinct()
+        .order_by(models.Drawing.filePath)
+        .execution_options(yield_per=batchSize)
+    ).scalars()
+
+
+def iterProjectDrawings(db: Session, projectId: int, batchSize: int = 1000):
+    # plain rows streamed in id order, for exports
+    return db.execute(
+        select(
+            models.Drawing.id,
+            models.Drawing.name,
+            models.Drawing.filePath,
+            models.Drawing.width,
+            models.Drawing.height,
+            models.Drawing.scale,
+            models.Drawing.createdAt,
+        )
+        .where(models.Drawing.projectId == projectId)
+        .order_by(models.Drawing.id)
+        .execution_options(yield_per=batchSize)
+    )
+
+
 def listDrawingsByProject(db: Session, projectId: int) -> list[models.Drawing]:
     return (
         db.query(models.Drawing)
@@ -219,36 +554,209 @@ def listDrawingsByProject(db: Session, projectId: int) -> list[models.Drawing]:
     )
 
 
+def pageDrawingsByProject(
+    db: Session,
+    projectId: int,
+    limit: int,
+    after: tuple[datetime, int] | None = None,
+    columns: list[str] | None = None,
+) -> list:
+    query = db.query(models.Drawing).filter(models.Drawing.projectId == projectId)
+    return _keysetPage(query, models.Drawing, columns, limit, after)
+
+
+def setDrawingTiles(db: Session, drawingId: int, tilesIn: dict) -> bool:
+    # returns False when the drawing no longer exists
+    updated = (
+        db.query(models.Drawing)
+        .filter(models.Drawing.id == drawingId)
+        .update(
+            {
+                models.Drawing.tileSize: tilesIn.get("tileSize"),
+                models.Drawing.tileLevels: tilesIn.get("tileLevels"),
+                models.Drawing.tileFormat: tilesIn.get("tileFormat"),
+                models.Drawing.tileStatus: tilesIn.get("tileStatus"),
+            },
+            synchronize_session=False,
+        )
+    )
+    if updated:
+        _bumpDrawingsVersion(
+            db,
+            select(models.Drawing.projectId)
+            .where(models.Drawing.id == drawingId)
+            .scalar_subquery(),
+        )
+    db.commit()
+    return updated > 0
+
+
+def listDrawingsByOwner(
+    db: Session,
+    ownerId: int,
+    limit: int,
+    after: tuple[datetime, int] | None = None,
+    columns: list[str] | None = None,
+) -> list:
+    # one joined query instead of one query per project
+    query = (
+        db.query(models.Drawing)
+        .join(models.Project, models.Drawing.projectId == models.Project.id)
+        .filter(models.Project.ownerId == ownerId)
+    )
+    return _keysetPage(query, models.Drawing, columns, limit, after)
+
+
+def searchByOwner(
+    db: Session,
+    ownerId: int,
+    terms: list[str],
+    limit: int,
+    offset: int = 0,
+    kind: str | None = None,
+) -> list:
+    stmt = search.searchStatement(ownerId, terms, kind, limit + 1, offset)
+    return db.execute(stmt).all()
+
+
 def getDrawingById(db: Session, drawingId: int) -> models.Drawing | None:
-    return db.query(models.Drawing).filter(models.Drawing.id == drawingId).first()
+    # callers check drawing.project.ownerId, so load it in the same query
+    return (
+        db.query(models.Drawing)
+        .options(joinedload(models.Drawing.project))
+        .filter(models.Drawing.id == drawingId)
+        .first()
+    )
+
 
+def getDrawingFile(db: Session, drawingId: int):
+    # (filePath, ownerId) in one narrow query, for file serving
+    return db.execute(
+        select(models.Drawing.filePath, models.Project.ownerId)
+        .join(models.Project, models.Drawing.projectId == models.Project.id)
+        .where(models.Drawing.id == drawingId)
+    ).first()
 
-def deleteDrawing(db: Session, drawingId: int) -> models.Drawing | None:
-    drawing = getDrawingById(db, drawingId=drawingId)
-    if drawing is None:
+
+def deleteDrawing(db: Session, drawingId: int) -> str | None:
+    # return filePath for caller only once no other drawing shares the blob
+    deleted = db.execute(
+        delete(models.Drawing)
+        .where(models.Drawing.id == drawingId)
+        .returning(models.Drawing.filePath, models.Drawing.projectId)
+    ).first()
+    if deleted is None:
+        db.rollback()
         return None
-    # store filePath for caller
-    file_path = drawing.filePath
-    db.delete(drawing)
+    file_path = deleted.filePath
+    _bumpDrawingsVersion(db, deleted.projectId)
+    unreferenced = _releaseBlobs(db, [file_path])
     db.commit()
-    return file_path
-
-
-def deleteProject(db: Session, projectId: int) -> list[str]:
-    # delete all drawings for the project and return file paths to delete
-    drawings = listDrawingsByProject(db, projectId=projectId)
-    file_paths = [d.filePath for d in drawings if d.filePath]
-    for d in drawings:
-        try:
-            db.delete(d)
-        except Exception:
-            pass
-    # delete project itself
-    project = db.query(models.Project).filter(models.Project.id == projectId).first()
-    if project:
-        try:
-            db.delete(project)
-        except Exception:
-            pass
+    return unreferenced[0] if unreferenced else None
+
+
+def deleteProject(
+    db: Session, projectId: int
+) -> tuple[list[int], list[str], list[str]]:
+    """Delete a project with set-based statements in one transaction.
+
+    Returns (drawingIds, unreferenced file paths, upload session ids) so
+    the caller can remove what is left on disk.
+    """
+    drawings = db.execute(
+        delete(models.Drawing)
+        .where(models.Drawing.projectId == projectId)
+        .returning(models.Drawing.id, models.Drawing.filePath)
+    ).all()
+    uploadIds = list(
+        db.execute(
+            delete(models.UploadSession)
+            .where(models.UploadSession.projectId == projectId)
+            .returning(models.UploadSession.id)
+        ).scalars()
+    )
+    ownerId = db.execute(
+        delete(models.Project)
+        .where(models.Project.id == projectId)
+        .returning(models.Project.ownerId)
+    ).scalar()
+    if ownerId is not None:
+        _bumpProjectsVersion(db, ownerId)
+    file_paths = _releaseBlobs(db, [row.filePath for row in drawings])
     db.commit()
-    return file_paths
+    return [row.id for row in drawings], file_paths, uploadIds
+
+
+def createUploadSession(
+    db: Session, projectId: int, ownerId: int, sessionIn: dict
+) -> models.UploadSession:
+    import uuid
+
+    now = datetime.now(UTC)
+    session = models.UploadSession(
+        id=uuid.uuid4().hex,
+        projectId=projectId,
+        ownerId=ownerId,
+        name=sessionIn.get("name"),
+        fileName=sessionIn.get("fileName"),
+        totalSize=sessionIn["totalSize"],
+        chunkSize=sessionIn["chunkSize"],
+        createdAt=now,
+        expiresAt=now + timedelta(seconds=sessionIn["ttlSeconds"]),
+    )
+    db.add(session)
+    db.commit()
+    db.refresh(session)
+    return session
+
+
+def getUploadSession(
+    db: Session, uploadId: str, ownerId: int
+) -> models.UploadSession | None:
+    return (
+        db.query(models.UploadSession)
+        .filter(
+            models.UploadSession.id == uploadId,
+            models.UploadSession.ownerId == ownerId,
+        )
+        .first()
+    )
+
+
+def deleteUploadSession(db: Session, uploadId: str) -> None:
+    db.query(models.UploadSession).filter(
+        models.UploadSession.id == uploadId
+    ).delete(synchronize_session=False)
+    db.commit()
+
+
+def claimUploadSession(db: Session, uploadId: str, ownerId: int, now: datetime) -> bool:
+    # deleting the row is the claim: of concurrent completions only the one
+    # whose delete matched may assemble the upload
+    claimed = db.execute(
+        delete(models.UploadSession).where(
+            models.UploadSession.id == uploadId,
+            models.UploadSession.ownerId == ownerId,
+            models.UploadSession.expiresAt > now.astimezone(UTC).replace(tzinfo=None),
+        )
+    ).rowcount
+    db.commit()
+    return claimed == 1
+
+
+def deleteExpiredUploadSessions(db: Session, now: datetime) -> list[str]:
+    # return ids so the caller can remove their chunk directories
+    # SQLite hands back naive datetimes, so compare in naive UTC
+    cutoff = now.astimezone(UTC).replace(tzinfo=None)
+    expired = [
+        row.id
+        for row in db.query(models.UploadSession.id)
+        .filter(models.UploadSession.expiresAt < cutoff)
+        .all()
+    ]
+    if expired:
+        db.query(models.UploadSession).filter(
+            models.UploadSession.id.in_(expired)
+        ).delete(synchronize_session=False)
+        db.commit()
+    return expired
@@ -0,0 +1,182 @@
+from datetime import datetime
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from . import crud, models, search
+from .tokencache import UserSnapshot, tokenCache
+
+
+async def runDb(db, fn, /, *args, **kwargs):
+    # request handlers call crud through here: a native coroutine when one
+    # is registered, AsyncSession.run_sync otherwise, and in sync mode the
+    # plain crud function in the threadpool
+    if isinstance(db, AsyncSession):
+        native = _NATIVE.get(fn)
+        if native is not None:
+            return await native(db, *args, **kwargs)
+        return await db.run_sync(lambda session: fn(session, *args, **kwargs))
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+
+async def getUserByEmail(db: AsyncSession, email: str) -> models.User | None:
+    result = await db.execute(select(models.User).where(models.User.email == email))
+    return result.scalars().first()
+
+
+async def getCurrentUser(token: str, db: AsyncSession) -> UserSnapshot | None:
+    # same checks as crud.getCurrentUser; only the user lookup is awaited
+    cached = crud.getCachedUser(token)
+    if cached is not None:
+        return cached
+
+    payload, signatureB64, signatureInput = crud.verifyAccessToken(token)
+    sub = payload.get("sub")
+    if sub is None:
+        return None
+    result = await db.execute(select(models.User).where(models.User.id == sub))
+    user = result.scalars().first()
+    if user is None:
+        return None
+
+    snapshot = UserSnapshot.fromUser(user)
+    if snapshot.isActive:
+        tokenCache.put(signatureB64, signatureInput, snapshot, int(payload["exp"]))
+    return snapshot
+
+
+async def getProjectByIdAndOwner(
+    db: AsyncSession, projectId: int, ownerId: int
+) -> models.Project | None:
+    result = await db.execute(
+        select(models.Project).where(
+            models.Project.id == projectId, models.Project.ownerId == ownerId
+        )
+    )
+    return result.scalars().first()
+
+
+async def getProjectsVersion(db: AsyncSession, ownerId: int) -> int:
+    result = await db.execute(
+        select(models.User.projectsVersion).where(models.User.id == ownerId)
+    )
+    return result.scalar() or 0
+
+
+async def getOwnerDrawingsVersion(db: AsyncSession, ownerId: int) -> tuple[int, int]:
+    projectsVersion = await getProjectsVersion(db, ownerId)
+    result = await db.execute(
+        select(func.coalesce(func.sum(models.Project.drawingsVersion), 0)).where(
+            models.Project.ownerId == ownerId
+        )
+    )
+    return projectsVersion, result.scalar()
+
+
+async def getDrawingById(db: AsyncSession, drawingId: int) -> models.Drawing | None:
+    # the project is loaded eagerly: lazy loads are not possible here
+    result = await db.execute(
+        select(models.Drawing)
+        .options(joinedload(models.Drawing.project))
+        .where(models.Drawing.id == drawingId)
+    )
+    return result.scalars().first()
+
+
+async def getDrawingFile(db: AsyncSession, drawingId: int):
+    result = await db.execute(
+        select(models.Drawing.filePath, models.Project.ownerId)
+        .join(models.Project, models.Drawing.projectId == models.Project.id)
+        .where(models.Drawing.id == drawingId)
+    )
+    return result.first()
+
+
+async def getUploadSession(
+    db: AsyncSession, uploadId: str, ownerId: int
+) -> models.UploadSession | None:
+    result = await db.execute(
+        select(models.UploadSession).where(
+            models.UploadSession.id == uploadId,
+            models.UploadSession.ownerId == ownerId,
+        )
+    )
+    return result.scalars().first()
+
+
+async def _keysetPage(db, stmt, model, columns, limit, after):
+    if columns is not None:
+        names = list(dict.fromkeys(["id", "createdAt", *columns]))
+        stmt = stmt.with_only_columns(*[getattr(model, name) for name in names])
+    if after is not None:
+        stmt = stmt.where(tuple_(model.createdAt, model.id) < tuple_(*after))
+    stmt = stmt.order_by(model.createdAt.desc(), model.id.desc()).limit(limit + 1)
+    result = await db.execute(stmt)
+    return list(result.all() if columns is not None else result.scalars().all())
+
+
+async def pageProjectsByOwner(
+    db: AsyncSession,
+    ownerId: int,
+    limit: int,
+    after: tuple[datetime, int] | None = None,
+    columns: list[str] | None = None,
+) -> list:
+    stmt = select(models.Project).where(models.Project.ownerId == ownerId)
+    return await _keysetPage(db, stmt, models.Project, columns, limit, after)
+
+
+async def pageDrawingsByProject(
+    db: AsyncSession,
+    projectId: int,
+    limit: int,
+    after: tuple[datetime, int] | None = None,
+    columns: list[str] | None = None,
+) -> list:
+    stmt = select(models.Drawing).where(models.Drawing.projectId == projectId)
+    return await _keysetPage(db, stmt, models.Drawing, columns, limit, after)
+
+
+async def listDrawingsByOwner(
+    db: AsyncSession,
+    ownerId: int,
+    limit: int,
+    after: tuple[datetime, int] | None = None,
+    columns: list[str] | None = None,
+) -> list:
+    stmt = (
+        select(models.Drawing)
+        .join(models.Project, models.Drawing.projectId == models.Project.id)
+        .where(models.Project.ownerId == ownerId)
+    )
+    return await _keysetPage(db, stmt, models.Drawing, columns, limit, after)
+
+
+async def searchByOwner(
+    db: AsyncSession,
+    ownerId: int,
+    terms: list[str],
+    limit: int,
+    offset: int = 0,
+    kind: str | None = None,
+) -> list:
+    stmt = search.searchStatement(ownerId, terms, kind, limit + 1, offset)
+    return list((await db.execute(stmt)).all())
+
+
+# crud function -> native coroutine with the same (db, ...) signature
+_NATIVE = {
+    crud.getUserByEmail: getUserByEmail,
+    crud.getProjectByIdAndOwner: getProjectByIdAndOwner,
+    crud.getProjectsVersion: getProjectsVersion,
+    crud.getOwnerDrawingsVersion: getOwnerDrawingsVersion,
+    crud.getDrawingById: getDrawingById,
+    crud.getDrawingFile: getDrawingFile,
+    crud.getUploadSession: getUploadSession,
+    crud.pageProjectsByOwner: pageProjectsByOwner,
+    crud.pageDrawingsByProject: pageDrawingsByProject,
+    crud.listDrawingsByOwner: listDrawingsByOwner,
+    crud.searchByOwner: searchByOwner,
+}
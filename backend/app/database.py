@@ -1,11 +1,69 @@
-from sqlalchemy import create_engine
+import os
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./e_eye.db"
+SQLALCHEMY_DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./e_eye.db")
+
+# "sync" runs handlers' queries in the threadpool; "async" uses aiosqlite
+DB_MODE = os.environ.get("DB_MODE", "sync")
+if DB_MODE not in ("sync", "async"):
+    raise ValueError(f"DB_MODE must be 'sync' or 'async', not {DB_MODE!r}")
+
+# applied to every new SQLite connection; WAL lets readers proceed while
+# createDrawing/createProject write, busy_timeout waits instead of
+# failing with "database is locked"
+SQLITE_PRAGMAS = {
+    "journal_mode": os.environ.get("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+    "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+    # negative values are KiB: 64 MiB of page cache per connection
+    "cache_size": int(os.environ.get("SQLITE_CACHE_SIZE", -65536)),
+    "temp_store": os.environ.get("SQLITE_TEMP_STORE", "MEMORY"),
+    # off by default in SQLite; enables ON DELETE CASCADE on new schemas
+    "foreign_keys": os.environ.get("SQLITE_FOREIGN_KEYS", "ON"),
+}
+
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", -1))
+
+_url = make_url(SQLALCHEMY_DATABASE_URL)
+IS_SQLITE = _url.get_backend_name() == "sqlite"
+_IN_MEMORY = IS_SQLITE and _url.database in (None, "", ":memory:")
+
+
+def _engineOptions() -> dict:
+    options = {}
+    if IS_SQLITE:
+        options["connect_args"] = {"check_same_thread": False}
+    if not _IN_MEMORY:
+        # in-memory SQLite uses a per-thread pool that takes no sizing
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=not IS_SQLITE,
+        )
+    return options
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+
+def _applySqlitePragmas(dbapiConnection, connectionRecord) -> None:
+    cursor = dbapiConnection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **_engineOptions())
+if IS_SQLITE:
+    event.listen(engine, "connect", _applySqlitePragmas)
 
 SessionLocal = sessionmaker(
     autoflush=False,
@@ -13,4 +71,44 @@ SessionLocal = sessionmaker(
     bind=engine,
 )
 
-Base = declarative_base()
\ No newline at end of file
+asyncEngine = None
+AsyncSessionLocal = None
+if DB_MODE == "async":
+    try:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        if IS_SQLITE:
+            import aiosqlite  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError("DB_MODE=async requires the aiosqlite package") from e
+
+    ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL") or (
+        SQLALCHEMY_DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    )
+    asyncEngine = create_async_engine(ASYNC_DATABASE_URL, **_engineOptions())
+    if IS_SQLITE:
+        event.listen(asyncEngine.sync_engine, "connect", _applySqlitePragmas)
+    # handlers read attributes after commit without another round trip
+    AsyncSessionLocal = async_sessionmaker(
+        asyncEngine, autoflush=False, expire_on_commit=False
+    )
+
+Base = declarative_base()
+
+
+def describeDatabase() -> dict:
+    """Settings in effect, with pragmas read back from a live connection."""
+    report = {
+        "url": _url.render_as_string(hide_password=True),
+        "mode": DB_MODE,
+        "pool": engine.pool.status(),
+    }
+    if asyncEngine is not None:
+        report["asyncPool"] = asyncEngine.pool.status()
+    if IS_SQLITE:
+        with engine.connect() as conn:
+            report["pragmas"] = {
+                name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+                for name in SQLITE_PRAGMAS
+            }
+    return report
@@ -0,0 +1,214 @@
+import asyncio
+import json
+import os
+import secrets
+from collections import deque
+from dataclasses import dataclass, field
+
+EVENTS_QUEUE_SIZE = int(os.environ.get("EVENTS_QUEUE_SIZE", 256))
+EVENTS_BUFFER_SIZE = int(os.environ.get("EVENTS_BUFFER_SIZE", 4096))
+EVENTS_MAX_SUBSCRIBERS = int(os.environ.get("EVENTS_MAX_SUBSCRIBERS", 1000))
+EVENTS_HEARTBEAT_SECONDS = float(os.environ.get("EVENTS_HEARTBEAT_SECONDS", 15))
+EVENTS_RETRY_MS = int(os.environ.get("EVENTS_RETRY_MS", 3000))
+
+PROJECT_CREATED = "project.created"
+PROJECT_DELETED = "project.deleted"
+DRAWING_CREATED = "drawing.created"
+DRAWINGS_CREATED = "drawings.created"
+DRAWING_DELETED = "drawing.deleted"
+# the client missed events it cannot resume from and must re-fetch
+RESET = "reset"
+
+
+class TooManySubscribers(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    id: str
+    seq: int
+    type: str
+    ownerId: int
+    projectId: int
+    data: dict
+
+
+@dataclass(eq=False)
+class Subscription:
+    ownerId: int
+    projectId: int | None
+    queue: asyncio.Queue
+    # events to replay before the live ones, and the id to reset to when
+    # the requested position is no longer buffered
+    backlog: list[ChangeEvent] = field(default_factory=list)
+    resetId: str | None = None
+
+    def wants(self, event: ChangeEvent) -> bool:
+        return event.ownerId == self.ownerId and (
+            self.projectId is None or event.projectId == self.projectId
+        )
+
+
+class ChangeBroker:
+    """In-process fan-out of committed changes to SSE subscribers.
+
+    Every subscriber gets a bounded queue. One that falls behind is
+    disconnected instead of buffering without limit; its client reconnects
+    with Last-Event-ID and catches up from the ring buffer of recent events.
+
+    Must be used from the event loop thread. Events only reach subscribers
+    connected to the same process.
+    """
+
+    def __init__(
+        self,
+        bufferSize: int = EVENTS_BUFFER_SIZE,
+        queueSize: int = EVENTS_QUEUE_SIZE,
+        maxSubscribers: int = EVENTS_MAX_SUBSCRIBERS,
+    ):
+        # ids from an earlier process cannot be resumed from
+        self._epoch = secrets.token_hex(4)
+        self._seq = 0
+        self._buffer: deque[ChangeEvent] = deque(maxlen=bufferSize)
+        self._queueSize = queueSize
+        self._maxSubscribers = maxSubscribers
+        self._subscribers: dict[int, set[Subscription]] = {}
+        self._count = 0
+        self._published = 0
+        self._dropped = 0
+        self._resets = 0
+
+    def _eventId(self, seq: int) -> str:
+        return f"{self._epoch}-{seq}"
+
+    def publish(
+        self, type: str, ownerId: int, projectId: int, data: dict
+    ) -> ChangeEvent:
+        self._seq += 1
+        event = ChangeEvent(
+            self._eventId(self._seq), self._seq, type, ownerId, projectId, data
+        )
+        self._buffer.append(event)
+        self._published += 1
+        for subscription in list(self._subscribers.get(ownerId, ())):
+            if subscription.wants(event):
+                self._offer(subscription, event)
+        return event
+
+    def _offer(self, subscription: Subscription, event: ChangeEvent) -> None:
+        try:
+            subscription.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # free the queue and leave room for the close marker
+            while not subscription.queue.empty():
+                subscription.queue.get_nowait()
+            subscription.queue.put_nowait(None)
+            self.unsubscribe(subscription)
+            self._dropped += 1
+
+    def _resumeSeq(self, lastEventId: str | None) -> int | None:
+        # the sequence number to replay after, or None when it is unknown
+        # or no longer buffered
+        if lastEventId is None:
+            return self._seq
+        epoch, _, seq = lastEventId.partition("-")
+        if epoch != self._epoch or not seq.isdigit() or int(seq) > self._seq:
+            return None
+        oldest = self._buffer[0].seq if self._buffer else self._seq + 1
+        if int(seq) < oldest - 1:
+            return None
+        return int(seq)
+
+    def checkCapacity(self) -> None:
+        if self._count >= self._maxSubscribers:
+            raise TooManySubscribers("Too many open event streams")
+
+    def subscribe(
+        self, ownerId: int, projectId: int | None = None, lastEventId: str | None = None
+    ) -> Subscription:
+        self.checkCapacity()
+        subscription = Subscription(
+            ownerId, projectId, asyncio.Queue(maxsize=self._queueSize)
+        )
+        after = self._resumeSeq(lastEventId)
+        if after is None:
+            subscription.resetId = self._eventId(self._seq)
+            self._resets += 1
+        else:
+            subscription.backlog = [
+                event
+                for event in self._buffer
+                if event.seq > after and subscription.wants(event)
+            ]
+        # registered before returning, so nothing published in between is
+        # missed by the replay
+        self._subscribers.setdefault(ownerId, set()).add(subscription)
+        self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.ownerId)
+        if subscribers is None or subscription not in subscribers:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[subscription.ownerId]
+        self._count -= 1
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": self._count,
+            "buffered": len(self._buffer),
+            "published": self._published,
+            "dropped": self._dropped,
+            "resets": self._resets,
+        }
+
+
+def formatEvent(event: ChangeEvent) -> str:
+    data = json.dumps(event.data, separators=(",", ":"))
+    return f"id: {event.id}\nevent: {event.type}\ndata: {data}\n\n"
+
+
+async def eventStream(
+    broker: ChangeBroker,
+    ownerId: int,
+    projectId: int | None = None,
+    lastEventId: str | None = None,
+):
+    """text/event-stream body: the replay, then live events and heartbeats.
+
+    Subscribes on the first iteration, so a client that disconnects before
+    the body starts never leaves a subscription behind.
+    """
+    yield f"retry: {EVENTS_RETRY_MS}\n\n"
+    try:
+        subscription = broker.subscribe(ownerId, projectId, lastEventId)
+    except TooManySubscribers:
+        # filled up since the request was admitted; the client retries
+        return
+    try:
+        if subscription.resetId is not None:
+            yield f"id: {subscription.resetId}\nevent: {RESET}\ndata: {{}}\n\n"
+        for event in subscription.backlog:
+            yield formatEvent(event)
+        subscription.backlog = []
+        while True:
+            try:
+                event = await asyncio.wait_for(
+                    subscription.queue.get(), EVENTS_HEARTBEAT_SECONDS
+                )
+            except TimeoutError:
+                # also how a dropped connection gets noticed
+                yield ": ping\n\n"
+                continue
+            if event is None:
+                # fell behind; the client reconnects and resumes
+                return
+            yield formatEvent(event)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+broker = ChangeBroker()
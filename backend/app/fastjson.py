@@ -0,0 +1,50 @@
+import json
+import os
+from operator import itemgetter
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder gives the same bytes
+    orjson = None
+
+# opt-in: list endpoints select plain column tuples and encode them
+# directly instead of validating ORM objects through response_model
+FAST_JSON = os.environ.get("FAST_JSON", "").lower() in ("1", "true", "yes")
+
+
+def dumps(content) -> bytes:
+    """Compact JSON, byte-identical to what FastAPI sends for the schemas."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(
+        jsonable_encoder(content),
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def rowsToDicts(rows: list, columns: list[str]) -> list[dict]:
+    """Dicts keyed in schema order from SQLAlchemy Row tuples.
+
+    Positional access is several times faster than attribute access on
+    Row, so column positions are resolved once per page.
+    """
+    if not rows:
+        return []
+    positions = [rows[0]._fields.index(name) for name in columns]
+    if len(positions) == 1:
+        (name,), (position,) = columns, positions
+        return [{name: row[position]} for row in rows]
+    getter = itemgetter(*positions)
+    return [dict(zip(columns, getter(row))) for row in rows]
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -0,0 +1,48 @@
+import hashlib
+
+from fastapi import Request, Response, status
+
+# API responses are per user and must be revalidated on every use; with
+# a matching ETag the revalidation is a bodyless 304
+PRIVATE_REVALIDATE = "private, no-cache"
+VARY = "Authorization"
+
+
+def listingETag(kind: str, ownerId: int, version, request: Request) -> str:
+    """Weak validator for a listing page, derived from a change version.
+
+    The query string is folded in so each page, limit and projection of
+    the same listing gets its own tag.
+    """
+    raw = f"{kind}:{ownerId}:{version}:{request.url.query}"
+    return f'W/"{hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]}"'
+
+
+def bodyETag(body: bytes) -> str:
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etagMatches(request: Request, etag: str) -> bool:
+    # If-None-Match uses the weak comparison (RFC 9110 13.1.2)
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    wanted = _opaque(etag)
+    return any(_opaque(tag) == wanted for tag in header.split(","))
+
+
+def cacheHeaders(etag: str) -> dict[str, str]:
+    return {"ETag": etag, "Cache-Control": PRIVATE_REVALIDATE, "Vary": VARY}
+
+
+def notModified(etag: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED, headers=cacheHeaders(etag)
+    )
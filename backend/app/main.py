@@ -1,23 +1,112 @@
+import asyncio
+import functools
 import hmac
+import logging
+import re
+from contextlib import asynccontextmanager
+from datetime import datetime, UTC
 
-from fastapi import FastAPI, Depends, HTTPException, status
+import httpx
+
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
+from fastapi.responses import StreamingResponse
 from fastapi import UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
 import os
 from sqlalchemy.orm import Session
 
-from . import models, schemas, crud
-from .database import engine, SessionLocal, Base
+from . import models, schemas, crud, uploads, resumable, tiles, previews, passwords
+from . import pagination, crud_async, bulkupload, cleanup, reconcile, metrics
+from . import httpcache, fastjson, search, events, ratelimit, projectarchive
+from . import storage, accesscache, migrations
+from .crud_async import runDb
+from .tokencache import UserSnapshot, tokenCache
+from .database import engine, SessionLocal, AsyncSessionLocal, DB_MODE, Base
+from .database import asyncEngine, describeDatabase
 from sqlalchemy.exc import IntegrityError
+from pydantic import ValidationError
+from typing import Any, Literal
+
+logger = logging.getLogger("e_eye")
 
 
 Base.metadata.create_all(bind=engine)
+migrations.upgradeSchema(engine)
+search.installSearchIndex(engine)
+
+
+async def _purgeUploadSessionsPeriodically():
+    while True:
+        try:
+            await run_in_threadpool(resumable.purgeExpiredSessions)
+        except Exception:
+            pass
+        await asyncio.sleep(resumable.UPLOAD_GC_INTERVAL_SECONDS)
 
-app = FastAPI(title="E-eye MVP API")
+
+async def _reconcileUploadsPeriodically():
+    while True:
+        await asyncio.sleep(reconcile.RECONCILE_INTERVAL_SECONDS)
+        try:
+            report = await run_in_threadpool(reconcile.reconcileUploads)
+            logger.info("upload reconcile: %s", report)
+        except Exception:
+            logger.exception("upload reconcile failed")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("database settings: %s", await run_in_threadpool(describeDatabase))
+    tasks = [asyncio.create_task(_purgeUploadSessionsPeriodically())]
+    # reconcile compares static/uploads with the database, which for a
+    # remote backend is only a cache
+    if reconcile.RECONCILE_INTERVAL_SECONDS > 0 and not storage.backend.remote:
+        tasks.append(asyncio.create_task(_reconcileUploadsPeriodically()))
+    cleanup.cleanupQueue.start()
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await run_in_threadpool(cleanup.cleanupQueue.stop)
+        await run_in_threadpool(tiles.shutdown)
+        passwords.passwordPool.shutdown()
+        await storage.backend.close()
+
+
+app = FastAPI(title="E-eye MVP API", lifespan=lifespan)
 authScheme = HTTPBearer(auto_error=False)
 
+def _tokenSubject(token: str) -> int | None:
+    # only the rate-limit key; getCurrentUser still authenticates
+    cached = crud.getCachedUser(token)
+    if cached is not None:
+        return cached.id
+    try:
+        payload, _, _ = crud.verifyAccessToken(token)
+    except ValueError:
+        return None
+    return payload.get("sub")
+
+
+# FastAPI receives and parses a form or JSON body before any dependency
+# runs, so the limited routes that take one are admitted here instead
+app.add_middleware(
+    ratelimit.AdmissionMiddleware,
+    routes={
+        ("POST", "/users"): "auth",
+        ("POST", "/auth/login"): "auth",
+        ("POST", "/projects/{projectId}/drawings/upload"): "upload",
+        ("POST", "/projects/{projectId}/drawings/bulk"): "upload",
+        ("POST", "/projects/import"): "upload",
+    },
+    userKey=_tokenSubject,
+)
+
 # CORS - allow origins from environment (development default for Vite)
 _allowed = os.environ.get("FRONTEND_ORIGINS", "http://localhost:5173")
 allowed_origins = [o.strip() for o in _allowed.split(",") if o.strip()]
@@ -27,26 +116,44 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[pagination.NEXT_CURSOR_HEADER, "ETag"],
 )
+# outermost, so the timing covers every other middleware
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrumentEngine(engine)
+if asyncEngine is not None:
+    metrics.instrumentEngine(asyncEngine.sync_engine)
 
 # serve static files (e.g. uploaded drawings)
-static_dir = os.path.join(os.path.dirname(__file__), "..", "static")
-static_dir = os.path.abspath(static_dir)
+static_dir = str(uploads.STATIC_DIR)
 if not os.path.exists(static_dir):
     try:
-        os.makedirs(os.path.join(static_dir, "uploads"), exist_ok=True)
+        os.makedirs(uploads.UPLOADS_DIR, exist_ok=True)
     except Exception:
         pass
 
-app.mount("/static", StaticFiles(directory=static_dir), name="static")
+# both matched before the /static mount below
+if not uploads.PUBLIC_UPLOADS:
+    app.mount("/static/uploads", PlainTextResponse("Not Found", status_code=404))
+elif storage.backend.remote:
+    app.mount("/static/uploads", storage.RemoteUploads(storage.backend))
+app.mount("/static", uploads.UploadStaticFiles(directory=static_dir), name="static")
 
 
-def getDb():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+if DB_MODE == "async":
+
+    async def getDb():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+else:
+
+    def getDb():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
 
 
 @app.get("/health")
@@ -54,15 +161,151 @@ def healthCheck():
     return {"status": "ok"}
 
 
-@app.post("/users", response_model=schemas.UserOut, status_code=status.HTTP_201_CREATED)
-def registerUser(userIn: schemas.UserCreate, db: Session = Depends(getDb)):
-    dbUser = crud.getUserByEmail(db, email=userIn.email)
+@app.get("/health/database")
+def databaseSettings():
+    return describeDatabase()
+
+
+@app.get("/health/caches")
+def cacheStats():
+    return {
+        "tokenCache": tokenCache.stats(),
+        "passwordPool": passwords.passwordPool.stats(),
+        "previewCache": previews.renditionCache.stats(),
+        "fileCleanup": cleanup.cleanupQueue.stats(),
+        "changeFeed": events.broker.stats(),
+        "rateLimits": ratelimit.stats(),
+        "drawingAccessCache": accesscache.drawingAccessCache.stats(),
+    }
+
+
+def _metricGauges() -> dict[str, float]:
+    gauges = {}
+    sources = {
+        "token_cache": tokenCache.stats(),
+        "password_pool": passwords.passwordPool.stats(),
+        "preview_cache": previews.renditionCache.stats(),
+        "file_cleanup": cleanup.cleanupQueue.stats(),
+        "change_feed": events.broker.stats(),
+        "drawing_access_cache": accesscache.drawingAccessCache.stats(),
+    }
+    for name, stats in ratelimit.stats().items():
+        sources[f"rate_limit_{name}"] = stats
+    for prefix, stats in sources.items():
+        for key, value in stats.items():
+            name = re.sub(r"(?<!^)(?=[A-Z])", "_", key).lower()
+            gauges[f"e_eye_{prefix}_{name}"] = value
+    for prefix, dbEngine in (("db_pool", engine), ("async_db_pool", asyncEngine)):
+        pool = getattr(dbEngine, "pool", None)
+        if hasattr(pool, "checkedout"):
+            gauges[f"e_eye_{prefix}_checked_out"] = pool.checkedout()
+    return gauges
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheusMetrics():
+    return PlainTextResponse(
+        metrics.registry.render(_metricGauges()),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@app.exception_handler(passwords.PasswordPoolBusy)
+async def passwordPoolBusyHandler(request: Request, exc: passwords.PasswordPoolBusy):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(passwords.PASSWORD_RETRY_AFTER_SECONDS)},
+    )
+
+
+@app.exception_handler(ratelimit.RateLimited)
+async def rateLimitedHandler(request: Request, exc: ratelimit.RateLimited):
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retryAfter)},
+    )
+
+
+@app.exception_handler(ratelimit.Overloaded)
+async def overloadedHandler(request: Request, exc: ratelimit.Overloaded):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retryAfter)},
+    )
+
+
+@app.exception_handler(storage.StorageError)
+async def storageErrorHandler(request: Request, exc: storage.StorageError):
+    logger.warning("storage backend error: %s", exc)
+    return JSONResponse(
+        status_code=status.HTTP_502_BAD_GATEWAY,
+        content={"detail": "File storage is unavailable"},
+    )
+
+
+@app.exception_handler(httpx.TransportError)
+async def storageUnreachableHandler(request: Request, exc: httpx.TransportError):
+    logger.warning("storage backend unreachable: %s", exc)
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "File storage is unavailable"},
+        headers={"Retry-After": "1"},
+    )
+
+
+def admission(routeClassName: str):
+    """Route dependency that sheds load for an expensive route class.
+
+    Only for routes without a parsed body (those go through
+    AdmissionMiddleware). Listed in the route's dependencies so it runs
+    before the DB session and user lookup; the concurrency slot is held
+    until the handler ends.
+    """
+    routeClass = ratelimit.ROUTE_CLASSES[routeClassName]
+
+    async def admit(
+        request: Request,
+        credentials: HTTPAuthorizationCredentials = Depends(authScheme),
+    ):
+        if not ratelimit.RATE_LIMITS_ENABLED:
+            yield
+            return
+        clientIp = ratelimit.clientIp(request.headers, request.client)
+        userId = _tokenSubject(credentials.credentials) if credentials else None
+        with routeClass.admit(clientIp, userId):
+            yield
+
+    return Depends(admit)
+
+
+@app.exception_handler(events.TooManySubscribers)
+async def tooManySubscribersHandler(request: Request, exc: events.TooManySubscribers):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(events.EVENTS_RETRY_MS // 1000 or 1)},
+    )
+
+
+@app.post(
+    "/users",
+    response_model=schemas.UserOut,
+    status_code=status.HTTP_201_CREATED,
+)
+async def registerUser(userIn: schemas.UserCreate, db: Session = Depends(getDb)):
+    # shed load before any DB work when the Argon2 pool is saturated
+    passwords.passwordPool.ensureCapacity()
+    dbUser = await runDb(db, crud.getUserByEmail, email=userIn.email)
     if dbUser:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail="Email already registered"
         )
+    hashed = await passwords.hashPasswordAsync(userIn.password)
     try:
-        newUser = crud.createUser(db, userIn)
+        newUser = await runDb(db, crud.createUser, userIn, hashed)
         return newUser
     except IntegrityError:
         # handle race-condition where email was inserted concurrently
@@ -73,10 +316,20 @@ def registerUser(userIn: schemas.UserCreate, db: Session = Depends(getDb)):
 
 
 @app.post("/auth/login")
-def loginUser(userIn: schemas.UserLogin, db: Session = Depends(getDb)):
-    dbUser = crud.getUserByEmail(db, email=userIn.email)
+async def loginUser(userIn: schemas.UserLogin, db: Session = Depends(getDb)):
+    passwords.passwordPool.ensureCapacity()
+    dbUser = await runDb(db, crud.getUserByEmail, email=userIn.email)
 
-    if dbUser and crud.verifyPassword(dbUser.hashedPassword, userIn.password):
+    verified = False
+    if dbUser:
+        verified, newHash = await passwords.verifyPasswordAsync(
+            dbUser.hashedPassword, userIn.password
+        )
+        if verified and newHash:
+            # Argon2 parameters changed since this hash was made
+            await runDb(db, crud.updatePasswordHash, dbUser.id, newHash)
+
+    if verified:
         accessToken = crud.createAccessToken(dbUser)
 
         return {"accessToken": accessToken, "tokenType": "Bearer"}
@@ -87,10 +340,10 @@ def loginUser(userIn: schemas.UserLogin, db: Session = Depends(getDb)):
         )
 
 
-def getCurrentUser(
+async def getCurrentUser(
     credentials: HTTPAuthorizationCredentials = Depends(authScheme),
     db: Session = Depends(getDb),
-) -> models.User:
+) -> UserSnapshot:
     if credentials is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -106,8 +359,33 @@ def getCurrentUser(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token type"
         )
 
+    return await _userFromToken(token, db)
+
+
+async def getStreamUser(
+    accessToken: str | None = None,
+    credentials: HTTPAuthorizationCredentials = Depends(authScheme),
+    db: Session = Depends(getDb),
+) -> UserSnapshot:
+    # EventSource and <img> cannot send headers, so streams and files also
+    # take the token as ?accessToken=
+    if credentials is not None or accessToken is None:
+        return await getCurrentUser(credentials, db)
+    return await _userFromToken(
+        schemas.Token(accessToken=accessToken, tokenType="Bearer"), db
+    )
+
+
+async def _userFromToken(token: schemas.Token, db) -> UserSnapshot:
     try:
-        user = crud.getCurrentUser(token.accessToken, db)
+        user = crud.getCachedUser(token.accessToken)
+        if user is None:
+            if DB_MODE == "async":
+                user = await crud_async.getCurrentUser(token.accessToken, db)
+            else:
+                user = await run_in_threadpool(
+                    crud.getCurrentUser, token.accessToken, db
+                )
     except Exception as e:
         # normalize any parsing/validation error from token handling
         raise HTTPException(
@@ -115,7 +393,11 @@ def getCurrentUser(
             detail=str(e) or "Invalid token",
         )
 
-    if isinstance(user, models.User):
+    if isinstance(user, UserSnapshot):
+        if not user.isActive:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN, detail="Inactive user"
+            )
         return user
 
     # If getCurrentUser returned None, treat as invalid
@@ -126,79 +408,178 @@ def getCurrentUser(
 
 
 @app.get("/me")
-def verifyUser(currentUser: models.User = Depends(getCurrentUser)):
+def verifyUser(currentUser: UserSnapshot = Depends(getCurrentUser)):
     return currentUser
 
 
+@app.post("/users/{userId}/deactivate", response_model=schemas.UserOut)
+async def deactivateUser(
+    userId: int,
+    currentUser: UserSnapshot = Depends(getCurrentUser),
+    db: Session = Depends(getDb),
+):
+    if currentUser.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed")
+    user = await runDb(db, crud.setUserActive, userId=userId, isActive=False)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return user
+
+
 @app.post(
     "/projects/create",
     response_model=schemas.ProjectOut,
     status_code=status.HTTP_201_CREATED,
 )
-def createProject(
+async def createProject(
     projectIn: schemas.ProjectCreate,
-    currentUser: models.User = Depends(getCurrentUser),
+    currentUser: UserSnapshot = Depends(getCurrentUser),
     db: Session = Depends(getDb),
 ):
-    return crud.createProject(db=db, ownerId=currentUser.id, projectIn=projectIn)
+    project = await runDb(
+        db, crud.createProject, ownerId=currentUser.id, projectIn=projectIn
+    )
+    events.broker.publish(
+        events.PROJECT_CREATED,
+        currentUser.id,
+        project.id,
+        {"id": project.id, "name": project.name},
+    )
+    return project
+
+
+def _pageParams(cursor: str | None, fields: str | None, schema) -> tuple:
+    try:
+        after = pagination.decodeCursor(cursor) if cursor else None
+        columns = pagination.parseFields(fields, list(schema.model_fields))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if columns is None and fastjson.FAST_JSON:
+        # a full projection: same fields and order as response_model
+        columns = list(schema.model_fields)
+    return after, columns
+
+
+def _pageResponse(
+    response: Response, rows: list, limit: int, columns, etag: str | None = None
+):
+    nextCursor = pagination.nextCursor(rows, limit)
+    rows = rows[:limit]
+    headers = httpcache.cacheHeaders(etag) if etag else {}
+    if nextCursor:
+        headers[pagination.NEXT_CURSOR_HEADER] = nextCursor
+    if columns is None:
+        response.headers.update(headers)
+        return rows
+    # projected rows skip response_model validation
+    return fastjson.FastJSONResponse(
+        fastjson.rowsToDicts(rows, columns), headers=headers
+    )
+
+
+def _conditionalJSON(request: Request, schema, obj) -> Response:
+    # metadata has no cheap version, so the validator is the body hash;
+    # a 304 still saves the transfer
+    response = JSONResponse(jsonable_encoder(schema.model_validate(obj)))
+    etag = httpcache.bodyETag(response.body)
+    if httpcache.etagMatches(request, etag):
+        return httpcache.notModified(etag)
+    response.headers.update(httpcache.cacheHeaders(etag))
+    return response
 
 
 @app.get("/projects", response_model=list[schemas.ProjectOut])
-def listProjects(
-    currentUser: models.User = Depends(getCurrentUser),
+async def listProjects(
+    request: Request,
+    response: Response,
+    limit: int = pagination.DEFAULT_PAGE_SIZE,
+    cursor: str | None = None,
+    fields: str | None = None,
+    currentUser: UserSnapshot = Depends(getCurrentUser),
     db: Session = Depends(getDb),
 ):
-    return crud.listProjectsByOwner(db=db, ownerId=currentUser.id)
+    limit = pagination.clampLimit(limit)
+    after, columns = _pageParams(cursor, fields, schemas.ProjectOut)
+    # checked before the listing query runs
+    version = await runDb(db, crud.getProjectsVersion, ownerId=currentUser.id)
+    etag = httpcache.listingETag("projects", currentUser.id, version, request)
+    if httpcache.etagMatches(request, etag):
+        return httpcache.notModified(etag)
+    rows = await runDb(
+        db,
+        crud.pageProjectsByOwner,
+        ownerId=currentUser.id,
+        limit=limit,
+        after=after,
+        columns=columns,
+    )
+    return _pageResponse(response, rows, limit, columns, etag)
 
 
 @app.get("/projects/{projectId}", response_model=schemas.ProjectOut)
-def getProject(
+async def getProject(
     projectId: int,
-    currentUser: models.User = Depends(getCurrentUser),
+    request: Request,
+    currentUser: UserSnapshot = Depends(getCurrentUser),
     db: Session = Depends(getDb),
 ):
-    project = crud.getProjectByIdAndOwner(
-        db=db, projectId=projectId, ownerId=currentUser.id
+    project = await runDb(
+        db, crud.getProjectByIdAndOwner, projectId=projectId, ownerId=currentUser.id
     )
     if project is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Project not found"
         )
-    return project
+    return _conditionalJSON(request, schemas.ProjectOut, project)
 
 
 @app.get("/projects/{projectId}/drawings", response_model=list[schemas.DrawingOut])
-def listDrawings(
+async def listDrawings(
     projectId: int,
-    currentUser: models.User = Depends(getCurrentUser),
+    request: Request,
+    response: Response,
+    limit: int = pagination.DEFAULT_PAGE_SIZE,
+    cursor: str | None = None,
+    fields: str | None = None,
+    currentUser: UserSnapshot = Depends(getCurrentUser),
     db: Session = Depends(getDb),
 ):
-    project = crud.getProjectByIdAndOwner(
-        db=db, projectId=projectId, ownerId=currentUser.id
+    project = await runDb(
+        db, crud.getProjectByIdAndOwner, projectId=projectId, ownerId=currentUser.id
     )
     if project is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Project not found"
         )
-    drawings = crud.listDrawingsByProject(db, projectId=projectId)
-    return drawings
+    limit = pagination.clampLimit(limit)
+    after, columns = _pageParams(cursor, fields, schemas.DrawingOut)
+    # the project row already carries the validator; no extra query
+    etag = httpcache.listingETag(
+        f"drawings:{projectId}", currentUser.id, project.drawingsVersion, request
+    )
+    if httpcache.etagMatches(request, etag):
+        return httpcache.notModified(etag)
+    rows = await runDb(
+        db,
+        crud.pageDrawingsByProject,
+        projectId=projectId,
+        limit=limit,
+        after=after,
+        columns=columns,
+    )
+    return _pageResponse(response, rows, limit, columns, etag)
 
 
 @app.get("/drawings/{drawingId}", response_model=schemas.DrawingOut)
-def getDrawing(
+async def getDrawing(
     drawingId: int,
-    currentUser: models.User = Depends(getCurrentUser),
+    request: Request,
+    currentUser: UserSnapshot = Depends(getCurrentUser),
     db: Session = Depends(getDb),
 ):
-    drawing = crud.getDrawingById(db, drawingId=drawingId)
-    if drawing is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Drawing not found"
-        )
     # ensure user owns the project
-    if drawing.project.ownerId != currentUser.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed")
-    return drawing
+    drawing = await _getOwnedDrawing(db, drawingId, currentUser.id)
+    return _conditionalJSON(request, schemas.DrawingOut, drawing)
 
 
 @app.post(
@@ -206,174 +587,904 @@ def getDrawing(
     response_model=schemas.DrawingOut,
     status_code=status.HTTP_201_CREATED,
 )
-def createDrawing(
+async def createDrawing(
     projectId: int,
     drawingIn: schemas.DrawingCreate,
-    currentUser: models.User = Depends(getCurrentUser),
+    currentUser: UserSnapshot = Depends(getCurrentUser),
+    db: Session = Depends(getDb),
+):
+    project = await runDb(
+        db, crud.getProjectByIdAndOwner, projectId=projectId, ownerId=currentUser.id
+    )
+    if project is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Project not found"
+        )
+    drawing = await runDb(
+        db, crud.createDrawing, projectId=projectId, drawingIn=drawingIn.model_dump()
+    )
+    _publishDrawingsCreated(currentUser.id, projectId, [drawing])
+    return drawing
+
+
+MAX_BATCH_DRAWINGS = int(os.environ.get("MAX_BATCH_DRAWINGS", 1000))
+
+
+@app.post(
+    "/projects/{projectId}/drawings/batch",
+    response_model=schemas.DrawingBatchOut,
+    status_code=status.HTTP_201_CREATED,
+)
+async def createDrawingsBatch(
+    projectId: int,
+    drawingsIn: list[dict[str, Any]],
+    currentUser: UserSnapshot = Depends(getCurrentUser),
     db: Session = Depends(getDb),
 ):
-    project = crud.getProjectByIdAndOwner(
-        db=db, projectId=projectId, ownerId=currentUser.id
+    if len(drawingsIn) > MAX_BATCH_DRAWINGS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {MAX_BATCH_DRAWINGS} drawings per batch",
+        )
+    project = await runDb(
+        db, crud.getProjectByIdAndOwner, projectId=projectId, ownerId=currentUser.id
     )
     if project is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Project not found"
         )
-    drawing = crud.createDrawing(
-        db=db, projectId=projectId, drawingIn=drawingIn.model_dump()
+
+    # invalid items are reported by index; the valid ones are still created
+    valid = []
+    errors = []
+    for index, item in enumerate(drawingsIn):
+        try:
+            valid.append(schemas.DrawingCreate.model_validate(item).model_dump())
+        except ValidationError as e:
+            errors.append(
+                schemas.DrawingBatchError(
+                    index=index,
+                    errors=e.errors(
+                        include_url=False, include_context=False, include_input=False
+                    ),
+                )
+            )
+
+    created = await runDb(db, crud.createDrawings, projectId=projectId, drawingsIn=valid)
+    _publishDrawingsCreated(currentUser.id, projectId, created)
+    result = schemas.DrawingBatchOut(created=created, errors=errors)
+    if not created and errors:
+        return JSONResponse(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            content=jsonable_encoder(result),
+        )
+    return result
+
+
+def _publishDrawingsCreated(ownerId: int, projectId: int, drawings: list) -> None:
+    # called after the commit; a batch is a single event
+    if not drawings:
+        return
+    if len(drawings) == 1:
+        drawing = drawings[0]
+        events.broker.publish(
+            events.DRAWING_CREATED,
+            ownerId,
+            projectId,
+            {"id": drawing.id, "projectId": projectId, "name": drawing.name},
+        )
+        return
+    events.broker.publish(
+        events.DRAWINGS_CREATED,
+        ownerId,
+        projectId,
+        {"projectId": projectId, "ids": [drawing.id for drawing in drawings]},
     )
+
+
+async def _getOwnedDrawing(db, drawingId: int, ownerId: int) -> models.Drawing:
+    drawing = await runDb(db, crud.getDrawingById, drawingId=drawingId)
+    if drawing is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Drawing not found"
+        )
+    if drawing.project.ownerId != ownerId:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed")
     return drawing
 
 
-@app.post("/projects/{projectId}/drawings/upload", response_model=schemas.DrawingOut)
+async def _persistUploads(storedUploads: list[uploads.StoredUpload]) -> None:
+    # before the rows are inserted, so no drawing points at a missing blob;
+    # identical files in one batch share a key
+    byKey = {stored.fileName: stored.path for stored in storedUploads}
+    await asyncio.gather(
+        *(storage.backend.put(key, path) for key, path in byKey.items())
+    )
+
+
+def _scheduleTiles(drawing: models.Drawing) -> None:
+    # generated in the process pool; the drawing row is updated when done
+    key = storage.keyForUrl(drawing.filePath)
+    if key is not None and drawing.width and drawing.height:
+        tiles.scheduleTilePyramid(drawing.id, storage.backend.localPath(key))
+
+
+@app.get("/drawings/{drawingId}/tiles", response_model=schemas.TilePyramidOut)
+async def getDrawingTiles(
+    drawingId: int,
+    currentUser: UserSnapshot = Depends(getCurrentUser),
+    db: Session = Depends(getDb),
+):
+    drawing = await _getOwnedDrawing(db, drawingId, currentUser.id)
+    if drawing.tileStatus != tiles.TILE_STATUS_READY:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Tiles not available ({drawing.tileStatus or 'none'})",
+        )
+    return schemas.TilePyramidOut(
+        drawingId=drawing.id,
+        status=drawing.tileStatus,
+        **tiles.describePyramid(
+            drawing.width,
+            drawing.height,
+            drawing.tileSize,
+            drawing.tileLevels,
+            drawing.tileFormat,
+        ),
+    )
+
+
+@app.post("/drawings/{drawingId}/tiles", status_code=status.HTTP_202_ACCEPTED)
+async def regenerateDrawingTiles(
+    drawingId: int,
+    currentUser: UserSnapshot = Depends(getCurrentUser),
+    db: Session = Depends(getDb),
+):
+    drawing = await _getOwnedDrawing(db, drawingId, currentUser.id)
+    key = storage.keyForUrl(drawing.filePath)
+    if key is None or not drawing.width:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Drawing has no image"
+        )
+    # tiles are cut from a local copy
+    if await storage.backend.localCopy(key) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Drawing file missing"
+        )
+    await runDb(
+        db,
+        crud.setDrawingTiles,
+        drawingId=drawing.id,
+        tilesIn={"tileStatus": tiles.TILE_STATUS_PENDING},
+    )
+    _scheduleTiles(drawing)
+    return {"status": tiles.TILE_STATUS_PENDING}
+
+
+@app.get("/drawings/{drawingId}/tiles/{z}/{x}/{y}")
+async def getDrawingTile(
+    drawingId: int,
+    z: int,
+    x: int,
+    y: int,
+    currentUser: UserSnapshot = Depends(getCurrentUser),
+    db: Session = Depends(getDb),
+):
+    drawing = await _getOwnedDrawing(db, drawingId, currentUser.id)
+    if drawing.tileStatus != tiles.TILE_STATUS_READY:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Tiles not available"
+        )
+    if not (0 <= z <= drawing.tileLevels) or x < 0 or y < 0:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No tile")
+    path = tiles.tilePath(drawing.id, z, x, y, drawing.tileFormat)
+    if not path.is_file():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No tile")
+    return FileResponse(
+        path, headers={"Cache-Control": "private, max-age=86400, immutable"}
+    )
+
+
+@app.get("/drawings/{drawingId}/preview")
+async def getDrawingPreview(
+    drawingId: int,
+    request: Request,
+    w: int = 512,
+    format: str | None = None,
+    currentUser: UserSnapshot = Depends(getCurrentUser),
+    db: Session = Depends(getDb),
+):
+    drawing = await _getOwnedDrawing(db, drawingId, currentUser.id)
+    key = storage.keyForUrl(drawing.filePath)
+    if key is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Drawing has no image"
+        )
+
+    if format is None:
+        # negotiate: WebP when the client advertises it, JPEG otherwise
+        format = "webp" if "image/webp" in request.headers.get("accept", "") else "jpeg"
+    if format not in previews.PREVIEW_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported format"
+        )
+    width = previews.snapWidth(max(w, 1))
+
+    source = storage.backend.localPath(key)
+    if storage.backend.remote:
+        # renditions are cut from a copy in the local cache
+        source = await storage.backend.localCopy(key) or source
+    try:
+        path = await previews.getRendition(drawing.id, source, width, format)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Drawing file missing"
+        )
+    return FileResponse(
+        path,
+        media_type=previews.PREVIEW_FORMATS[format][1],
+        headers={"Cache-Control": "private, max-age=86400", "Vary": "Accept"},
+    )
+
+
+async def _authorizeDrawingFile(
+    db, drawingId: int, userId: int
+) -> accesscache.DrawingFile:
+    # a repeat fetch of the same drawing needs no query at all
+    drawingFile = accesscache.drawingAccessCache.get(userId, drawingId)
+    if drawingFile is not None:
+        return drawingFile
+    row = await runDb(db, crud.getDrawingFile, drawingId=drawingId)
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Drawing not found"
+        )
+    if row.ownerId != userId:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed")
+    drawingFile = accesscache.DrawingFile(drawingId, row.filePath)
+    accesscache.drawingAccessCache.put(userId, drawingFile)
+    return drawingFile
+
+
+@app.get("/drawings/{drawingId}/file")
+async def getDrawingFile(
+    drawingId: int,
+    request: Request,
+    currentUser: UserSnapshot = Depends(getStreamUser),
+    db: Session = Depends(getDb),
+):
+    drawingFile = await _authorizeDrawingFile(db, drawingId, currentUser.id)
+    key = storage.keyForUrl(drawingFile.filePath)
+    if key is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Drawing has no file"
+        )
+
+    headers = {"Cache-Control": httpcache.PRIVATE_REVALIDATE, "Vary": httpcache.VARY}
+    contentHash = uploads.contentHash(drawingFile.filePath)
+    if contentHash is not None:
+        # the name is the content hash, so these bytes never change
+        etag = f'"{contentHash}"'
+        headers["ETag"] = etag
+        headers["Cache-Control"] = uploads.PRIVATE_IMMUTABLE_CACHE_CONTROL
+        if httpcache.etagMatches(request, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if storage.backend.remote and storage.STORAGE_REDIRECT_DOWNLOADS:
+        return storage.presignedRedirect(storage.backend, key)
+    path = await storage.backend.localCopy(key)
+    if path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Drawing file missing"
+        )
+    if uploads.FILE_ACCEL_REDIRECT_PREFIX:
+        # the proxy sends the file itself, ranges included
+        headers["X-Accel-Redirect"] = uploads.FILE_ACCEL_REDIRECT_PREFIX + key
+        return Response(headers=headers)
+    # FileResponse answers Range/If-Range; under a server with the ASGI
+    # pathsend extension the body is sent without passing through Python
+    return FileResponse(path, headers=headers)
+
+
+@app.post(
+    "/projects/{projectId}/drawings/upload",
+    response_model=schemas.DrawingOut,
+)
 async def uploadDrawing(
     projectId: int,
     file: UploadFile = File(...),
     name: str | None = Form(None),
-    currentUser: models.User = Depends(getCurrentUser),
+    currentUser: UserSnapshot = Depends(getCurrentUser),
     db: Session = Depends(getDb),
 ):
     # validate project exists and belongs to user
-    project = crud.getProjectByIdAndOwner(
-        db=db, projectId=projectId, ownerId=currentUser.id
+    project = await runDb(
+        db, crud.getProjectByIdAndOwner, projectId=projectId, ownerId=currentUser.id
     )
     if project is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Project not found"
         )
 
-    # validate file type
-    filename = file.filename
-    content_type = file.content_type
-    allowed = ("image/png", "image/jpeg", "image/jpg")
-    if content_type not in allowed:
+    # stream to disk; type is checked by magic bytes, not content_type
+    try:
+        stored = await uploads.saveUpload(file)
+    except uploads.UploadTooLarge as e:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported file type"
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e)
         )
+    except uploads.UnsupportedFileType as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-    # save file to static/uploads with unique name
-    import uuid
-    from pathlib import Path
-    from PIL import Image
+    # read image size off the event loop
+    width, height = await run_in_threadpool(uploads.probeDimensions, stored.path)
+    await storage.backend.put(stored.fileName, stored.path)
+
+    drawing_data = {
+        "name": name or file.filename,
+        "filePath": stored.fileUrl,
+        "size": stored.size,
+        "width": width,
+        "height": height,
+        "tileStatus": tiles.TILE_STATUS_PENDING if width else None,
+        "scale": None,
+    }
 
-    uploads_dir = Path(
-        os.path.join(os.path.dirname(__file__), "..", "static", "uploads")
-    ).resolve()
-    uploads_dir.mkdir(parents=True, exist_ok=True)
+    drawing = await runDb(
+        db, crud.createDrawing, projectId=projectId, drawingIn=drawing_data
+    )
+    _publishDrawingsCreated(currentUser.id, projectId, [drawing])
+    _scheduleTiles(drawing)
+    return drawing
 
-    ext = Path(filename).suffix or (".png" if content_type == "image/png" else ".jpg")
-    dest_name = f"{uuid.uuid4().hex}{ext}"
-    dest_path = uploads_dir / dest_name
 
-    # write file to disk
-    with open(dest_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
+@app.post(
+    "/projects/{projectId}/drawings/bulk",
+    response_model=schemas.BulkUploadOut,
+    status_code=status.HTTP_201_CREATED,
+)
+async def bulkUploadDrawings(
+    projectId: int,
+    files: list[UploadFile] = File(...),
+    progressId: str | None = Form(None),
+    currentUser: UserSnapshot = Depends(getCurrentUser),
+    db: Session = Depends(getDb),
+):
+    project = await runDb(
+        db, crud.getProjectByIdAndOwner, projectId=projectId, ownerId=currentUser.id
+    )
+    if project is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Project not found"
+        )
 
-    # read image size
+    progress = None
+    if progressId:
+        progress = bulkupload.progressTracker.start(currentUser.id, progressId)
     try:
-        img = Image.open(dest_path)
-        width, height = img.size
-    except Exception:
-        width = None
-        height = None
+        items = await run_in_threadpool(bulkupload.storeBulkUpload, files, progress)
+    except bulkupload.TooManyFiles as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e)
+        )
+    finally:
+        if progress is not None:
+            progress.done = True
+
+    await _persistUploads([item.stored for item in items if item.stored is not None])
+    drawings_data = [
+        {
+            "name": item.fileName,
+            "filePath": item.stored.fileUrl,
+            "size": item.stored.size,
+            "width": item.width,
+            "height": item.height,
+            "tileStatus": tiles.TILE_STATUS_PENDING if item.width else None,
+            "scale": None,
+        }
+        for item in items
+        if item.stored is not None
+    ]
+    # all rows are registered in one transaction
+    drawings = await runDb(
+        db, crud.createDrawings, projectId=projectId, drawingsIn=drawings_data
+    )
+    _publishDrawingsCreated(currentUser.id, projectId, drawings)
+    for drawing in drawings:
+        _scheduleTiles(drawing)
+
+    errors = [
+        schemas.BulkUploadError(fileName=item.fileName, detail=item.error)
+        for item in items
+        if item.error is not None
+    ]
+    result = schemas.BulkUploadOut(created=drawings, errors=errors)
+    if not drawings and errors:
+        return JSONResponse(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            content=jsonable_encoder(result),
+        )
+    return result
+
+
+@app.get("/uploads/progress/{progressId}", response_model=schemas.BulkUploadProgressOut)
+def getBulkUploadProgress(
+    progressId: str,
+    currentUser: UserSnapshot = Depends(getCurrentUser),
+):
+    progress = bulkupload.progressTracker.get(currentUser.id, progressId)
+    if progress is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Progress not found"
+        )
+    return schemas.BulkUploadProgressOut(
+        total=progress.total,
+        processed=progress.processed,
+        failed=progress.failed,
+        done=progress.done,
+    )
+
+
+def _uploadSessionOut(session: models.UploadSession) -> schemas.UploadSessionOut:
+    received = resumable.receivedChunks(session.id)
+    lastIndex = resumable.chunkCount(session.totalSize, session.chunkSize) - 1
+    receivedBytes = len(received) * session.chunkSize
+    if lastIndex in received:
+        receivedBytes -= session.chunkSize - resumable.expectedChunkSize(
+            session.totalSize, session.chunkSize, lastIndex
+        )
+    return schemas.UploadSessionOut(
+        uploadId=session.id,
+        projectId=session.projectId,
+        totalSize=session.totalSize,
+        chunkSize=session.chunkSize,
+        chunkCount=lastIndex + 1,
+        receivedChunks=received,
+        receivedBytes=receivedBytes,
+        expiresAt=session.expiresAt,
+    )
+
+
+async def _getUploadSessionOr404(
+    db, uploadId: str, ownerId: int
+) -> models.UploadSession:
+    session = await runDb(db, crud.getUploadSession, uploadId=uploadId, ownerId=ownerId)
+    if session is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found"
+        )
+    # the purge task deletes it eventually; until then it is already gone
+    if resumable.isExpired(session.expiresAt):
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Upload expired")
+    return session
+
+
+@app.post(
+    "/projects/{projectId}/drawings/uploads",
+    response_model=schemas.UploadSessionOut,
+    status_code=status.HTTP_201_CREATED,
+)
+async def openUploadSession(
+    projectId: int,
+    sessionIn: schemas.UploadSessionCreate,
+    currentUser: UserSnapshot = Depends(getCurrentUser),
+    db: Session = Depends(getDb),
+):
+    project = await runDb(
+        db, crud.getProjectByIdAndOwner, projectId=projectId, ownerId=currentUser.id
+    )
+    if project is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Project not found"
+        )
+    if sessionIn.totalSize > uploads.MAX_UPLOAD_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="File too large",
+        )
+    chunkSize = resumable.clampChunkSize(sessionIn.chunkSize)
+
+    data = sessionIn.model_dump()
+    data.update(chunkSize=chunkSize, ttlSeconds=resumable.UPLOAD_SESSION_TTL_SECONDS)
+    session = await runDb(
+        db,
+        crud.createUploadSession,
+        projectId=projectId,
+        ownerId=currentUser.id,
+        sessionIn=data,
+    )
+    await run_in_threadpool(resumable.createSessionDir, session.id)
+    return await run_in_threadpool(_uploadSessionOut, session)
+
+
+@app.get("/uploads/{uploadId}", response_model=schemas.UploadSessionOut)
+async def getUploadSession(
+    uploadId: str,
+    currentUser: UserSnapshot = Depends(getCurrentUser),
+    db: Session = Depends(getDb),
+):
+    session = await _getUploadSessionOr404(db, uploadId, currentUser.id)
+    return await run_in_threadpool(_uploadSessionOut, session)
+
+
+@app.put(
+    "/uploads/{uploadId}/chunks/{index}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[admission("chunk")],
+)
+async def putUploadChunk(
+    uploadId: str,
+    index: int,
+    request: Request,
+    currentUser: UserSnapshot = Depends(getCurrentUser),
+    db: Session = Depends(getDb),
+):
+    session = await _getUploadSessionOr404(db, uploadId, currentUser.id)
+    count = resumable.chunkCount(session.totalSize, session.chunkSize)
+    if index < 0 or index >= count:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Chunk index out of range"
+        )
+
+    expected = resumable.expectedChunkSize(session.totalSize, session.chunkSize, index)
+    try:
+        await resumable.saveChunk(uploadId, index, request.stream(), expected)
+    except resumable.ChunkSizeMismatch as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found"
+        )
+
+
+@app.post(
+    "/uploads/{uploadId}/complete",
+    response_model=schemas.DrawingOut,
+    dependencies=[admission("upload")],
+)
+async def completeUploadSession(
+    uploadId: str,
+    currentUser: UserSnapshot = Depends(getCurrentUser),
+    db: Session = Depends(getDb),
+):
+    session = await _getUploadSessionOr404(db, uploadId, currentUser.id)
+    count = resumable.chunkCount(session.totalSize, session.chunkSize)
+    projectId = session.projectId
+    name = session.name or session.fileName
+    try:
+        await run_in_threadpool(resumable.checkComplete, uploadId, count)
+    except resumable.IncompleteUpload as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
 
-    fileUrl = f"/static/uploads/{dest_name}"
+    # claimed by deleting the row, so a concurrent completion (or a late
+    # chunk) finds no session instead of creating a second drawing
+    claimed = await runDb(
+        db,
+        crud.claimUploadSession,
+        uploadId=uploadId,
+        ownerId=currentUser.id,
+        now=datetime.now(UTC),
+    )
+    if not claimed:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found"
+        )
+    try:
+        stored = await run_in_threadpool(resumable.assembleChunks, uploadId, count)
+    except uploads.UploadTooLarge as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e)
+        )
+    except uploads.UnsupportedFileType as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    finally:
+        await run_in_threadpool(resumable.removeSessionDir, uploadId)
 
+    width, height = await run_in_threadpool(uploads.probeDimensions, stored.path)
+    await storage.backend.put(stored.fileName, stored.path)
     drawing_data = {
-        "name": name or filename,
-        "filePath": fileUrl,
+        "name": name or stored.fileName,
+        "filePath": stored.fileUrl,
+        "size": stored.size,
         "width": width,
         "height": height,
+        "tileStatus": tiles.TILE_STATUS_PENDING if width else None,
         "scale": None,
     }
-
-    drawing = crud.createDrawing(db=db, projectId=projectId, drawingIn=drawing_data)
+    drawing = await runDb(
+        db, crud.createDrawing, projectId=projectId, drawingIn=drawing_data
+    )
+    _publishDrawingsCreated(currentUser.id, projectId, [drawing])
+    _scheduleTiles(drawing)
     return drawing
 
 
+@app.delete("/uploads/{uploadId}", status_code=status.HTTP_204_NO_CONTENT)
+async def abortUploadSession(
+    uploadId: str,
+    currentUser: UserSnapshot = Depends(getCurrentUser),
+    db: Session = Depends(getDb),
+):
+    await _getUploadSessionOr404(db, uploadId, currentUser.id)
+    await runDb(db, crud.deleteUploadSession, uploadId=uploadId)
+    await run_in_threadpool(resumable.removeSessionDir, uploadId)
+
+
 @app.get("/me/drawings", response_model=list[schemas.DrawingOut])
-def myDrawings(
-    currentUser: models.User = Depends(getCurrentUser), db: Session = Depends(getDb)
+async def myDrawings(
+    request: Request,
+    response: Response,
+    limit: int = pagination.DEFAULT_PAGE_SIZE,
+    cursor: str | None = None,
+    currentUser: UserSnapshot = Depends(getCurrentUser),
+    db: Session = Depends(getDb),
 ):
-    # return all drawings for projects owned by current user
-    projects = crud.listProjectsByOwner(db, ownerId=currentUser.id)
-    all_drawings = []
-    for p in projects:
-        ds = crud.listDrawingsByProject(db, projectId=p.id)
-        all_drawings.extend(ds)
-    # sort by createdAt desc
-    all_drawings.sort(key=lambda d: d.createdAt, reverse=True)
-    return all_drawings
+    # drawings across all projects owned by current user, newest first
+    limit = pagination.clampLimit(limit)
+    after, columns = _pageParams(cursor, None, schemas.DrawingOut)
+    version = await runDb(db, crud.getOwnerDrawingsVersion, ownerId=currentUser.id)
+    etag = httpcache.listingETag("myDrawings", currentUser.id, version, request)
+    if httpcache.etagMatches(request, etag):
+        return httpcache.notModified(etag)
+    drawings = await runDb(
+        db,
+        crud.listDrawingsByOwner,
+        ownerId=currentUser.id,
+        limit=limit,
+        after=after,
+        columns=columns,
+    )
+    return _pageResponse(response, drawings, limit, columns, etag)
 
 
-@app.delete("/drawings/{drawingId}")
-def deleteDrawing(
-    drawingId: int,
-    currentUser: models.User = Depends(getCurrentUser),
+@app.get("/search", response_model=list[schemas.SearchHitOut])
+async def searchByName(
+    q: str,
+    request: Request,
+    response: Response,
+    kind: Literal["project", "drawing"] | None = None,
+    limit: int = pagination.DEFAULT_PAGE_SIZE,
+    cursor: str | None = None,
+    currentUser: UserSnapshot = Depends(getCurrentUser),
     db: Session = Depends(getDb),
 ):
-    drawing = crud.getDrawingById(db, drawingId=drawingId)
-    if drawing is None:
+    # prefix search over the current user's project and drawing names,
+    # best match first
+    try:
+        terms = search.parseTerms(q)
+        offset = pagination.decodeOffsetCursor(cursor) if cursor else 0
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    limit = min(pagination.clampLimit(limit), search.SEARCH_MAX_RESULTS - offset)
+    if limit <= 0:
+        return []
+    # any project or drawing change moves this version
+    version = await runDb(db, crud.getOwnerDrawingsVersion, ownerId=currentUser.id)
+    etag = httpcache.listingETag("search", currentUser.id, version, request)
+    if httpcache.etagMatches(request, etag):
+        return httpcache.notModified(etag)
+    hits = await runDb(
+        db,
+        crud.searchByOwner,
+        ownerId=currentUser.id,
+        terms=terms,
+        limit=limit,
+        offset=offset,
+        kind=kind,
+    )
+    response.headers.update(httpcache.cacheHeaders(etag))
+    if len(hits) > limit:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = (
+            pagination.encodeOffsetCursor(offset + limit)
+        )
+    return hits[:limit]
+
+
+async def _releaseDb(db) -> None:
+    # an event stream stays open for minutes; don't hold a connection
+    if isinstance(db, Session):
+        await run_in_threadpool(db.close)
+    else:
+        await db.close()
+
+
+def _eventStreamResponse(
+    request: Request, ownerId: int, projectId: int | None, lastEventId: str | None
+) -> StreamingResponse:
+    # answered with 503 here; the subscription itself is made by the stream
+    events.broker.checkCapacity()
+    return StreamingResponse(
+        events.eventStream(
+            events.broker,
+            ownerId,
+            projectId,
+            request.headers.get("last-event-id") or lastEventId,
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/events")
+async def streamEvents(
+    request: Request,
+    lastEventId: str | None = None,
+    currentUser: UserSnapshot = Depends(getStreamUser),
+    db: Session = Depends(getDb),
+):
+    # changes to any of the current user's projects and drawings
+    await _releaseDb(db)
+    return _eventStreamResponse(request, currentUser.id, None, lastEventId)
+
+
+@app.get("/projects/{projectId}/events")
+async def streamProjectEvents(
+    projectId: int,
+    request: Request,
+    lastEventId: str | None = None,
+    currentUser: UserSnapshot = Depends(getStreamUser),
+    db: Session = Depends(getDb),
+):
+    project = await runDb(
+        db, crud.getProjectByIdAndOwner, projectId=projectId, ownerId=currentUser.id
+    )
+    if project is None:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Drawing not found"
+            status_code=status.HTTP_404_NOT_FOUND, detail="Project not found"
         )
+    await _releaseDb(db)
+    return _eventStreamResponse(request, currentUser.id, projectId, lastEventId)
+
+
+@app.delete("/drawings/{drawingId}")
+async def deleteDrawing(
+    drawingId: int,
+    currentUser: UserSnapshot = Depends(getCurrentUser),
+    db: Session = Depends(getDb),
+):
     # allow only owner of project to delete
-    if drawing.project.ownerId != currentUser.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed")
+    drawing = await _getOwnedDrawing(db, drawingId, currentUser.id)
+    projectId = drawing.projectId
+
+    # delete DB record; the file path comes back only if no other
+    # drawing still references the same content
+    file_path = await runDb(db, crud.deleteDrawing, drawingId=drawingId)
+    accesscache.drawingAccessCache.invalidateDrawings([drawingId])
+    _queueFileRemoval([drawingId], [file_path])
+    events.broker.publish(
+        events.DRAWING_DELETED,
+        currentUser.id,
+        projectId,
+        {"id": drawingId, "projectId": projectId},
+    )
+
+    return {"status": "deleted"}
 
-    # attempt to delete file on disk if it's in uploads
+
+def _uploadReferenced(filePath: str) -> bool:
+    # an identical upload may have re-created the blob since it was queued
+    db = SessionLocal()
     try:
-        file_path = drawing.filePath
-        # only delete files under static/uploads for safety
-        if file_path and file_path.startswith("/static/uploads/"):
-            full = os.path.abspath(
-                os.path.join(os.path.dirname(__file__), "..", file_path.lstrip("/"))
+        return crud.isFileReferenced(db, filePath)
+    finally:
+        db.close()
+
+
+def _queueFileRemoval(
+    drawingIds: list[int],
+    filePaths: list[str | None],
+    uploadIds: list[str] | None = None,
+) -> None:
+    # files are unlinked by the background cleanup queue, with retries,
+    # so the response does not wait on the filesystem
+    derived = []
+    for drawingId in drawingIds:
+        previews.renditionCache.removePrefix(f"{drawingId}/")
+        derived.append(tiles.drawingTilesDir(drawingId))
+        derived.append(previews.drawingRenditionsDir(drawingId))
+    derived.extend(resumable.sessionDir(uploadId) for uploadId in uploadIds or ())
+    cleanup.cleanupQueue.enqueue(derived)
+
+    for file_path in filePaths:
+        # only delete blobs that were uploaded here, for safety
+        key = storage.keyForUrl(file_path)
+        if key is not None:
+            cleanup.cleanupQueue.enqueue(
+                [key],
+                skipIf=functools.partial(_uploadReferenced, file_path),
+                remove=storage.backend.deleteBlocking,
             )
-            if os.path.exists(full):
-                try:
-                    os.remove(full)
-                except Exception:
-                    pass
-    except Exception:
-        pass
 
-    # delete DB record
-    crud.deleteDrawing(db, drawingId=drawingId)
 
-    return {"status": "deleted"}
+@app.get("/projects/{projectId}/export")
+async def exportProject(
+    projectId: int,
+    currentUser: UserSnapshot = Depends(getCurrentUser),
+    db: Session = Depends(getDb),
+):
+    project = await runDb(
+        db, crud.getProjectByIdAndOwner, projectId=projectId, ownerId=currentUser.id
+    )
+    if project is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Project not found"
+        )
+    # a plain iterator: Starlette pulls each chunk in the threadpool
+    return StreamingResponse(
+        projectarchive.iterProjectArchive(projectId),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="project-{projectId}.zip"'
+        },
+    )
+
+
+@app.post(
+    "/projects/import",
+    response_model=schemas.ProjectImportOut,
+    status_code=status.HTTP_201_CREATED,
+)
+async def importProject(
+    file: UploadFile = File(...),
+    name: str | None = Form(None),
+    currentUser: UserSnapshot = Depends(getCurrentUser),
+):
+    # the archive is spooled to disk by the form parser; rows go in through
+    # a session of their own, inside a single transaction
+    try:
+        result = await run_in_threadpool(
+            projectarchive.importProjectArchive, file.file, currentUser.id, name
+        )
+    except projectarchive.InvalidArchive as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    project = result.project
+    events.broker.publish(
+        events.PROJECT_CREATED,
+        currentUser.id,
+        project.id,
+        {"id": project.id, "name": project.name},
+    )
+    await run_in_threadpool(_schedulePendingTiles, project.id)
+    return schemas.ProjectImportOut(
+        project=schemas.ProjectOut.model_validate(project),
+        drawings=result.drawings,
+        files=result.files,
+    )
+
+
+def _schedulePendingTiles(projectId: int) -> None:
+    db = SessionLocal()
+    try:
+        for drawing in crud.iterProjectDrawings(db, projectId):
+            _scheduleTiles(drawing)
+    finally:
+        db.close()
 
 
 @app.delete("/projects/{projectId}")
-def deleteProject(
+async def deleteProject(
     projectId: int,
-    currentUser: models.User = Depends(getCurrentUser),
+    currentUser: UserSnapshot = Depends(getCurrentUser),
     db: Session = Depends(getDb),
 ):
-    project = crud.getProjectByIdAndOwner(
-        db=db, projectId=projectId, ownerId=currentUser.id
+    project = await runDb(
+        db, crud.getProjectByIdAndOwner, projectId=projectId, ownerId=currentUser.id
     )
     if project is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Project not found"
         )
 
-    # delete drawings and collect file paths
-    file_paths = crud.deleteProject(db=db, projectId=projectId)
-
-    # remove files from disk if under static/uploads
-    for fp in file_paths:
-        try:
-            if fp and fp.startswith("/static/uploads/"):
-                full = os.path.abspath(
-                    os.path.join(os.path.dirname(__file__), "..", fp.lstrip("/"))
-                )
-                if os.path.exists(full):
-                    try:
-                        os.remove(full)
-                    except Exception:
-                        pass
-        except Exception:
-            pass
+    # drawings, upload sessions and the project go in one transaction
+    drawingIds, file_paths, uploadIds = await runDb(
+        db, crud.deleteProject, projectId=projectId
+    )
+    accesscache.drawingAccessCache.invalidateDrawings(drawingIds)
+    _queueFileRemoval(drawingIds, file_paths, uploadIds)
+    # one event for the project; its drawings go with it
+    events.broker.publish(
+        events.PROJECT_DELETED, currentUser.id, projectId, {"id": projectId}
+    )
 
     return {"status": "deleted"}
@@ -0,0 +1,234 @@
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+
+logger = logging.getLogger("e_eye.metrics")
+
+# requests slower than this are logged together with their SQL
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", 500))
+SLOW_REQUEST_MAX_STATEMENTS = 50
+SLOW_REQUEST_MAX_STATEMENT_CHARS = 500
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    querySeconds: float = 0.0
+    statements: list[tuple[float, str]] = field(default_factory=list)
+
+
+# set by the middleware; engine events add to whatever request is current
+_currentRequest: ContextVar[RequestStats | None] = ContextVar(
+    "currentRequest", default=None
+)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Per-route request and query accounting, rendered as Prometheus text.
+
+    Routes are labelled by their path template, never the raw path, so
+    the label set stays bounded.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency: dict[tuple[str, str], Histogram] = {}
+        self.queriesPerRequest: dict[tuple[str, str], Histogram] = {}
+        self.requests: dict[tuple[str, str, str], int] = {}
+        self.queries: dict[tuple[str, str], int] = {}
+        self.querySeconds: dict[tuple[str, str], float] = {}
+
+    def record(
+        self, method: str, route: str, status: int, seconds: float, stats: RequestStats
+    ) -> None:
+        key = (method, route)
+        with self._lock:
+            hist = self.latency.get(key)
+            if hist is None:
+                hist = self.latency[key] = Histogram(LATENCY_BUCKETS)
+                self.queriesPerRequest[key] = Histogram(QUERY_COUNT_BUCKETS)
+            hist.observe(seconds)
+            self.queriesPerRequest[key].observe(stats.queries)
+            statusKey = (method, route, str(status))
+            self.requests[statusKey] = self.requests.get(statusKey, 0) + 1
+            self.queries[key] = self.queries.get(key, 0) + stats.queries
+            self.querySeconds[key] = (
+                self.querySeconds.get(key, 0.0) + stats.querySeconds
+            )
+
+    def render(self, gauges: dict[str, float] | None = None) -> str:
+        lines: list[str] = []
+        with self._lock:
+            _renderHistograms(
+                lines,
+                "e_eye_request_duration_seconds",
+                "Request latency by route.",
+                self.latency,
+            )
+            _renderHistograms(
+                lines,
+                "e_eye_request_db_queries",
+                "SQL statements issued per request.",
+                self.queriesPerRequest,
+            )
+            lines.append("# HELP e_eye_requests_total Requests by route and status.")
+            lines.append("# TYPE e_eye_requests_total counter")
+            for (method, route, status), value in sorted(self.requests.items()):
+                labels = _labels(method=method, route=route, status=status)
+                lines.append(f"e_eye_requests_total{labels} {value}")
+            lines.append("# HELP e_eye_db_queries_total SQL statements by route.")
+            lines.append("# TYPE e_eye_db_queries_total counter")
+            for (method, route), value in sorted(self.queries.items()):
+                labels = _labels(method=method, route=route)
+                lines.append(f"e_eye_db_queries_total{labels} {value}")
+            lines.append(
+                "# HELP e_eye_db_query_seconds_total Time spent in SQL by route."
+            )
+            lines.append("# TYPE e_eye_db_query_seconds_total counter")
+            for (method, route), value in sorted(self.querySeconds.items()):
+                labels = _labels(method=method, route=route)
+                lines.append(f"e_eye_db_query_seconds_total{labels} {value:.6f}")
+        for name, value in sorted((gauges or {}).items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: str) -> str:
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _renderHistograms(lines: list[str], name: str, summary: str, histograms: dict):
+    lines.append(f"# HELP {name} {summary}")
+    lines.append(f"# TYPE {name} histogram")
+    for (method, route), hist in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(hist.buckets, hist.counts):
+            cumulative += count
+            labels = _labels(method=method, route=route, le=f"{bound:g}")
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        labels = _labels(method=method, route=route, le="+Inf")
+        lines.append(f"{name}_bucket{labels} {hist.count}")
+        labels = _labels(method=method, route=route)
+        lines.append(f"{name}_sum{labels} {hist.total:.6f}")
+        lines.append(f"{name}_count{labels} {hist.count}")
+
+
+registry = MetricsRegistry()
+
+
+def _beforeCursorExecute(conn, cursor, statement, parameters, context, executemany):
+    if _currentRequest.get() is not None:
+        conn.info.setdefault("queryStart", []).append(time.perf_counter())
+
+
+def _afterCursorExecute(conn, cursor, statement, parameters, context, executemany):
+    stats = _currentRequest.get()
+    if stats is None:
+        return
+    starts = conn.info.get("queryStart")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    stats.queries += 1
+    stats.querySeconds += elapsed
+    if len(stats.statements) < SLOW_REQUEST_MAX_STATEMENTS:
+        stats.statements.append((elapsed, statement[:SLOW_REQUEST_MAX_STATEMENT_CHARS]))
+
+
+def instrumentEngine(engine) -> None:
+    # pass AsyncEngine.sync_engine for async engines
+    event.listen(engine, "before_cursor_execute", _beforeCursorExecute)
+    event.listen(engine, "after_cursor_execute", _afterCursorExecute)
+
+
+def _routeLabel(scope) -> str:
+    # the router stores the matched route in the scope; unmatched paths
+    # share one label rather than adding a series per URL
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    return path or "unmatched"
+
+
+_EVENT_STREAM = b"text/event-stream"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing each request to its last body byte."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _currentRequest.set(stats)
+        status = 500
+        started = time.perf_counter()
+        streamStarted = None
+
+        async def sendWithStatus(message):
+            nonlocal status, streamStarted
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = dict(message.get("headers", ()))
+                if headers.get(b"content-type", b"").startswith(_EVENT_STREAM):
+                    # open-ended: time it to the headers, not the last byte
+                    streamStarted = time.perf_counter()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, sendWithStatus)
+        finally:
+            elapsed = (streamStarted or time.perf_counter()) - started
+            _currentRequest.reset(token)
+            route = _routeLabel(scope)
+            registry.record(scope["method"], route, status, elapsed, stats)
+            if elapsed * 1000 >= SLOW_REQUEST_MS:
+                _logSlowRequest(scope, route, status, elapsed, stats)
+
+
+def _logSlowRequest(scope, route, status, elapsed, stats: RequestStats) -> None:
+    statements = "\n".join(
+        f"  {seconds * 1000:.1f} ms  {sql}" for seconds, sql in stats.statements
+    )
+    logger.warning(
+        "slow request %s %s (%s) -> %d in %.1f ms; %d queries in %.1f ms\n%s",
+        scope["method"],
+        scope["path"],
+        route,
+        status,
+        elapsed * 1000,
+        stats.queries,
+        stats.querySeconds * 1000,
+        statements,
+    )
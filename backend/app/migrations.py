@@ -0,0 +1,79 @@
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn, CreateIndex
+
+from . import models
+
+logger = logging.getLogger("e_eye.migrations")
+
+
+def _index(model, name: str):
+    return next(index for index in model.__table__.indexes if index.name == name)
+
+
+# create_all only creates missing tables; columns and indexes added to a
+# table an existing database already has are listed here
+ADDED_COLUMNS = (
+    # tile pyramids
+    models.Drawing.__table__.c.tileSize,
+    models.Drawing.__table__.c.tileLevels,
+    models.Drawing.__table__.c.tileFormat,
+    models.Drawing.__table__.c.tileStatus,
+    # list cache versions
+    models.User.__table__.c.projectsVersion,
+    models.Project.__table__.c.drawingsVersion,
+)
+ADDED_INDEXES = (
+    # drawing lists in creation order
+    _index(models.Drawing, "ix_drawings_projectId_createdAt"),
+    # project lists in creation order
+    _index(models.Project, "ix_projects_ownerId_createdAt"),
+    # blob reference lookups by path
+    _index(models.Drawing, "ix_drawings_filePath"),
+)
+
+
+def _columnNames(engine, tableName: str) -> set[str]:
+    return {column["name"] for column in inspect(engine).get_columns(tableName)}
+
+
+def _addColumn(engine, column) -> str | None:
+    table = column.table
+    if column.name in _columnNames(engine, table.name):
+        return None
+    preparer = engine.dialect.identifier_preparer
+    stmt = (
+        f"ALTER TABLE {preparer.format_table(table)} "
+        f"ADD COLUMN {CreateColumn(column).compile(dialect=engine.dialect)}"
+    )
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(stmt))
+    except Exception:
+        # another worker may have added it since the check
+        if column.name not in _columnNames(engine, table.name):
+            raise
+        return None
+    return stmt
+
+
+def upgradeSchema(engine) -> list[str]:
+    """Bring an existing database up to the models; idempotent.
+
+    Runs after create_all. New columns are added with ALTER TABLE (nullable
+    or with a server default, so existing rows stay valid) and indexes with
+    CREATE INDEX IF NOT EXISTS. Returns the statements that changed the
+    schema.
+    """
+    applied = []
+    for column in ADDED_COLUMNS:
+        stmt = _addColumn(engine, column)
+        if stmt is not None:
+            applied.append(stmt)
+    with engine.begin() as conn:
+        for index in ADDED_INDEXES:
+            conn.execute(CreateIndex(index, if_not_exists=True))
+    for stmt in applied:
+        logger.info("schema upgrade: %s", stmt)
+    return applied
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from .database import Base
@@ -14,6 +14,8 @@ class User(Base):
     isActive = Column(Boolean, default=True)
     subscriptionLevel = Column(String, default="free")
     role = Column(String, default="user")
+    # bumped whenever a project is created or deleted; listing validator
+    projectsVersion = Column(Integer, nullable=False, default=0, server_default="0")
     projects = relationship("Project", back_populates="owner")
 
 
@@ -22,22 +24,63 @@ class Project(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
-    createdAt = Column(DateTime, default=datetime.now(UTC))
+    createdAt = Column(DateTime, default=lambda: datetime.now(UTC))
     ownerId = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # bumped whenever one of its drawings is added, changed or deleted
+    drawingsVersion = Column(Integer, nullable=False, default=0, server_default="0")
     owner = relationship("User", back_populates="projects")
-    drawings = relationship("Drawing", back_populates="project")
+    # rows are removed with set-based DELETEs; see crud.deleteProject
+    drawings = relationship("Drawing", back_populates="project", passive_deletes=True)
+
+    __table_args__ = (Index("ix_projects_ownerId_createdAt", "ownerId", "createdAt"),)
 
 
 class Drawing(Base):
     __tablename__ = "drawings"
 
     id = Column(Integer, primary_key=True, index=True)
-    projectId = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    projectId = Column(
+        Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False
+    )
     name = Column(String, nullable=False)
-    filePath = Column(String, nullable=False)
+    filePath = Column(String, nullable=False, index=True)
     width = Column(Integer, nullable=True)
     height = Column(Integer, nullable=True)
+    tileSize = Column(Integer, nullable=True)
+    tileLevels = Column(Integer, nullable=True)
+    tileFormat = Column(String, nullable=True)
+    tileStatus = Column(String, nullable=True)
     scale = Column(String, nullable=True)
-    createdAt = Column(DateTime, default=datetime.now(UTC))
+    createdAt = Column(DateTime, default=lambda: datetime.now(UTC))
 
     project = relationship("Project", back_populates="drawings")
+
+    __table_args__ = (
+        Index("ix_drawings_projectId_createdAt", "projectId", "createdAt"),
+    )
+
+
+class UploadSession(Base):
+    __tablename__ = "upload_sessions"
+
+    id = Column(String, primary_key=True, index=True)
+    projectId = Column(
+        Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False
+    )
+    ownerId = Column(Integer, ForeignKey("users.id"), nullable=False)
+    name = Column(String, nullable=True)
+    fileName = Column(String, nullable=True)
+    totalSize = Column(Integer, nullable=False)
+    chunkSize = Column(Integer, nullable=False)
+    createdAt = Column(DateTime, default=lambda: datetime.now(UTC))
+    expiresAt = Column(DateTime, nullable=False, index=True)
+
+
+class Blob(Base):
+    __tablename__ = "blobs"
+
+    sha256 = Column(String, primary_key=True)
+    filePath = Column(String, unique=True, nullable=False)
+    size = Column(Integer, nullable=True)
+    refCount = Column(Integer, nullable=False, default=0)
+    createdAt = Column(DateTime, default=lambda: datetime.now(UTC))
@@ -0,0 +1,78 @@
+import base64
+import json
+from datetime import datetime
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# list endpoints keep returning a plain JSON array; the cursor for the
+# next page travels in this header and is absent on the last page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+def clampLimit(limit: int | None) -> int:
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def parseFields(fields: str | None, allowed: list[str]) -> list[str] | None:
+    """Validate a comma-separated fields= projection.
+
+    Returns the requested fields in schema order, or None when no
+    projection was asked for.
+    """
+    if not fields:
+        return None
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested.difference(allowed)
+    if unknown:
+        raise InvalidFields(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return [f for f in allowed if f in requested]
+
+
+def encodeCursor(createdAt: datetime, rowId: int) -> str:
+    raw = json.dumps([createdAt.isoformat(), rowId], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).rstrip(b"=").decode("ascii")
+
+
+def decodeCursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        createdAt, rowId = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(createdAt), int(rowId)
+    except Exception:
+        raise InvalidCursor("Invalid cursor")
+
+
+def nextCursor(rows: list, limit: int) -> str | None:
+    """Cursor after the last row of a page fetched with limit + 1 rows."""
+    if len(rows) <= limit:
+        return None
+    last = rows[limit - 1]
+    return encodeCursor(last.createdAt, last.id)
+
+
+def encodeOffsetCursor(offset: int) -> str:
+    # for ranked listings, which have no stable keyset to resume from
+    raw = json.dumps({"offset": offset}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).rstrip(b"=").decode("ascii")
+
+
+def decodeOffsetCursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        offset = int(json.loads(base64.urlsafe_b64decode(padded))["offset"])
+    except Exception:
+        raise InvalidCursor("Invalid cursor")
+    if offset < 0:
+        raise InvalidCursor("Invalid cursor")
+    return offset
@@ -0,0 +1,112 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from argon2 import PasswordHasher, exceptions
+
+# Argon2 parameters; stored hashes made with other values are upgraded
+# on the next successful login
+ARGON2_TIME_COST = int(os.environ.get("ARGON2_TIME_COST", 3))
+ARGON2_MEMORY_COST = int(os.environ.get("ARGON2_MEMORY_COST", 65536))
+ARGON2_PARALLELISM = int(os.environ.get("ARGON2_PARALLELISM", 4))
+
+PASSWORD_WORKERS = int(os.environ.get("PASSWORD_WORKERS", 2))
+PASSWORD_QUEUE_LIMIT = int(os.environ.get("PASSWORD_QUEUE_LIMIT", 16))
+PASSWORD_RETRY_AFTER_SECONDS = int(os.environ.get("PASSWORD_RETRY_AFTER_SECONDS", 2))
+
+Hasher = PasswordHasher(
+    time_cost=ARGON2_TIME_COST,
+    memory_cost=ARGON2_MEMORY_COST,
+    parallelism=ARGON2_PARALLELISM,
+)
+
+
+class PasswordPoolBusy(RuntimeError):
+    pass
+
+
+def _verifyAndRehash(hashedPassword: str, rawPassword: str) -> tuple[bool, str | None]:
+    try:
+        Hasher.verify(hashedPassword, rawPassword)
+    except exceptions.VerifyMismatchError:
+        return False, None
+    except Exception:
+        # Any unexpected error treat as verification failure
+        return False, None
+    if Hasher.check_needs_rehash(hashedPassword):
+        return True, Hasher.hash(rawPassword)
+    return True, None
+
+
+class PasswordPool:
+    """Dedicated Argon2 workers with a bounded backlog.
+
+    At most workers + queueLimit jobs are admitted; anything beyond that
+    is rejected immediately with PasswordPoolBusy instead of queueing.
+    argon2-cffi releases the GIL, so threads give real parallelism.
+    """
+
+    def __init__(self, workers: int, queueLimit: int):
+        self.workers = workers
+        self.capacity = workers + queueLimit
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="argon2"
+        )
+        self._lock = threading.Lock()
+        self.inflight = 0
+        self.rejected = 0
+
+    def ensureCapacity(self) -> None:
+        # cheap pre-check so callers can shed load before touching the DB
+        if self.inflight >= self.capacity:
+            with self._lock:
+                self.rejected += 1
+            raise PasswordPoolBusy("Too many password operations in progress")
+
+    def _acquire(self) -> None:
+        with self._lock:
+            if self.inflight >= self.capacity:
+                self.rejected += 1
+                raise PasswordPoolBusy("Too many password operations in progress")
+            self.inflight += 1
+
+    def _release(self, _future=None) -> None:
+        with self._lock:
+            self.inflight -= 1
+
+    async def run(self, fn, *args):
+        self._acquire()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        # release when the job finishes, even if the caller goes away
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "inflight": self.inflight,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+passwordPool = PasswordPool(PASSWORD_WORKERS, PASSWORD_QUEUE_LIMIT)
+
+
+async def hashPasswordAsync(rawPassword: str) -> str:
+    return await passwordPool.run(Hasher.hash, rawPassword)
+
+
+async def verifyPasswordAsync(
+    hashedPassword: str, rawPassword: str
+) -> tuple[bool, str | None]:
+    """Return (matches, newHash); newHash is set when parameters changed."""
+    return await passwordPool.run(_verifyAndRehash, hashedPassword, rawPassword)
@@ -0,0 +1,200 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from fastapi.concurrency import run_in_threadpool
+from PIL import Image
+
+# renditions are authorized through the API, so they live outside static/
+PREVIEW_CACHE_DIR = Path(
+    os.environ.get(
+        "PREVIEW_CACHE_DIR",
+        os.path.join(os.path.dirname(__file__), "..", "preview_cache"),
+    )
+).resolve()
+PREVIEW_CACHE_MAX_BYTES = int(
+    os.environ.get("PREVIEW_CACHE_MAX_BYTES", 1024 * 1024 * 1024)
+)
+
+# requested widths are snapped up to one of these to bound cache entries
+PREVIEW_WIDTHS = (128, 256, 512, 1024, 2048)
+PREVIEW_FORMATS = {
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "image/jpeg", {"quality": 82, "optimize": True}),
+}
+
+
+def snapWidth(width: int) -> int:
+    for candidate in PREVIEW_WIDTHS:
+        if width <= candidate:
+            return candidate
+    return PREVIEW_WIDTHS[-1]
+
+
+class RenditionCache:
+    """Byte-budgeted LRU index over the rendition files on disk.
+
+    The index is rebuilt from the directory (oldest mtime first) the
+    first time it is used, so the budget survives restarts.
+    """
+
+    def __init__(self, directory: Path, maxBytes: int):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._bytes = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _load(self) -> None:
+        found = []
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                if name.startswith("."):
+                    continue
+                full = os.path.join(root, name)
+                try:
+                    st = os.stat(full)
+                except FileNotFoundError:
+                    continue
+                key = os.path.relpath(full, self.directory).replace(os.sep, "/")
+                found.append((st.st_mtime, key, st.st_size))
+        found.sort()
+        for _mtime, key, size in found:
+            self._entries[key] = size
+            self._bytes += size
+        self._loaded = True
+
+    def path(self, key: str) -> Path:
+        return self.directory / key
+
+    def lookup(self, key: str) -> Path | None:
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            path = self.path(key)
+            if not path.exists():
+                self._bytes -= self._entries.pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return path
+
+    def add(self, key: str, size: int) -> None:
+        evicted = []
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)
+            self._entries[key] = size
+            self._bytes += size
+            # never evict the entry that was just added
+            while self._bytes > self.maxBytes and len(self._entries) > 1:
+                oldKey, oldSize = self._entries.popitem(last=False)
+                self._bytes -= oldSize
+                self.evictions += 1
+                evicted.append(oldKey)
+        for oldKey in evicted:
+            try:
+                os.remove(self.path(oldKey))
+            except FileNotFoundError:
+                pass
+
+    def removePrefix(self, prefix: str) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                self._bytes -= self._entries.pop(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "maxBytes": self.maxBytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+renditionCache = RenditionCache(PREVIEW_CACHE_DIR, PREVIEW_CACHE_MAX_BYTES)
+
+# renditions currently being rendered, keyed like the cache
+_inflight: dict[str, asyncio.Task] = {}
+
+
+def renditionKey(drawingId: int, width: int, fmt: str) -> str:
+    return f"{drawingId}/{width}.{fmt}"
+
+
+def renderRendition(sourcePath: Path, destPath: Path, width: int, fmt: str) -> int:
+    """Decode, resize and encode one rendition (blocking). Returns its size."""
+    pilFormat, _mediaType, options = PREVIEW_FORMATS[fmt]
+    with Image.open(sourcePath) as img:
+        # lets the JPEG decoder scale by 1/2..1/8 during decoding
+        img.draft("RGB", (width, width * img.height // max(img.width, 1)))
+        img.thumbnail((width, 4 * width), Image.Resampling.LANCZOS)
+        if pilFormat == "JPEG" and img.mode != "RGB":
+            img = img.convert("RGB")
+
+        destPath.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmpPath = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=destPath.parent)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                img.save(out, pilFormat, **options)
+            os.replace(tmpPath, destPath)
+        except BaseException:
+            try:
+                os.remove(tmpPath)
+            except FileNotFoundError:
+                pass
+            raise
+    return destPath.stat().st_size
+
+
+async def _renderAndCache(key: str, sourcePath: Path, width: int, fmt: str) -> Path:
+    destPath = renditionCache.path(key)
+    size = await run_in_threadpool(renderRendition, sourcePath, destPath, width, fmt)
+    renditionCache.add(key, size)
+    return destPath
+
+
+async def getRendition(drawingId: int, sourcePath: Path, width: int, fmt: str) -> Path:
+    """Return a cached rendition, rendering it at most once at a time.
+
+    Concurrent requests for the same key await a single shared task, so
+    the source image is decoded only once.
+    """
+    key = renditionKey(drawingId, width, fmt)
+    cached = await run_in_threadpool(renditionCache.lookup, key)
+    if cached is not None:
+        return cached
+
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_renderAndCache(key, sourcePath, width, fmt))
+        _inflight[key] = task
+        task.add_done_callback(lambda _t: _inflight.pop(key, None))
+    # shield: one client disconnecting must not cancel the others' render
+    return await asyncio.shield(task)
+
+
+def drawingRenditionsDir(drawingId: int) -> Path:
+    return PREVIEW_CACHE_DIR / str(drawingId)
+
+
+def removeDrawingRenditions(drawingId: int) -> None:
+    renditionCache.removePrefix(f"{drawingId}/")
+    shutil.rmtree(drawingRenditionsDir(drawingId), ignore_errors=True)
@@ -0,0 +1,263 @@
+import functools
+import io
+import json
+import os
+import zipfile
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import PurePosixPath
+
+from . import cleanup, crud, models, storage, tiles, uploads
+from .bulkupload import storeEntry
+from .database import SessionLocal
+
+ARCHIVE_FORMAT = 1
+PROJECT_ENTRY = "project.json"
+DRAWINGS_ENTRY = "drawings.jsonl"
+FILES_PREFIX = "files/"
+
+# uncompressed total an import may expand to, checked against the
+# archive's central directory before anything is extracted
+MAX_IMPORT_BYTES = int(os.environ.get("MAX_IMPORT_BYTES", 64 * 1024**3))
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", 1000))
+
+
+class InvalidArchive(ValueError):
+    pass
+
+
+class _ChunkSink:
+    """Write-only, unseekable target for ZipFile; drained after each write."""
+
+    def __init__(self):
+        self._parts: list[bytes] = []
+        self.size = 0
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        self.size = 0
+        return data
+
+
+def _entryInfo(name: str, compress: int, when: datetime | None = None):
+    info = zipfile.ZipInfo(name, date_time=(when or datetime.now()).timetuple()[:6])
+    info.compress_type = compress
+    info.external_attr = 0o644 << 16
+    return info
+
+
+def iterProjectArchive(projectId: int):
+    """Stream a project as ZIP bytes, one upload chunk at a time.
+
+    Blocking; meant to be iterated from the threadpool. The layout is
+    project.json, the upload files under files/, then drawings.jsonl with
+    one row per drawing. Rows are read from the database in batches, so
+    neither the archive nor the drawing list is held in memory.
+    """
+    db = SessionLocal()
+    sink = _ChunkSink()
+    try:
+        project = db.get(models.Project, projectId)
+        if project is None:
+            # deleted after the request was authorized; the response has
+            # already started, so end it without an archive
+            return
+        # data descriptors are written since the sink cannot seek
+        with zipfile.ZipFile(sink, "w", allowZip64=True) as archive:
+            archive.writestr(
+                _entryInfo(PROJECT_ENTRY, zipfile.ZIP_DEFLATED),
+                json.dumps(
+                    {
+                        "format": ARCHIVE_FORMAT,
+                        "name": project.name,
+                        "createdAt": project.createdAt.isoformat(),
+                    }
+                ),
+            )
+            yield sink.take()
+
+            exported = {}
+            for filePath in crud.iterProjectFilePaths(db, projectId):
+                key = storage.keyForUrl(filePath)
+                # fetched into the local cache first for a remote backend
+                source = storage.backend.localCopyBlocking(key) if key else None
+                if source is None:
+                    continue
+                name = FILES_PREFIX + source.name
+                # images are already compressed
+                info = _entryInfo(name, zipfile.ZIP_STORED)
+                with open(source, "rb") as src, archive.open(
+                    info, "w", force_zip64=True
+                ) as dest:
+                    while chunk := src.read(uploads.UPLOAD_CHUNK_SIZE):
+                        dest.write(chunk)
+                        yield sink.take()
+                exported[filePath] = name
+
+            info = _entryInfo(DRAWINGS_ENTRY, zipfile.ZIP_DEFLATED)
+            with archive.open(info, "w", force_zip64=True) as dest:
+                for row in crud.iterProjectDrawings(db, projectId):
+                    line = {
+                        "name": row.name,
+                        "file": exported.get(row.filePath),
+                        "filePath": row.filePath,
+                        "width": row.width,
+                        "height": row.height,
+                        "scale": row.scale,
+                        "createdAt": row.createdAt.isoformat()
+                        if row.createdAt
+                        else None,
+                    }
+                    dest.write(json.dumps(line).encode("utf-8") + b"\n")
+                    # rows are small; send them in chunk-sized pieces
+                    if sink.size >= uploads.UPLOAD_CHUNK_SIZE:
+                        yield sink.take()
+        yield sink.take()
+    finally:
+        db.close()
+
+
+@dataclass
+class ImportResult:
+    project: models.Project
+    drawings: int
+    files: int
+
+
+def _readProject(archive: zipfile.ZipFile) -> dict:
+    try:
+        meta = json.loads(archive.read(PROJECT_ENTRY))
+    except KeyError:
+        raise InvalidArchive(f"Archive has no {PROJECT_ENTRY}")
+    except ValueError:
+        raise InvalidArchive(f"{PROJECT_ENTRY} is not valid JSON")
+    if not isinstance(meta, dict) or meta.get("format") != ARCHIVE_FORMAT:
+        raise InvalidArchive("Unsupported archive format")
+    return meta
+
+
+def _checkMembers(archive: zipfile.ZipFile) -> list[zipfile.ZipInfo]:
+    files = []
+    total = 0
+    for info in archive.infolist():
+        total += info.file_size
+        if info.filename.startswith(FILES_PREFIX) and not info.is_dir():
+            path = PurePosixPath(info.filename)
+            # one flat directory; anything else is not from an export
+            if len(path.parts) != 2 or path.name.startswith("."):
+                raise InvalidArchive(f"Unexpected archive entry {info.filename}")
+            files.append(info)
+    if total > MAX_IMPORT_BYTES:
+        raise InvalidArchive("Archive expands beyond the import size limit")
+    return files
+
+
+def _drawingRows(archive: zipfile.ZipFile, storedFiles: dict):
+    try:
+        entry = archive.open(DRAWINGS_ENTRY)
+    except KeyError:
+        raise InvalidArchive(f"Archive has no {DRAWINGS_ENTRY}")
+    with entry, io.TextIOWrapper(entry, encoding="utf-8") as lines:
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+                stored = storedFiles.get(row.get("file"))
+                filePath = stored.fileUrl if stored else str(row["filePath"])
+                if stored is None and uploads.resolveUploadPath(filePath):
+                    # only files shipped in the archive may be referenced;
+                    # a bare hash must not grant access to someone's upload.
+                    # An upload the export had no copy of is dropped and
+                    # the drawing kept without a file
+                    filePath = ""
+                createdAt = row.get("createdAt")
+                yield {
+                    "name": str(row["name"]),
+                    "filePath": filePath,
+                    "size": stored.size if stored else None,
+                    "width": row.get("width"),
+                    "height": row.get("height"),
+                    "tileStatus": tiles.TILE_STATUS_PENDING
+                    if stored and row.get("width")
+                    else None,
+                    "scale": row.get("scale"),
+                    "createdAt": datetime.fromisoformat(createdAt)
+                    if createdAt
+                    else None,
+                }
+            except (ValueError, KeyError, TypeError, AttributeError):
+                raise InvalidArchive(f"Invalid drawing on line {number}")
+
+
+def _isReferenced(fileUrl: str) -> bool:
+    db = SessionLocal()
+    try:
+        return crud.isFileReferenced(db, fileUrl)
+    finally:
+        db.close()
+
+
+def _discardStored(fileUrls: list[str]) -> None:
+    # content-addressed: another drawing may already use the same file
+    for fileUrl in fileUrls:
+        key = storage.keyForUrl(fileUrl)
+        if key is not None:
+            cleanup.cleanupQueue.enqueue(
+                [key],
+                skipIf=functools.partial(_isReferenced, fileUrl),
+                remove=storage.backend.deleteBlocking,
+            )
+
+
+def importProjectArchive(
+    source, ownerId: int, name: str | None = None
+) -> ImportResult:
+    """Create a project from an export archive.
+
+    Blocking. `source` is a seekable file, such as the spooled upload.
+    Files are streamed into static/uploads and the storage backend first
+    (content-addressed, so re-imports share them); the project and every drawing row are then
+    inserted in one transaction while drawings.jsonl is read line by line.
+    """
+    try:
+        archive = zipfile.ZipFile(source)
+    except zipfile.BadZipFile:
+        raise InvalidArchive("Not a ZIP archive")
+    with archive:
+        meta = _readProject(archive)
+        members = _checkMembers(archive)
+        storedFiles = {}
+        try:
+            for info in members:
+                try:
+                    stored = storeEntry(archive, info, uploads.MAX_UPLOAD_BYTES)
+                except (uploads.UploadTooLarge, uploads.UnsupportedFileType) as e:
+                    raise InvalidArchive(f"{info.filename}: {e}")
+                storedFiles[info.filename] = stored
+                storage.backend.putBlocking(stored.fileName, stored.path)
+
+            db = SessionLocal()
+            try:
+                project, count = crud.importProject(
+                    db,
+                    ownerId=ownerId,
+                    name=name or str(meta.get("name") or "Imported project"),
+                    drawingsIn=_drawingRows(archive, storedFiles),
+                    batchSize=IMPORT_BATCH_SIZE,
+                )
+            finally:
+                db.close()
+        except BaseException:
+            _discardStored([stored.fileUrl for stored in storedFiles.values()])
+            raise
+    return ImportResult(project=project, drawings=count, files=len(storedFiles))
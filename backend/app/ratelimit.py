@@ -0,0 +1,226 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import compile_path
+
+RATE_LIMITS_ENABLED = os.environ.get("RATE_LIMITS_ENABLED", "1").lower() not in (
+    "0",
+    "false",
+    "no",
+)
+# buckets kept per route class and key kind; the least recently used are
+# dropped first, which only ever makes a client's budget full again
+RATE_LIMIT_MAX_KEYS = int(os.environ.get("RATE_LIMIT_MAX_KEYS", 100_000))
+# the client address comes from X-Forwarded-For only behind a trusted proxy
+RATE_LIMIT_TRUST_FORWARDED = os.environ.get(
+    "RATE_LIMIT_TRUST_FORWARDED", ""
+).lower() in ("1", "true", "yes")
+
+
+class RateLimited(RuntimeError):
+    def __init__(self, message: str, retryAfter: int):
+        super().__init__(message)
+        self.retryAfter = retryAfter
+
+
+class Overloaded(RuntimeError):
+    def __init__(self, message: str, retryAfter: int = 1):
+        super().__init__(message)
+        self.retryAfter = retryAfter
+
+
+class TokenBuckets:
+    """Token buckets keyed by client: `ratePerMinute` refill, `burst` deep."""
+
+    def __init__(self, ratePerMinute: float, burst: int, maxKeys: int):
+        self.rate = ratePerMinute / 60.0
+        self.burst = burst
+        self.maxKeys = maxKeys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str) -> float:
+        """Spend one token; returns 0, or the seconds until one is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updatedAt = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updatedAt) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.maxKeys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class RouteClass:
+    """Admission control for one class of expensive routes.
+
+    A request must get a token from its client IP's bucket and, when
+    authenticated, from its user's bucket, then a concurrency slot. A
+    limit of 0 turns that check off.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ipPerMinute: float,
+        userPerMinute: float,
+        burst: int,
+        concurrency: int,
+        maxKeys: int = RATE_LIMIT_MAX_KEYS,
+    ):
+        self.name = name
+        self.concurrency = concurrency
+        self._byIp = TokenBuckets(ipPerMinute, burst, maxKeys) if ipPerMinute else None
+        self._byUser = (
+            TokenBuckets(userPerMinute, burst, maxKeys) if userPerMinute else None
+        )
+        self._lock = threading.Lock()
+        self.inflight = 0
+        self.admitted = 0
+        self.limitedIp = 0
+        self.limitedUser = 0
+        self.rejectedBusy = 0
+
+    def _check(self, buckets: TokenBuckets | None, key) -> float:
+        if buckets is None or key is None:
+            return 0.0
+        return buckets.take(str(key))
+
+    @contextmanager
+    def admit(self, clientIp: str | None, userId: int | None):
+        wait = self._check(self._byIp, clientIp)
+        if wait:
+            with self._lock:
+                self.limitedIp += 1
+            raise RateLimited("Too many requests", math.ceil(wait))
+        wait = self._check(self._byUser, userId)
+        if wait:
+            with self._lock:
+                self.limitedUser += 1
+            raise RateLimited("Too many requests", math.ceil(wait))
+        with self._lock:
+            if self.concurrency and self.inflight >= self.concurrency:
+                self.rejectedBusy += 1
+                raise Overloaded("Server is busy, retry shortly")
+            self.inflight += 1
+            self.admitted += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.inflight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "inflight": self.inflight,
+            "concurrency": self.concurrency,
+            "admitted": self.admitted,
+            "limitedIp": self.limitedIp,
+            "limitedUser": self.limitedUser,
+            "rejectedBusy": self.rejectedBusy,
+            "trackedIps": len(self._byIp) if self._byIp else 0,
+            "trackedUsers": len(self._byUser) if self._byUser else 0,
+        }
+
+
+def _routeClass(
+    name: str, ipPerMinute: int, userPerMinute: int, burst: int, concurrency: int
+) -> RouteClass:
+    # RATE_LIMIT_<NAME>_IP_PER_MINUTE, ..._USER_PER_MINUTE, ..._BURST and
+    # ..._CONCURRENCY override the defaults
+    prefix = f"RATE_LIMIT_{name.upper()}_"
+    return RouteClass(
+        name,
+        ipPerMinute=float(os.environ.get(prefix + "IP_PER_MINUTE", ipPerMinute)),
+        userPerMinute=float(os.environ.get(prefix + "USER_PER_MINUTE", userPerMinute)),
+        burst=int(os.environ.get(prefix + "BURST", burst)),
+        concurrency=int(os.environ.get(prefix + "CONCURRENCY", concurrency)),
+    )
+
+
+# auth: login and registration, each an Argon2 hash; per IP only since
+# there is no user yet
+# upload: single and bulk uploads and completing a resumable upload
+# chunk: resumable upload chunks, many per file
+ROUTE_CLASSES = {
+    "auth": _routeClass("auth", 20, 0, 10, 32),
+    "upload": _routeClass("upload", 120, 60, 30, 16),
+    "chunk": _routeClass("chunk", 1200, 600, 200, 64),
+}
+
+
+def clientIp(headers, client) -> str | None:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return client.host if client else None
+
+
+class AdmissionMiddleware:
+    """Admission control for routes whose request body FastAPI parses.
+
+    A form or JSON body is received (uploads spooled to disk) before any
+    route dependency runs, so these routes are admitted here instead,
+    before the receive channel is read. `routes` maps (method, path
+    template) to a route class name; `userKey` turns a bearer token into
+    the user bucket key, or None.
+    """
+
+    def __init__(self, app, routes: dict[tuple[str, str], str], userKey):
+        self.app = app
+        self.userKey = userKey
+        self._routes = [
+            (method, compile_path(path)[0], ROUTE_CLASSES[name])
+            for (method, path), name in routes.items()
+        ]
+
+    def _routeClass(self, scope) -> RouteClass | None:
+        for method, pattern, routeClass in self._routes:
+            if scope["method"] == method and pattern.match(scope["path"]):
+                return routeClass
+        return None
+
+    async def __call__(self, scope, receive, send):
+        routeClass = None
+        if scope["type"] == "http" and RATE_LIMITS_ENABLED:
+            routeClass = self._routeClass(scope)
+        if routeClass is None:
+            await self.app(scope, receive, send)
+            return
+        # headers and client only; the body is left unread
+        request = Request(scope)
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        userId = self.userKey(token) if scheme.lower() == "bearer" else None
+        with ExitStack() as stack:
+            try:
+                stack.enter_context(
+                    routeClass.admit(clientIp(request.headers, request.client), userId)
+                )
+            except (RateLimited, Overloaded) as exc:
+                response = JSONResponse(
+                    {"detail": str(exc)},
+                    status_code=429 if isinstance(exc, RateLimited) else 503,
+                    headers={"Retry-After": str(exc.retryAfter)},
+                )
+                await response(scope, receive, send)
+                return
+            await self.app(scope, receive, send)
+
+
+def stats() -> dict[str, dict]:
+    return {name: routeClass.stats() for name, routeClass in ROUTE_CLASSES.items()}
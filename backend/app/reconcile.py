@@ -0,0 +1,207 @@
+import argparse
+import heapq
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Iterator
+
+from sqlalchemy import select
+
+from . import migrations, models, uploads
+from .database import Base, SessionLocal, engine
+
+logger = logging.getLogger("e_eye.reconcile")
+
+RECONCILE_ACTIONS = ("report", "quarantine", "delete")
+RECONCILE_ACTION = os.environ.get("RECONCILE_ACTION", "quarantine")
+# files younger than this may belong to an upload whose row is not yet
+# committed, so they are never treated as orphans
+RECONCILE_GRACE_SECONDS = int(os.environ.get("RECONCILE_GRACE_SECONDS", 86400))
+# 0 disables the background pass; the CLI works either way
+RECONCILE_INTERVAL_SECONDS = int(os.environ.get("RECONCILE_INTERVAL_SECONDS", 0))
+# directory entries held in memory before a sorted run is spilled to disk
+RECONCILE_SORT_BUFFER = int(os.environ.get("RECONCILE_SORT_BUFFER", 100_000))
+QUARANTINE_DIR = Path(
+    os.environ.get(
+        "QUARANTINE_DIR", os.path.join(os.path.dirname(__file__), "..", "quarantine")
+    )
+).resolve()
+
+MISSING_SAMPLE_LIMIT = 100
+
+
+@dataclass
+class ReconcileReport:
+    action: str
+    scanned: int = 0
+    referenced: int = 0
+    orphans: int = 0
+    orphanBytes: int = 0
+    skippedRecent: int = 0
+    reclaimedBytes: int = 0
+    failed: int = 0
+    missing: int = 0
+    missingSamples: list[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+
+def _spillRun(entries: list[tuple[str, int, float]]) -> str:
+    entries.sort()
+    fd, path = tempfile.mkstemp(prefix="reconcile-", suffix=".run")
+    with os.fdopen(fd, "w", encoding="utf-8") as out:
+        for entry in entries:
+            out.write(json.dumps(entry) + "\n")
+    return path
+
+
+def _readRun(path: str) -> Iterator[tuple[str, int, float]]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            name, size, mtime = json.loads(line)
+            yield name, size, mtime
+
+
+def iterStoredFiles(
+    directory: Path, bufferSize: int = RECONCILE_SORT_BUFFER
+) -> Iterator[tuple[str, int, float]]:
+    """Yield (name, size, mtime) for files in directory, sorted by name.
+
+    Memory stays bounded by bufferSize: larger listings are sorted in
+    runs spilled to temp files and merged back lazily.
+    """
+    runs: list[str] = []
+    buffer: list[tuple[str, int, float]] = []
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                st = entry.stat(follow_symlinks=False)
+                buffer.append((entry.name, st.st_size, st.st_mtime))
+                if len(buffer) >= bufferSize:
+                    runs.append(_spillRun(buffer))
+                    buffer = []
+    except FileNotFoundError:
+        pass
+
+    try:
+        if not runs:
+            yield from sorted(buffer)
+            return
+        if buffer:
+            runs.append(_spillRun(buffer))
+            buffer = []
+        yield from heapq.merge(*[_readRun(run) for run in runs])
+    finally:
+        for run in runs:
+            os.remove(run)
+
+
+def iterReferencedNames(db) -> Iterator[str]:
+    # ordered by the filePath index; every path shares the same prefix,
+    # so this is also the order of the bare file names
+    prefix = uploads.UPLOADS_URL_PREFIX
+    stmt = (
+        select(models.Drawing.filePath)
+        .where(models.Drawing.filePath.startswith(prefix, autoescape=True))
+        .distinct()
+        .order_by(models.Drawing.filePath)
+        .execution_options(yield_per=1000)
+    )
+    for filePath in db.scalars(stmt):
+        path = uploads.resolveUploadPath(filePath)
+        if path is not None:
+            yield path.name
+
+
+def _dispose(path: Path, action: str) -> None:
+    if action == "delete":
+        os.remove(path)
+    elif action == "quarantine":
+        QUARANTINE_DIR.mkdir(parents=True, exist_ok=True)
+        shutil.move(path, QUARANTINE_DIR / path.name)
+
+
+def reconcileUploads(
+    action: str = RECONCILE_ACTION,
+    graceSeconds: int = RECONCILE_GRACE_SECONDS,
+    bufferSize: int = RECONCILE_SORT_BUFFER,
+) -> ReconcileReport:
+    """Diff static/uploads against drawings.filePath in one merge pass.
+
+    Orphans older than graceSeconds are quarantined, deleted, or only
+    counted (action="report"). Referenced files missing from disk are
+    counted and logged. Blocking.
+    """
+    if action not in RECONCILE_ACTIONS:
+        raise ValueError(f"action must be one of {', '.join(RECONCILE_ACTIONS)}")
+    report = ReconcileReport(action=action)
+    started = time.monotonic()
+    cutoff = time.time() - graceSeconds
+
+    db = SessionLocal()
+    try:
+        files = iterStoredFiles(uploads.UPLOADS_DIR, bufferSize)
+        names = iterReferencedNames(db)
+        stored = next(files, None)
+        referenced = next(names, None)
+        while stored is not None or referenced is not None:
+            if referenced is None or (stored is not None and stored[0] < referenced):
+                name, size, mtime = stored
+                report.scanned += 1
+                if mtime > cutoff:
+                    report.skippedRecent += 1
+                else:
+                    report.orphans += 1
+                    report.orphanBytes += size
+                    if action != "report":
+                        try:
+                            _dispose(uploads.UPLOADS_DIR / name, action)
+                            report.reclaimedBytes += size
+                        except OSError:
+                            report.failed += 1
+                            logger.exception("could not %s orphan %s", action, name)
+                stored = next(files, None)
+            elif stored is None or referenced < stored[0]:
+                report.missing += 1
+                if len(report.missingSamples) < MISSING_SAMPLE_LIMIT:
+                    report.missingSamples.append(referenced)
+                logger.warning("referenced upload is missing: %s", referenced)
+                referenced = next(names, None)
+            else:
+                report.scanned += 1
+                report.referenced += 1
+                stored = next(files, None)
+                referenced = next(names, None)
+    finally:
+        db.close()
+
+    report.seconds = round(time.monotonic() - started, 3)
+    return report
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.reconcile",
+        description="Find uploads no drawing references and referenced "
+        "uploads that are missing.",
+    )
+    parser.add_argument("--action", choices=RECONCILE_ACTIONS, default="report")
+    parser.add_argument("--grace-seconds", type=int, default=RECONCILE_GRACE_SECONDS)
+    parser.add_argument("--buffer", type=int, default=RECONCILE_SORT_BUFFER)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    Base.metadata.create_all(bind=engine)
+    migrations.upgradeSchema(engine)
+    report = reconcileUploads(args.action, args.grace_seconds, args.buffer)
+    print(json.dumps(asdict(report), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import os
+import shutil
+from collections.abc import AsyncIterator
+from datetime import datetime, UTC
+from pathlib import Path
+
+from fastapi.concurrency import run_in_threadpool
+
+from . import crud, uploads
+from .database import SessionLocal
+
+# partial chunks live outside static/ so they are never publicly served
+SESSIONS_DIR = Path(
+    os.environ.get(
+        "UPLOAD_SESSIONS_DIR",
+        os.path.join(os.path.dirname(__file__), "..", "partial_uploads"),
+    )
+).resolve()
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+# bounds the chunk count, and with it the work to list or assemble chunks;
+# only the last chunk of an upload may be smaller
+MIN_CHUNK_SIZE = int(os.environ.get("MIN_UPLOAD_CHUNK_BYTES", 1024 * 1024))
+MAX_CHUNK_SIZE = int(os.environ.get("MAX_UPLOAD_CHUNK_BYTES", 64 * 1024 * 1024))
+UPLOAD_SESSION_TTL_SECONDS = int(os.environ.get("UPLOAD_SESSION_TTL_SECONDS", 86400))
+UPLOAD_GC_INTERVAL_SECONDS = int(os.environ.get("UPLOAD_GC_INTERVAL_SECONDS", 900))
+
+_PART_SUFFIX = ".part"
+
+
+class ChunkSizeMismatch(ValueError):
+    pass
+
+
+class IncompleteUpload(ValueError):
+    pass
+
+
+def chunkCount(totalSize: int, chunkSize: int) -> int:
+    return -(-totalSize // chunkSize)
+
+
+def clampChunkSize(requested: int | None) -> int:
+    return max(MIN_CHUNK_SIZE, min(requested or DEFAULT_CHUNK_SIZE, MAX_CHUNK_SIZE))
+
+
+def isExpired(expiresAt: datetime, now: datetime | None = None) -> bool:
+    # SQLite hands back naive datetimes, which are UTC here
+    if expiresAt.tzinfo is None:
+        expiresAt = expiresAt.replace(tzinfo=UTC)
+    return expiresAt <= (now or datetime.now(UTC))
+
+
+def expectedChunkSize(totalSize: int, chunkSize: int, index: int) -> int:
+    return min(chunkSize, totalSize - index * chunkSize)
+
+
+def sessionDir(uploadId: str) -> Path:
+    return SESSIONS_DIR / uploadId
+
+
+def createSessionDir(uploadId: str) -> None:
+    sessionDir(uploadId).mkdir(parents=True, exist_ok=True)
+
+
+def removeSessionDir(uploadId: str) -> None:
+    shutil.rmtree(sessionDir(uploadId), ignore_errors=True)
+
+
+def receivedChunks(uploadId: str) -> list[int]:
+    # a chunk only gets its final name once fully written, so presence
+    # of "<index>.part" means the whole chunk arrived
+    try:
+        names = os.listdir(sessionDir(uploadId))
+    except FileNotFoundError:
+        return []
+    received = []
+    for name in names:
+        stem, suffix = os.path.splitext(name)
+        if suffix == _PART_SUFFIX and stem.isdigit():
+            received.append(int(stem))
+    received.sort()
+    return received
+
+
+async def saveChunk(
+    uploadId: str, index: int, body: AsyncIterator[bytes], expectedSize: int
+) -> None:
+    directory = sessionDir(uploadId)
+    if not await run_in_threadpool(directory.is_dir):
+        raise FileNotFoundError(uploadId)
+
+    # write under a per-request temp name so parallel retries of the
+    # same chunk cannot interleave
+    tmpPath = directory / f"{index}.{os.urandom(8).hex()}.tmp"
+    out = await run_in_threadpool(open, tmpPath, "wb")
+    size = 0
+    try:
+        async for data in body:
+            size += len(data)
+            if size > expectedSize:
+                raise ChunkSizeMismatch("Chunk larger than expected")
+            await run_in_threadpool(out.write, data)
+        await run_in_threadpool(out.close)
+        if size != expectedSize:
+            raise ChunkSizeMismatch(
+                f"Chunk {index} must be {expectedSize} bytes, got {size}"
+            )
+        await run_in_threadpool(
+            os.replace, tmpPath, directory / f"{index}{_PART_SUFFIX}"
+        )
+    except BaseException:
+        out.close()
+        try:
+            await run_in_threadpool(os.remove, tmpPath)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def checkComplete(uploadId: str, count: int) -> None:
+    directory = sessionDir(uploadId)
+    missing = [
+        i for i in range(count) if not (directory / f"{i}{_PART_SUFFIX}").exists()
+    ]
+    if missing:
+        raise IncompleteUpload(f"Missing chunks: {missing[:20]}")
+
+
+def assembleChunks(
+    uploadId: str, count: int, maxBytes: int = uploads.MAX_UPLOAD_BYTES
+) -> uploads.StoredUpload:
+    """Concatenate received chunks into static/uploads (blocking)."""
+    directory = sessionDir(uploadId)
+    checkComplete(uploadId, count)
+
+    writer = uploads.UploadWriter(maxBytes)
+    try:
+        for i in range(count):
+            with open(directory / f"{i}{_PART_SUFFIX}", "rb") as part:
+                while data := part.read(uploads.UPLOAD_CHUNK_SIZE):
+                    writer.write(data)
+        return writer.commit()
+    except BaseException:
+        writer.discard()
+        raise
+
+
+def purgeExpiredSessions() -> int:
+    """Drop expired sessions, orphaned chunk directories and temp files."""
+    db = SessionLocal()
+    try:
+        expired = crud.deleteExpiredUploadSessions(db, datetime.now(UTC))
+    finally:
+        db.close()
+    for uploadId in expired:
+        removeSessionDir(uploadId)
+
+    # directories left behind by a crash between commit and rmtree
+    cutoff = datetime.now(UTC).timestamp() - UPLOAD_SESSION_TTL_SECONDS
+    removed = len(expired)
+    try:
+        entries = list(os.scandir(SESSIONS_DIR))
+    except FileNotFoundError:
+        entries = []
+    for entry in entries:
+        try:
+            if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed + uploads.purgeStaleTempFiles(cutoff)
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Literal
 
 from pydantic import BaseModel, EmailStr, ConfigDict, Field
 
@@ -45,6 +46,12 @@ class ProjectOut(ProjectBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class ProjectImportOut(BaseModel):
+    project: ProjectOut
+    drawings: int
+    files: int
+
+
 class DrawingBase(BaseModel):
     name: str
 
@@ -62,7 +69,86 @@ class DrawingOut(DrawingBase):
     filePath: str
     width: int | None = None
     height: int | None = None
+    tileSize: int | None = None
+    tileLevels: int | None = None
+    tileFormat: str | None = None
+    tileStatus: str | None = None
     scale: str | None = None
     createdAt: datetime
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class SearchHitOut(BaseModel):
+    kind: Literal["project", "drawing"]
+    id: int
+    projectId: int
+    name: str
+    score: float
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class DrawingBatchError(BaseModel):
+    index: int
+    errors: list[dict]
+
+
+class DrawingBatchOut(BaseModel):
+    created: list[DrawingOut]
+    errors: list[DrawingBatchError]
+
+
+class BulkUploadError(BaseModel):
+    fileName: str
+    detail: str
+
+
+class BulkUploadOut(BaseModel):
+    created: list[DrawingOut]
+    errors: list[BulkUploadError]
+
+
+class BulkUploadProgressOut(BaseModel):
+    total: int
+    processed: int
+    failed: int
+    done: bool
+
+
+class TileLevelOut(BaseModel):
+    level: int
+    width: int
+    height: int
+    columns: int
+    rows: int
+
+
+class TilePyramidOut(BaseModel):
+    drawingId: int
+    status: str | None = None
+    width: int
+    height: int
+    tileSize: int
+    overlap: int
+    format: str
+    maxLevel: int
+    levels: list[TileLevelOut]
+
+
+class UploadSessionCreate(BaseModel):
+    name: str | None = None
+    fileName: str | None = None
+    totalSize: int = Field(gt=0)
+    chunkSize: int | None = Field(default=None, gt=0)
+
+
+class UploadSessionOut(BaseModel):
+    uploadId: str
+    projectId: int
+    totalSize: int
+    chunkSize: int
+    chunkCount: int
+    receivedChunks: list[int]
+    receivedBytes: int
+    expiresAt: datetime
@@ -0,0 +1,209 @@
+import logging
+import os
+import re
+
+from sqlalchemy import and_, func, literal, select, text, union_all
+from sqlalchemy.exc import OperationalError
+
+from . import models
+from .database import IS_SQLITE
+
+logger = logging.getLogger("e_eye")
+
+SEARCH_MAX_QUERY_LENGTH = int(os.environ.get("SEARCH_MAX_QUERY_LENGTH", 200))
+SEARCH_MAX_TERMS = int(os.environ.get("SEARCH_MAX_TERMS", 8))
+# ranked results are paged by offset, which gets slower the deeper it goes
+SEARCH_MAX_RESULTS = int(os.environ.get("SEARCH_MAX_RESULTS", 1000))
+
+# one FTS5 row per project and drawing. The rowid encodes both the kind and
+# the id (projects even, drawings odd) so the triggers delete by rowid, and
+# the owner is an indexed token so owner scoping is part of the MATCH
+# instead of a filter over every user's hits.
+_DDL = [
+    """
+    CREATE VIRTUAL TABLE search_index USING fts5(
+        name,
+        scope,
+        projectId UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    INSERT INTO search_index (rowid, name, scope, projectId)
+    SELECT id * 2, name, 'o' || ownerId, id FROM projects
+    """,
+    """
+    INSERT INTO search_index (rowid, name, scope, projectId)
+    SELECT d.id * 2 + 1, d.name, 'o' || p.ownerId, d.projectId
+    FROM drawings d JOIN projects p ON p.id = d.projectId
+    """,
+]
+
+_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS search_projects_ai AFTER INSERT ON projects
+    BEGIN
+        INSERT INTO search_index (rowid, name, scope, projectId)
+        VALUES (NEW.id * 2, NEW.name, 'o' || NEW.ownerId, NEW.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_projects_au
+    AFTER UPDATE OF name, ownerId ON projects
+    BEGIN
+        UPDATE search_index SET name = NEW.name, scope = 'o' || NEW.ownerId
+        WHERE rowid = NEW.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_projects_ad AFTER DELETE ON projects
+    BEGIN
+        DELETE FROM search_index WHERE rowid = OLD.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_drawings_ai AFTER INSERT ON drawings
+    BEGIN
+        INSERT INTO search_index (rowid, name, scope, projectId)
+        SELECT NEW.id * 2 + 1, NEW.name, 'o' || ownerId, NEW.projectId
+        FROM projects WHERE id = NEW.projectId;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_drawings_au
+    AFTER UPDATE OF name, projectId ON drawings
+    BEGIN
+        DELETE FROM search_index WHERE rowid = OLD.id * 2 + 1;
+        INSERT INTO search_index (rowid, name, scope, projectId)
+        SELECT NEW.id * 2 + 1, NEW.name, 'o' || ownerId, NEW.projectId
+        FROM projects WHERE id = NEW.projectId;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_drawings_ad AFTER DELETE ON drawings
+    BEGIN
+        DELETE FROM search_index WHERE rowid = OLD.id * 2 + 1;
+    END
+    """,
+]
+
+# bm25 weights per indexed column: only name matches count for ranking
+_RANK = "bm25(search_index, 1.0, 0.0)"
+_FTS_QUERY = f"""
+    SELECT
+        CASE rowid % 2 WHEN 0 THEN 'project' ELSE 'drawing' END AS kind,
+        rowid / 2 AS id,
+        projectId,
+        name,
+        -{_RANK} AS score
+    FROM search_index
+    WHERE search_index MATCH :match {{kindFilter}}
+    ORDER BY {_RANK}, rowid
+    LIMIT :limit OFFSET :offset
+"""
+_KIND_FILTERS = {
+    None: "",
+    "project": "AND rowid % 2 = 0",
+    "drawing": "AND rowid % 2 = 1",
+}
+
+# same notion of a word as the unicode61 tokenizer: letters and digits
+_TERM = re.compile(r"[^\W_]+")
+
+_ftsEnabled = False
+
+
+class InvalidSearchQuery(ValueError):
+    pass
+
+
+def installSearchIndex(engine) -> bool:
+    """Create the FTS5 index and its triggers, backfilling a new index.
+
+    Returns False where FTS5 is unavailable; search then falls back to a
+    LIKE scan.
+    """
+    global _ftsEnabled
+    if not IS_SQLITE:
+        return False
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE name = 'search_index'")
+            ).first()
+            if exists is None:
+                for statement in _DDL:
+                    conn.execute(text(statement))
+            for statement in _TRIGGERS:
+                conn.execute(text(statement))
+    except OperationalError as e:
+        logger.warning("full-text search unavailable, using LIKE: %s", e)
+        return False
+    _ftsEnabled = True
+    return True
+
+
+def parseTerms(q: str) -> list[str]:
+    if len(q) > SEARCH_MAX_QUERY_LENGTH:
+        raise InvalidSearchQuery(
+            f"Search query is longer than {SEARCH_MAX_QUERY_LENGTH} characters"
+        )
+    terms = list(dict.fromkeys(t.lower() for t in _TERM.findall(q)))
+    if not terms:
+        raise InvalidSearchQuery("Search query must contain a letter or digit")
+    return terms[:SEARCH_MAX_TERMS]
+
+
+def matchExpression(ownerId: int, terms: list[str]) -> str:
+    # every term is a quoted prefix, so user input is never FTS5 syntax
+    prefixes = " ".join(f'"{term}"*' for term in terms)
+    return f'scope : "o{int(ownerId)}" AND name : ({prefixes})'
+
+
+def searchStatement(
+    ownerId: int, terms: list[str], kind: str | None, limit: int, offset: int
+):
+    """Hits as (kind, id, projectId, name, score) rows, best first."""
+    if _ftsEnabled:
+        return text(_FTS_QUERY.format(kindFilter=_KIND_FILTERS[kind])).bindparams(
+            match=matchExpression(ownerId, terms), limit=limit, offset=offset
+        )
+    return _likeStatement(ownerId, terms, kind, limit, offset)
+
+
+def _likeStatement(ownerId, terms, kind, limit, offset):
+    # no ranking without the index: substring matches in name order
+    def matches(column):
+        return and_(*[func.lower(column).contains(term) for term in terms])
+
+    parts = []
+    if kind in (None, "project"):
+        parts.append(
+            select(
+                literal("project").label("kind"),
+                models.Project.id,
+                models.Project.id.label("projectId"),
+                models.Project.name,
+                literal(0.0).label("score"),
+            ).where(models.Project.ownerId == ownerId, matches(models.Project.name))
+        )
+    if kind in (None, "drawing"):
+        parts.append(
+            select(
+                literal("drawing").label("kind"),
+                models.Drawing.id,
+                models.Drawing.projectId,
+                models.Drawing.name,
+                literal(0.0).label("score"),
+            )
+            .join(models.Project, models.Drawing.projectId == models.Project.id)
+            .where(models.Project.ownerId == ownerId, matches(models.Drawing.name))
+        )
+    combined = union_all(*parts).subquery()
+    return (
+        select(combined)
+        .order_by(combined.c.name, combined.c.kind, combined.c.id)
+        .limit(limit)
+        .offset(offset)
+    )
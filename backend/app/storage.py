@@ -0,0 +1,494 @@
+import hashlib
+import hmac
+import os
+import threading
+from datetime import UTC, datetime
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+import anyio
+import httpx
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, PlainTextResponse
+from fastapi.responses import RedirectResponse
+
+from . import uploads
+
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "local").lower()
+
+S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL", "https://s3.amazonaws.com")
+S3_BUCKET = os.environ.get("S3_BUCKET", "")
+S3_REGION = os.environ.get("S3_REGION", "us-east-1")
+S3_ACCESS_KEY_ID = os.environ.get("S3_ACCESS_KEY_ID", "")
+S3_SECRET_ACCESS_KEY = os.environ.get("S3_SECRET_ACCESS_KEY", "")
+S3_PREFIX = os.environ.get("S3_PREFIX", "uploads/")
+# path-style (endpoint/bucket/key) works with MinIO and other stand-ins
+S3_PATH_STYLE = os.environ.get("S3_PATH_STYLE", "1").lower() in ("1", "true", "yes")
+S3_MAX_CONNECTIONS = int(os.environ.get("S3_MAX_CONNECTIONS", 32))
+S3_TIMEOUT_SECONDS = float(os.environ.get("S3_TIMEOUT_SECONDS", 60))
+PRESIGN_EXPIRES_SECONDS = int(os.environ.get("PRESIGN_EXPIRES_SECONDS", 900))
+# downloads of remote objects redirect to a presigned URL instead of being
+# proxied through an API worker
+STORAGE_REDIRECT_DOWNLOADS = os.environ.get(
+    "STORAGE_REDIRECT_DOWNLOADS", "1"
+).lower() in ("1", "true", "yes")
+
+STREAM_CHUNK_SIZE = uploads.UPLOAD_CHUNK_SIZE
+_UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+_EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+
+
+class StorageError(RuntimeError):
+    pass
+
+
+def keyForUrl(fileUrl: str | None) -> str | None:
+    # storage keys are the content-addressed names under /static/uploads/
+    path = uploads.resolveUploadPath(fileUrl)
+    return path.name if path is not None else None
+
+
+def _removeFile(path: Path) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class LocalStorage:
+    """Blobs as files in static/uploads on this node's disk; the default."""
+
+    remote = False
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def localPath(self, key: str) -> Path:
+        return self.root / key
+
+    async def put(self, key: str, source: Path) -> None:
+        await run_in_threadpool(self.putBlocking, key, source)
+
+    def putBlocking(self, key: str, source: Path) -> None:
+        # UploadWriter already commits into the root
+        dest = self.localPath(key)
+        if Path(source) != dest:
+            _copyInto(Path(source), dest)
+
+    async def size(self, key: str) -> int | None:
+        try:
+            return (await anyio.Path(self.localPath(key)).stat()).st_size
+        except FileNotFoundError:
+            return None
+
+    async def exists(self, key: str) -> bool:
+        return await self.size(key) is not None
+
+    async def stream(self, key: str, start: int = 0, end: int | None = None):
+        """Bytes start..end inclusive (end=None reads to the end of the blob)."""
+        remaining = None if end is None else end - start + 1
+        async with await anyio.open_file(self.localPath(key), "rb") as f:
+            await f.seek(start)
+            while remaining is None or remaining > 0:
+                size = STREAM_CHUNK_SIZE
+                if remaining is not None:
+                    size = min(size, remaining)
+                chunk = await f.read(size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    async def delete(self, key: str) -> None:
+        await run_in_threadpool(self.deleteBlocking, key)
+
+    def deleteBlocking(self, key: str) -> None:
+        _removeFile(self.localPath(key))
+
+    async def localCopy(self, key: str) -> Path | None:
+        path = self.localPath(key)
+        return path if await anyio.Path(path).is_file() else None
+
+    def localCopyBlocking(self, key: str) -> Path | None:
+        path = self.localPath(key)
+        return path if path.is_file() else None
+
+    def presignedUrl(self, key: str, expiresIn: int = PRESIGN_EXPIRES_SECONDS):
+        return None
+
+    async def close(self) -> None:
+        pass
+
+
+def _copyInto(source: Path, dest: Path) -> None:
+    # via a temp file, so readers never see a partial blob
+    fd, tmpPath = uploads.openTempFile("copy-")
+    try:
+        with os.fdopen(fd, "wb") as out, open(source, "rb") as src:
+            while chunk := src.read(STREAM_CHUNK_SIZE):
+                out.write(chunk)
+        os.replace(tmpPath, dest)
+    except BaseException:
+        _removeFile(Path(tmpPath))
+        raise
+
+
+def _hmac(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode("utf-8"), hashlib.sha256).digest()
+
+
+def _uriEncode(value: str, safe: str = "") -> str:
+    return quote(value, safe="-_.~" + safe)
+
+
+class S3Storage:
+    """S3-compatible object storage, signed with SigV4 over pooled clients.
+
+    static/uploads becomes a node-local cache: uploads are still written
+    there first (the content hash is the key), pushed to the bucket, and
+    fetched back on demand when tiles, previews or exports need the file
+    on disk. Request handlers use a shared AsyncClient; worker threads
+    (cleanup queue, exports) a shared blocking Client.
+    """
+
+    remote = True
+
+    def __init__(
+        self,
+        endpointUrl: str,
+        bucket: str,
+        region: str,
+        accessKeyId: str,
+        secretAccessKey: str,
+        prefix: str = "",
+        pathStyle: bool = True,
+        cacheDir: Path = uploads.UPLOADS_DIR,
+        maxConnections: int = S3_MAX_CONNECTIONS,
+        timeout: float = S3_TIMEOUT_SECONDS,
+    ):
+        if not bucket:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires S3_BUCKET")
+        endpoint = urlsplit(endpointUrl.rstrip("/"))
+        self.scheme = endpoint.scheme
+        self.host = endpoint.netloc
+        if pathStyle:
+            self.basePath = f"{endpoint.path}/{bucket}"
+        else:
+            self.host = f"{bucket}.{self.host}"
+            self.basePath = endpoint.path
+        # the Host header is sent without a default port and signed as sent
+        for default in (":80", ":443"):
+            if self.host.endswith(default):
+                self.host = self.host[: -len(default)]
+        self.bucket = bucket
+        self.region = region
+        self.accessKeyId = accessKeyId
+        self.secretAccessKey = secretAccessKey
+        self.prefix = prefix
+        self.cacheDir = cacheDir
+        self._limits = httpx.Limits(max_connections=maxConnections)
+        self._timeout = timeout
+        self._asyncClient: httpx.AsyncClient | None = None
+        self._syncClient: httpx.Client | None = None
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return _uriEncode(f"{self.basePath}/{self.prefix}{key}", safe="/")
+
+    def _url(self, key: str) -> str:
+        return f"{self.scheme}://{self.host}{self._path(key)}"
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._asyncClient is None:
+            self._asyncClient = httpx.AsyncClient(
+                limits=self._limits, timeout=self._timeout
+            )
+        return self._asyncClient
+
+    def _blockingClient(self) -> httpx.Client:
+        with self._lock:
+            if self._syncClient is None:
+                self._syncClient = httpx.Client(
+                    limits=self._limits, timeout=self._timeout
+                )
+            return self._syncClient
+
+    def _scope(self, now: datetime) -> str:
+        return f"{now:%Y%m%d}/{self.region}/s3/aws4_request"
+
+    def _signature(self, now: datetime, canonicalRequest: str) -> str:
+        stringToSign = "\n".join(
+            [
+                "AWS4-HMAC-SHA256",
+                f"{now:%Y%m%dT%H%M%SZ}",
+                self._scope(now),
+                hashlib.sha256(canonicalRequest.encode("utf-8")).hexdigest(),
+            ]
+        )
+        key = _hmac(f"AWS4{self.secretAccessKey}".encode("utf-8"), f"{now:%Y%m%d}")
+        for part in (self.region, "s3", "aws4_request"):
+            key = _hmac(key, part)
+        return hmac.new(
+            key, stringToSign.encode("utf-8"), hashlib.sha256
+        ).hexdigest()
+
+    def signHeaders(
+        self,
+        method: str,
+        key: str,
+        headers: dict[str, str] | None = None,
+        payloadHash: str = _UNSIGNED_PAYLOAD,
+        now: datetime | None = None,
+    ) -> dict[str, str]:
+        """Request headers including a SigV4 Authorization header."""
+        now = now or datetime.now(UTC)
+        signed = {k.lower(): str(v).strip() for k, v in (headers or {}).items()}
+        signed["host"] = self.host
+        signed["x-amz-content-sha256"] = payloadHash
+        signed["x-amz-date"] = f"{now:%Y%m%dT%H%M%SZ}"
+        names = sorted(signed)
+        canonicalRequest = "\n".join(
+            [
+                method,
+                self._path(key),
+                "",
+                "".join(f"{name}:{signed[name]}\n" for name in names),
+                ";".join(names),
+                payloadHash,
+            ]
+        )
+        signed["authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self.accessKeyId}/{self._scope(now)}, "
+            f"SignedHeaders={';'.join(names)}, "
+            f"Signature={self._signature(now, canonicalRequest)}"
+        )
+        # httpx sets Host itself, from the same URL
+        del signed["host"]
+        return signed
+
+    def presignedUrl(
+        self,
+        key: str,
+        expiresIn: int = PRESIGN_EXPIRES_SECONDS,
+        now: datetime | None = None,
+    ) -> str:
+        now = now or datetime.now(UTC)
+        query = {
+            "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+            "X-Amz-Credential": f"{self.accessKeyId}/{self._scope(now)}",
+            "X-Amz-Date": f"{now:%Y%m%dT%H%M%SZ}",
+            "X-Amz-Expires": str(expiresIn),
+            "X-Amz-SignedHeaders": "host",
+        }
+        canonicalQuery = "&".join(
+            f"{_uriEncode(k)}={_uriEncode(v)}" for k, v in sorted(query.items())
+        )
+        canonicalRequest = "\n".join(
+            [
+                "GET",
+                self._path(key),
+                canonicalQuery,
+                f"host:{self.host}\n",
+                "host",
+                _UNSIGNED_PAYLOAD,
+            ]
+        )
+        signature = self._signature(now, canonicalRequest)
+        return f"{self._url(key)}?{canonicalQuery}&X-Amz-Signature={signature}"
+
+    @staticmethod
+    def _check(response: httpx.Response, *allowed: int) -> None:
+        if response.status_code not in (200, 204, 206, *allowed):
+            raise StorageError(
+                f"{response.request.method} {response.request.url.path} "
+                f"failed with {response.status_code}"
+            )
+
+    async def put(self, key: str, source: Path) -> None:
+        # content-addressed: an existing object already has these bytes
+        if await self.exists(key):
+            return
+        size = (await anyio.Path(source).stat()).st_size
+
+        async def body():
+            async with await anyio.open_file(source, "rb") as f:
+                while chunk := await f.read(STREAM_CHUNK_SIZE):
+                    yield chunk
+
+        headers = self.signHeaders("PUT", key, {"content-length": str(size)})
+        response = await self._client().put(
+            self._url(key), content=body(), headers=headers
+        )
+        self._check(response)
+
+    def putBlocking(self, key: str, source: Path) -> None:
+        client = self._blockingClient()
+        response = client.head(self._url(key), headers=self.signHeaders("HEAD", key))
+        if response.status_code == 200:
+            return
+        if response.status_code != 404:
+            self._check(response)
+
+        def body():
+            with open(source, "rb") as f:
+                while chunk := f.read(STREAM_CHUNK_SIZE):
+                    yield chunk
+
+        size = os.path.getsize(source)
+        headers = self.signHeaders("PUT", key, {"content-length": str(size)})
+        self._check(client.put(self._url(key), content=body(), headers=headers))
+
+    async def size(self, key: str) -> int | None:
+        response = await self._client().head(
+            self._url(key), headers=self.signHeaders("HEAD", key)
+        )
+        if response.status_code == 404:
+            return None
+        self._check(response)
+        return int(response.headers["content-length"])
+
+    async def exists(self, key: str) -> bool:
+        return await self.size(key) is not None
+
+    async def stream(self, key: str, start: int = 0, end: int | None = None):
+        """Bytes start..end inclusive (end=None reads to the end of the blob)."""
+        extra = {}
+        if start or end is not None:
+            extra["range"] = f"bytes={start}-{'' if end is None else end}"
+        headers = self.signHeaders("GET", key, extra)
+        async with self._client().stream("GET", self._url(key), headers=headers) as r:
+            if r.status_code == 404:
+                raise FileNotFoundError(key)
+            self._check(r)
+            async for chunk in r.aiter_bytes(STREAM_CHUNK_SIZE):
+                yield chunk
+
+    async def delete(self, key: str) -> None:
+        response = await self._client().delete(
+            self._url(key), headers=self.signHeaders("DELETE", key)
+        )
+        self._check(response, 404)
+        await run_in_threadpool(_removeFile, self.cacheDir / key)
+
+    def deleteBlocking(self, key: str) -> None:
+        response = self._blockingClient().delete(
+            self._url(key), headers=self.signHeaders("DELETE", key)
+        )
+        self._check(response, 404)
+        _removeFile(self.cacheDir / key)
+
+    def localPath(self, key: str) -> Path:
+        # the cache location; it may not be populated
+        return self.cacheDir / key
+
+    async def localCopy(self, key: str) -> Path | None:
+        path = self.cacheDir / key
+        if await anyio.Path(path).is_file():
+            return path
+        fd, tmpPath = await run_in_threadpool(uploads.openTempFile, "fetch-")
+        try:
+            async with await anyio.open_file(fd, "wb") as out:
+                async for chunk in self.stream(key):
+                    await out.write(chunk)
+            await run_in_threadpool(os.replace, tmpPath, path)
+        except FileNotFoundError:
+            await run_in_threadpool(_removeFile, Path(tmpPath))
+            return None
+        except BaseException:
+            await run_in_threadpool(_removeFile, Path(tmpPath))
+            raise
+        return path
+
+    def localCopyBlocking(self, key: str) -> Path | None:
+        path = self.cacheDir / key
+        if path.is_file():
+            return path
+        fd, tmpPath = uploads.openTempFile("fetch-")
+        try:
+            with os.fdopen(fd, "wb") as out, self._blockingClient().stream(
+                "GET", self._url(key), headers=self.signHeaders("GET", key)
+            ) as r:
+                if r.status_code == 404:
+                    raise FileNotFoundError(key)
+                self._check(r)
+                for chunk in r.iter_bytes(STREAM_CHUNK_SIZE):
+                    out.write(chunk)
+            os.replace(tmpPath, path)
+        except FileNotFoundError:
+            _removeFile(Path(tmpPath))
+            return None
+        except BaseException:
+            _removeFile(Path(tmpPath))
+            raise
+        return path
+
+    async def close(self) -> None:
+        if self._asyncClient is not None:
+            await self._asyncClient.aclose()
+            self._asyncClient = None
+        with self._lock:
+            if self._syncClient is not None:
+                self._syncClient.close()
+                self._syncClient = None
+
+
+def presignedRedirect(backend, key: str) -> RedirectResponse:
+    # reusable for a while, but never past the URL's expiry
+    return RedirectResponse(
+        backend.presignedUrl(key),
+        status_code=307,
+        headers={"Cache-Control": f"private, max-age={PRESIGN_EXPIRES_SECONDS // 2}"},
+    )
+
+
+class RemoteUploads:
+    """ASGI app for /static/uploads/<key> when the blobs live in a bucket.
+
+    Redirects to a presigned URL, or with STORAGE_REDIRECT_DOWNLOADS off
+    serves the file from the local cache, fetching it first if needed.
+    """
+
+    def __init__(self, backend, redirect: bool = STORAGE_REDIRECT_DOWNLOADS):
+        self.backend = backend
+        self.redirect = redirect
+
+    async def __call__(self, scope, receive, send):
+        routePath = scope["path"][len(scope.get("root_path", "")) :]
+        fileUrl = uploads.UPLOADS_URL_PREFIX + routePath.lstrip("/")
+        key = keyForUrl(fileUrl)
+        response = PlainTextResponse("Not Found", status_code=404)
+        if key is not None and scope["method"] in ("GET", "HEAD"):
+            if self.redirect:
+                response = presignedRedirect(self.backend, key)
+            else:
+                path = await self.backend.localCopy(key)
+                if path is not None:
+                    cacheControl = (
+                        uploads.IMMUTABLE_CACHE_CONTROL
+                        if uploads.contentHash(fileUrl)
+                        else uploads.STATIC_CACHE_CONTROL
+                    )
+                    response = FileResponse(
+                        path, headers={"Cache-Control": cacheControl}
+                    )
+        await response(scope, receive, send)
+
+
+def createBackend():
+    if STORAGE_BACKEND == "s3":
+        return S3Storage(
+            S3_ENDPOINT_URL,
+            S3_BUCKET,
+            S3_REGION,
+            S3_ACCESS_KEY_ID,
+            S3_SECRET_ACCESS_KEY,
+            prefix=S3_PREFIX,
+            pathStyle=S3_PATH_STYLE,
+        )
+    if STORAGE_BACKEND != "local":
+        raise RuntimeError(f"Unknown STORAGE_BACKEND {STORAGE_BACKEND!r}")
+    return LocalStorage(uploads.UPLOADS_DIR)
+
+
+backend = createBackend()
@@ -0,0 +1,182 @@
+import math
+import multiprocessing
+import os
+import shutil
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+
+from PIL import Image
+
+# tiles are authorized through the API, so they live outside static/
+TILES_DIR = Path(
+    os.environ.get(
+        "TILES_DIR", os.path.join(os.path.dirname(__file__), "..", "tiles")
+    )
+).resolve()
+
+TILE_SIZE = int(os.environ.get("TILE_SIZE", 256))
+TILE_FORMAT = os.environ.get("TILE_FORMAT", "jpg")
+TILE_QUALITY = int(os.environ.get("TILE_QUALITY", 85))
+TILE_WORKERS = int(os.environ.get("TILE_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+
+TILE_STATUS_PENDING = "pending"
+TILE_STATUS_READY = "ready"
+TILE_STATUS_FAILED = "failed"
+
+_PIL_FORMATS = {"jpg": "JPEG", "png": "PNG", "webp": "WEBP"}
+
+_executor: ProcessPoolExecutor | None = None
+
+
+def maxLevel(width: int, height: int) -> int:
+    # DZI numbering: level 0 is 1x1, the highest level is full resolution
+    return max(0, math.ceil(math.log2(max(width, height, 1))))
+
+
+def levelSize(width: int, height: int, level: int, levels: int) -> tuple[int, int]:
+    scale = 2 ** (levels - level)
+    return max(1, -(-width // scale)), max(1, -(-height // scale))
+
+
+def describePyramid(
+    width: int, height: int, tileSize: int, levels: int, tileFormat: str
+) -> dict:
+    levelList = []
+    for level in range(levels + 1):
+        w, h = levelSize(width, height, level, levels)
+        levelList.append(
+            {
+                "level": level,
+                "width": w,
+                "height": h,
+                "columns": -(-w // tileSize),
+                "rows": -(-h // tileSize),
+            }
+        )
+    return {
+        "width": width,
+        "height": height,
+        "tileSize": tileSize,
+        "overlap": 0,
+        "format": tileFormat,
+        "maxLevel": levels,
+        "levels": levelList,
+    }
+
+
+def drawingTilesDir(drawingId: int) -> Path:
+    return TILES_DIR / str(drawingId)
+
+
+def tilePath(drawingId: int, level: int, x: int, y: int, tileFormat: str) -> Path:
+    return drawingTilesDir(drawingId) / str(level) / f"{x}_{y}.{tileFormat}"
+
+
+def removeDrawingTiles(drawingId: int) -> None:
+    shutil.rmtree(drawingTilesDir(drawingId), ignore_errors=True)
+
+
+def generateTilePyramid(
+    sourcePath: str,
+    outDir: str,
+    tileSize: int = TILE_SIZE,
+    tileFormat: str = TILE_FORMAT,
+    quality: int = TILE_QUALITY,
+) -> dict:
+    """Cut a DZI-style pyramid for one image. Runs in a worker process.
+
+    The full-resolution level is tiled first, then the image is halved
+    with a box filter for each lower level, so every pixel is decoded
+    once. Tiles are written to a sibling temp directory that is renamed
+    into place when complete.
+    """
+    pilFormat = _PIL_FORMATS[tileFormat]
+    final = Path(outDir)
+    work = final.with_name(f"{final.name}.tmp-{os.getpid()}")
+    shutil.rmtree(work, ignore_errors=True)
+
+    with Image.open(sourcePath) as src:
+        width, height = src.size
+        img = src.convert("RGB") if pilFormat == "JPEG" else src.convert("RGBA")
+
+    levels = maxLevel(width, height)
+    try:
+        for level in range(levels, -1, -1):
+            levelDir = work / str(level)
+            levelDir.mkdir(parents=True)
+            w, h = img.size
+            for x in range(-(-w // tileSize)):
+                for y in range(-(-h // tileSize)):
+                    box = (
+                        x * tileSize,
+                        y * tileSize,
+                        min((x + 1) * tileSize, w),
+                        min((y + 1) * tileSize, h),
+                    )
+                    img.crop(box).save(
+                        levelDir / f"{x}_{y}.{tileFormat}", pilFormat, quality=quality
+                    )
+            if level:
+                img = img.reduce(2)
+        shutil.rmtree(final, ignore_errors=True)
+        os.replace(work, final)
+    except BaseException:
+        shutil.rmtree(work, ignore_errors=True)
+        raise
+    finally:
+        img.close()
+
+    return {
+        "tileSize": tileSize,
+        "tileLevels": levels,
+        "tileFormat": tileFormat,
+    }
+
+
+def _getExecutor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: forking a threaded server process is not safe
+        _executor = ProcessPoolExecutor(
+            max_workers=TILE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def _recordResult(drawingId: int, future: Future) -> None:
+    from . import crud
+    from .database import SessionLocal
+
+    try:
+        result = future.result()
+        result["tileStatus"] = TILE_STATUS_READY
+    except Exception:
+        result = {"tileStatus": TILE_STATUS_FAILED}
+
+    db = SessionLocal()
+    try:
+        found = crud.setDrawingTiles(db, drawingId=drawingId, tilesIn=result)
+    finally:
+        db.close()
+    if not found:
+        # drawing was deleted while its tiles were being generated
+        removeDrawingTiles(drawingId)
+
+
+def scheduleTilePyramid(drawingId: int, sourcePath: Path) -> Future:
+    TILES_DIR.mkdir(parents=True, exist_ok=True)
+    future = _getExecutor().submit(
+        generateTilePyramid, str(sourcePath), str(drawingTilesDir(drawingId))
+    )
+    future.add_done_callback(lambda f: _recordResult(drawingId, f))
+    return future
+
+
+def shutdown() -> None:
+    # blocking: queued jobs are cancelled and running ones waited for, since
+    # a worker left running when the process exits is never stopped
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
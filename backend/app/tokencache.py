@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+TOKEN_CACHE_TTL_SECONDS = int(os.environ.get("TOKEN_CACHE_TTL_SECONDS", 60))
+TOKEN_CACHE_MAX_ENTRIES = int(os.environ.get("TOKEN_CACHE_MAX_ENTRIES", 10000))
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """The user fields request handlers need, detached from any session."""
+
+    id: int
+    email: str
+    isActive: bool
+    subscriptionLevel: str | None = None
+    role: str | None = None
+
+    @classmethod
+    def fromUser(cls, user) -> "UserSnapshot":
+        return cls(
+            id=user.id,
+            email=user.email,
+            isActive=bool(user.isActive),
+            subscriptionLevel=user.subscriptionLevel,
+            role=user.role,
+        )
+
+
+class TokenCache:
+    """LRU cache of verified tokens, keyed by signature.
+
+    Entries expire after the configured TTL or at the token's own exp,
+    whichever comes first. The signing input is stored and compared on
+    lookup so a signature cannot be replayed with a different payload.
+    """
+
+    def __init__(self, ttlSeconds: int, maxEntries: int):
+        self.ttlSeconds = ttlSeconds
+        self.maxEntries = maxEntries
+        self._entries: OrderedDict[str, tuple[str, UserSnapshot, float]] = (
+            OrderedDict()
+        )
+        self._byUser: dict[int, set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, signature: str, signingInput: str) -> UserSnapshot | None:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(signature)
+            if entry is None:
+                self.misses += 1
+                return None
+            cachedInput, user, expiresAt = entry
+            if expiresAt <= now or cachedInput != signingInput:
+                self._drop(signature)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(signature)
+            self.hits += 1
+            return user
+
+    def put(
+        self, signature: str, signingInput: str, user: UserSnapshot, tokenExp: int
+    ) -> None:
+        if self.maxEntries <= 0:
+            return
+        expiresAt = min(time.time() + self.ttlSeconds, tokenExp)
+        with self._lock:
+            if signature in self._entries:
+                self._drop(signature)
+            self._entries[signature] = (signingInput, user, expiresAt)
+            self._byUser.setdefault(user.id, set()).add(signature)
+            while len(self._entries) > self.maxEntries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def invalidateUser(self, userId: int) -> None:
+        with self._lock:
+            for signature in list(self._byUser.get(userId, ())):
+                self._drop(signature)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._byUser.clear()
+
+    def _drop(self, signature: str) -> None:
+        _input, user, _exp = self._entries.pop(signature)
+        signatures = self._byUser.get(user.id)
+        if signatures is not None:
+            signatures.discard(signature)
+            if not signatures:
+                del self._byUser[user.id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.maxEntries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+tokenCache = TokenCache(TOKEN_CACHE_TTL_SECONDS, TOKEN_CACHE_MAX_ENTRIES)
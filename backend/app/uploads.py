@@ -0,0 +1,225 @@
+import hashlib
+import os
+import re
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.staticfiles import StaticFiles
+from starlette.exceptions import HTTPException
+from PIL import Image
+
+STATIC_DIR = Path(os.path.dirname(__file__), "..", "static").resolve()
+UPLOADS_DIR = STATIC_DIR / "uploads"
+UPLOADS_URL_PREFIX = "/static/uploads/"
+# uploads in progress; outside the served static directory, but it must be
+# on the same filesystem as UPLOADS_DIR so the final rename is atomic
+UPLOAD_TMP_DIR = Path(
+    os.environ.get("UPLOAD_TMP_DIR", STATIC_DIR.parent / "upload_tmp")
+).resolve()
+
+# hard cap on a single upload, overridable for large scanned sheets
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", 512 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# construction sheets routinely exceed PIL's default decompression-bomb limit
+MAX_IMAGE_PIXELS = int(os.environ.get("MAX_IMAGE_PIXELS", 400_000_000))
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+# magic bytes -> file extension
+_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"\xff\xd8\xff", ".jpg"),
+)
+SNIFF_BYTES = max(len(sig) for sig, _ in _SIGNATURES)
+
+# uploads are named by the SHA-256 of their content
+_CONTENT_NAME = re.compile(r"^([0-9a-f]{64})\.[a-z0-9]+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+PRIVATE_IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+# anything else under /static may change in place; revalidate against
+# the ETag/Last-Modified StaticFiles already sends
+STATIC_CACHE_CONTROL = os.environ.get("STATIC_CACHE_CONTROL", "public, no-cache")
+# uploads are only reachable through the authorized file endpoint unless
+# this re-opens the unauthenticated /static/uploads URLs
+PUBLIC_UPLOADS = os.environ.get("PUBLIC_UPLOADS", "").lower() in ("1", "true", "yes")
+# behind nginx, the authorized endpoint can hand the transfer to the proxy
+# with X-Accel-Redirect: <prefix><file name>, for an `internal` location
+# aliased to static/uploads
+FILE_ACCEL_REDIRECT_PREFIX = os.environ.get("FILE_ACCEL_REDIRECT_PREFIX", "")
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class UnsupportedFileType(ValueError):
+    pass
+
+
+@dataclass
+class StoredUpload:
+    fileName: str
+    fileUrl: str
+    path: Path
+    size: int
+    sha256: str
+
+
+def sniffImageType(head: bytes) -> str | None:
+    for signature, ext in _SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    return None
+
+
+def resolveUploadPath(fileUrl: str | None) -> Path | None:
+    # only paths under static/uploads map to files we own
+    if not fileUrl or not fileUrl.startswith(UPLOADS_URL_PREFIX):
+        return None
+    name = fileUrl[len(UPLOADS_URL_PREFIX) :]
+    if not name or "/" in name or "\\" in name or name.startswith("."):
+        return None
+    return UPLOADS_DIR / name
+
+
+def contentHash(fileUrl: str | None) -> str | None:
+    # None for legacy uuid-named uploads and anything outside static/uploads
+    path = resolveUploadPath(fileUrl)
+    if path is None:
+        return None
+    match = _CONTENT_NAME.match(path.name)
+    return match.group(1) if match else None
+
+
+def probeDimensions(path: Path) -> tuple[int | None, int | None]:
+    # Image.open only parses the header; pixel data is never decoded here
+    try:
+        with Image.open(path) as img:
+            return img.size
+    except Exception:
+        return None, None
+
+
+def openTempFile(prefix: str = "upload-") -> tuple[int, str]:
+    UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
+    UPLOAD_TMP_DIR.mkdir(parents=True, exist_ok=True)
+    fd, tmpPath = tempfile.mkstemp(prefix=prefix, suffix=".tmp", dir=UPLOAD_TMP_DIR)
+    # mkstemp creates 0600 files; uploads are served by StaticFiles
+    os.fchmod(fd, 0o644)
+    return fd, tmpPath
+
+
+def purgeStaleTempFiles(cutoff: float) -> int:
+    # temp files left behind by a crash mid-upload
+    removed = 0
+    try:
+        entries = list(os.scandir(UPLOAD_TMP_DIR))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
+
+
+class UploadWriter:
+    """Accumulates an upload in a temp file, then renames it into place.
+
+    Blocking; async callers should drive it through the threadpool.
+    """
+
+    def __init__(self, maxBytes: int = MAX_UPLOAD_BYTES):
+        fd, self._tmpPath = openTempFile()
+        self._out = os.fdopen(fd, "wb")
+        self._maxBytes = maxBytes
+        self._head = b""
+        self._hash = hashlib.sha256()
+        self.ext: str | None = None
+        self.size = 0
+
+    def write(self, chunk: bytes) -> None:
+        if self.ext is None:
+            self._head += chunk[:SNIFF_BYTES]
+            if len(self._head) >= SNIFF_BYTES:
+                self.ext = sniffImageType(self._head)
+                if self.ext is None:
+                    raise UnsupportedFileType("Unsupported file type")
+        self.size += len(chunk)
+        if self.size > self._maxBytes:
+            raise UploadTooLarge("File too large")
+        self._hash.update(chunk)
+        self._out.write(chunk)
+
+    def commit(self) -> StoredUpload:
+        self._out.close()
+        if self.ext is None:
+            raise UnsupportedFileType("Unsupported file type")
+        digest = self._hash.hexdigest()
+        fileName = f"{digest}{self.ext}"
+        destPath = UPLOADS_DIR / fileName
+        # identical content may already be stored; replacing it is harmless
+        # and keeps the blob in place even if its last owner is being deleted
+        os.replace(self._tmpPath, destPath)
+        return StoredUpload(
+            fileName=fileName,
+            fileUrl=f"{UPLOADS_URL_PREFIX}{fileName}",
+            path=destPath,
+            size=self.size,
+            sha256=digest,
+        )
+
+    def discard(self) -> None:
+        self._out.close()
+        try:
+            os.remove(self._tmpPath)
+        except FileNotFoundError:
+            pass
+
+
+async def saveUpload(
+    file: UploadFile, maxBytes: int = MAX_UPLOAD_BYTES
+) -> StoredUpload:
+    """Stream an upload to a temp file and move it into static/uploads.
+
+    At most one chunk is held in memory; the type is decided by magic
+    bytes rather than the client-supplied content type.
+    """
+    writer = await run_in_threadpool(UploadWriter, maxBytes)
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            await run_in_threadpool(writer.write, chunk)
+        return await run_in_threadpool(writer.commit)
+    except BaseException:
+        await run_in_threadpool(writer.discard)
+        raise
+
+
+class UploadStaticFiles(StaticFiles):
+    """StaticFiles that marks content-addressed uploads as immutable.
+
+    Other files are served with STATIC_CACHE_CONTROL. Dotfiles are never
+    served.
+    """
+
+    async def get_response(self, path: str, scope):
+        if any(part.startswith(".") for part in Path(path).parts):
+            raise HTTPException(status_code=404)
+        return await super().get_response(path, scope)
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if _CONTENT_NAME.match(os.path.basename(full_path)):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.headers["Cache-Control"] = STATIC_CACHE_CONTROL
+        return response
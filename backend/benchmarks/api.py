@@ -0,0 +1,393 @@
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+BENCH_PASSWORD = "bench-password"
+ENDPOINTS = ("login", "me", "projects", "drawings", "meDrawings", "upload")
+
+
+def _configureEnvironment(workDir: Path, dbPath: Path) -> dict:
+    # must run before anything under app/ is imported: settings are read
+    # from the environment at import time
+    env = {
+        "DATABASE_URL": f"sqlite:///{dbPath}",
+        "TILES_DIR": str(workDir / "tiles"),
+        "PREVIEW_CACHE_DIR": str(workDir / "preview_cache"),
+        "UPLOAD_SESSIONS_DIR": str(workDir / "partial_uploads"),
+        "UPLOAD_TMP_DIR": str(workDir / "upload_tmp"),
+        "QUARANTINE_DIR": str(workDir / "quarantine"),
+        "SLOW_REQUEST_MS": os.environ.get("SLOW_REQUEST_MS", "1000000"),
+        # a handful of benchmark clients would otherwise measure the limiter
+        "RATE_LIMITS_ENABLED": os.environ.get("RATE_LIMITS_ENABLED", "0"),
+    }
+    os.environ.update(env)
+    sys.path.insert(0, str(BACKEND_DIR))
+    return env
+
+
+def seedDatabase(users: int, projectsPerUser: int, drawingsPerProject: int) -> None:
+    from sqlalchemy import insert
+
+    from app import models
+    from app.database import Base, engine
+    from app.passwords import Hasher
+
+    Base.metadata.create_all(bind=engine)
+    # one hash for every user: Argon2 is what login measures, not seeding
+    hashed = Hasher.hash(BENCH_PASSWORD)
+    now = datetime.now(UTC)
+    batch = 10_000
+
+    with engine.begin() as conn:
+        conn.execute(
+            insert(models.User),
+            [
+                {"id": u + 1, "email": _email(u), "hashedPassword": hashed}
+                for u in range(users)
+            ],
+        )
+        projects = []
+        for u in range(users):
+            for p in range(projectsPerUser):
+                projects.append(
+                    {
+                        "id": u * projectsPerUser + p + 1,
+                        "name": f"Project {p}",
+                        "ownerId": u + 1,
+                        "createdAt": now - timedelta(seconds=p),
+                    }
+                )
+        conn.execute(insert(models.Project), projects)
+
+        drawings = []
+        for project in projects:
+            for d in range(drawingsPerProject):
+                drawings.append(
+                    {
+                        "projectId": project["id"],
+                        "name": f"Sheet {d}",
+                        "filePath": f"/static/uploads/{project['id']:032x}{d:032x}.png",
+                        "width": 8000,
+                        "height": 6000,
+                        "scale": "1:100",
+                        "createdAt": now - timedelta(seconds=d),
+                    }
+                )
+                if len(drawings) >= batch:
+                    conn.execute(insert(models.Drawing), drawings)
+                    drawings = []
+        if drawings:
+            conn.execute(insert(models.Drawing), drawings)
+
+
+def _email(index: int) -> str:
+    return f"bench{index}@example.com"
+
+
+def _png() -> bytes:
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new("RGB", (512, 384), (240, 240, 240)).save(buf, "PNG")
+    return buf.getvalue()
+
+
+def _uploadedPngPath() -> Path:
+    # uploads are content-addressed, so every benchmark upload lands here
+    from app import uploads
+
+    return uploads.UPLOADS_DIR / f"{hashlib.sha256(_png()).hexdigest()}.png"
+
+
+def percentile(sortedValues: list[float], pct: float) -> float:
+    # nearest-rank
+    if not sortedValues:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sortedValues)))
+    return sortedValues[rank - 1]
+
+
+async def _drive(client, requestFn, total: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    statuses: dict[str, int] = {}
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            started = time.perf_counter()
+            response = await requestFn(client, i)
+            latencies.append(time.perf_counter() - started)
+            key = str(response.status_code)
+            statuses[key] = statuses.get(key, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ms = [v * 1000 for v in latencies]
+    errors = sum(n for code, n in statuses.items() if not code.startswith("2"))
+    return {
+        "requests": total,
+        "errors": errors,
+        "statuses": statuses,
+        "seconds": round(elapsed, 4),
+        "throughput": round(total / elapsed, 2) if elapsed else None,
+        "meanMs": round(sum(ms) / len(ms), 3) if ms else None,
+        "p50Ms": round(percentile(ms, 50), 3),
+        "p95Ms": round(percentile(ms, 95), 3),
+        "p99Ms": round(percentile(ms, 99), 3),
+        "maxMs": round(ms[-1], 3) if ms else None,
+    }
+
+
+def _requestFactories(
+    users: int, projectsPerUser: int, tokens: list[str], png: bytes
+):
+    def auth(i):
+        return {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+
+    def projectOf(i):
+        # a project owned by the same user as auth(i)
+        user = i % len(tokens)
+        return user * projectsPerUser + (i // len(tokens)) % projectsPerUser + 1
+
+    return {
+        "login": lambda c, i: c.post(
+            "/auth/login",
+            json={"email": _email(i % users), "password": BENCH_PASSWORD},
+        ),
+        "me": lambda c, i: c.get("/me", headers=auth(i)),
+        "projects": lambda c, i: c.get("/projects", headers=auth(i)),
+        "drawings": lambda c, i: c.get(
+            f"/projects/{projectOf(i)}/drawings", headers=auth(i)
+        ),
+        "meDrawings": lambda c, i: c.get("/me/drawings", headers=auth(i)),
+        "upload": lambda c, i: c.post(
+            f"/projects/{projectOf(i)}/drawings/upload",
+            headers=auth(i),
+            files={"file": ("bench.png", png, "image/png")},
+        ),
+    }
+
+
+async def _login(client, users: int, count: int) -> list[str]:
+    tokens = []
+    for u in range(min(users, count)):
+        response = await client.post(
+            "/auth/login", json={"email": _email(u), "password": BENCH_PASSWORD}
+        )
+        response.raise_for_status()
+        tokens.append(response.json()["accessToken"])
+    return tokens
+
+
+async def runSuite(client, transport: str, args) -> list[dict]:
+    if args.projects < 1:
+        raise SystemExit("--projects must be at least 1")
+    tokens = await _login(client, args.users, args.token_users)
+    factories = _requestFactories(args.users, args.projects, tokens, _png())
+    results = []
+    for endpoint in args.endpoints:
+        for concurrency in args.concurrency:
+            # warm caches and connections before measuring
+            requestFn = factories[endpoint]
+            await _drive(client, requestFn, args.warmup, concurrency)
+            stats = await _drive(client, requestFn, args.requests, concurrency)
+            results.append(
+                {
+                    "transport": transport,
+                    "endpoint": endpoint,
+                    "concurrency": concurrency,
+                    **stats,
+                }
+            )
+            print(
+                f"{transport:9} {endpoint:10} c={concurrency:<4} "
+                f"{stats['throughput']:>9} req/s  p50={stats['p50Ms']}ms "
+                f"p95={stats['p95Ms']}ms p99={stats['p99Ms']}ms "
+                f"errors={stats['errors']}",
+                file=sys.stderr,
+            )
+    return results
+
+
+async def runInProcess(args) -> list[dict]:
+    import httpx
+
+    from app.main import app
+
+    # ASGITransport does not run the lifespan, so drive it here
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench", timeout=60
+        ) as client:
+            return await runSuite(client, "inprocess", args)
+
+
+def _freePort() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def runUvicorn(args, env: dict) -> list[dict]:
+    import httpx
+
+    port = _freePort()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(args.workers),
+            "--log-level",
+            "warning",
+            "--no-access-log",
+        ],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **env},
+    )
+    try:
+        limits = httpx.Limits(max_connections=max(args.concurrency))
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", timeout=60, limits=limits
+        ) as client:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() > deadline or server.poll() is not None:
+                    raise RuntimeError("uvicorn did not start")
+                await asyncio.sleep(0.2)
+            return await runSuite(client, "uvicorn", args)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def _gitRevision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def _csvInts(value: str) -> list[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def _csvEndpoints(value: str) -> list[str]:
+    endpoints = [v for v in value.split(",") if v]
+    unknown = set(endpoints).difference(ENDPOINTS)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown endpoints: {', '.join(unknown)}")
+    return endpoints
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.api",
+        description="Seed a throwaway SQLite DB and benchmark the API hot paths.",
+    )
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--projects", type=int, default=20, help="per user")
+    parser.add_argument("--drawings", type=int, default=50, help="per project")
+    parser.add_argument(
+        "--requests", type=int, default=500, help="per endpoint and level"
+    )
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--concurrency", type=_csvInts, default=[1, 8, 32])
+    parser.add_argument("--endpoints", type=_csvEndpoints, default=list(ENDPOINTS))
+    parser.add_argument(
+        "--token-users", type=int, default=10, help="distinct users for authed calls"
+    )
+    parser.add_argument(
+        "--transport", choices=("inprocess", "uvicorn", "both"), default="inprocess"
+    )
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    # a straggling background write must not lose the report at cleanup
+    with tempfile.TemporaryDirectory(
+        prefix="e_eye_bench_", ignore_cleanup_errors=True
+    ) as tmp:
+        workDir = Path(tmp)
+        env = _configureEnvironment(workDir, workDir / "bench.db")
+        seedStarted = time.perf_counter()
+        seedDatabase(args.users, args.projects, args.drawings)
+        seedSeconds = time.perf_counter() - seedStarted
+
+        from app.database import DB_MODE
+
+        uploaded = _uploadedPngPath()
+        keepUpload = uploaded.exists()
+        results = []
+        try:
+            if args.transport in ("inprocess", "both"):
+                results += asyncio.run(runInProcess(args))
+            if args.transport in ("uvicorn", "both"):
+                results += asyncio.run(runUvicorn(args, env))
+        finally:
+            # static/ is not configurable; don't leave the benchmark image
+            if not keepUpload:
+                uploaded.unlink(missing_ok=True)
+
+        # written before the work directory goes away
+        report = {
+            "meta": {
+                "startedAt": datetime.now(UTC).isoformat(),
+                "revision": _gitRevision(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "dbMode": DB_MODE,
+                "seed": {
+                    "users": args.users,
+                    "projectsPerUser": args.projects,
+                    "drawingsPerProject": args.drawings,
+                    "seconds": round(seedSeconds, 2),
+                },
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+            },
+            "results": results,
+        }
+        text = json.dumps(report, indent=2)
+        if args.output:
+            Path(args.output).write_text(text + "\n")
+        else:
+            print(text)
+
+
+if __name__ == "__main__":
+    main()
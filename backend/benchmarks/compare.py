@@ -0,0 +1,51 @@
+import argparse
+import json
+from pathlib import Path
+
+
+def _index(report: dict) -> dict:
+    return {
+        (r["transport"], r["endpoint"], r["concurrency"]): r for r in report["results"]
+    }
+
+
+def _change(before: float | None, after: float | None) -> str:
+    if not before or after is None:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.compare",
+        description="Compare two benchmarks.api JSON reports.",
+    )
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args(argv)
+
+    before = json.loads(Path(args.before).read_text())
+    after = json.loads(Path(args.after).read_text())
+    print(
+        f"before {before['meta'].get('revision')}  after {after['meta'].get('revision')}"
+    )
+    header = ("transport", "endpoint", "c", "req/s", "p50", "p95", "p99")
+    print("{:10} {:11} {:>4} {:>9} {:>9} {:>9} {:>9}".format(*header))
+    afterRows = _index(after)
+    for key, old in _index(before).items():
+        new = afterRows.get(key)
+        if new is None:
+            continue
+        print(
+            "{:10} {:11} {:>4} {:>9} {:>9} {:>9} {:>9}".format(
+                *key,
+                _change(old["throughput"], new["throughput"]),
+                _change(old["p50Ms"], new["p50Ms"]),
+                _change(old["p95Ms"], new["p95Ms"]),
+                _change(old["p99Ms"], new["p99Ms"]),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from .api import _configureEnvironment, _email, BENCH_PASSWORD, seedDatabase
+
+
+def _time(fn, repeat: int) -> tuple[float, object]:
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000, result
+
+
+def compareSerializers(limit: int, repeat: int) -> dict:
+    """Time one drawings page through both paths, inside the process."""
+    from pydantic import TypeAdapter
+
+    from app import crud, fastjson, schemas
+    from app.database import SessionLocal
+
+    adapter = TypeAdapter(list[schemas.DrawingOut])
+    columns = list(schemas.DrawingOut.model_fields)
+    db = SessionLocal()
+    try:
+        queryOrm, drawings = _time(
+            lambda: crud.pageDrawingsByProject(db, projectId=1, limit=limit), repeat
+        )
+        queryRows, rows = _time(
+            lambda: crud.pageDrawingsByProject(
+                db, projectId=1, limit=limit, columns=columns
+            ),
+            repeat,
+        )
+    finally:
+        db.close()
+    drawings, rows = drawings[:limit], rows[:limit]
+
+    # what FastAPI does with response_model: validate, then dump_json
+    encodeOrm, ormBody = _time(
+        lambda: adapter.dump_json(adapter.validate_python(drawings)), repeat
+    )
+    encodeRows, fastBody = _time(
+        lambda: fastjson.dumps(fastjson.rowsToDicts(rows, columns)), repeat
+    )
+    if ormBody != fastBody:
+        raise SystemExit("fast path output differs from response_model output")
+    return {
+        "rows": len(rows),
+        "bytes": len(fastBody),
+        "encoder": "orjson" if fastjson.orjson is not None else "json",
+        "responseModel": {"queryMs": queryOrm, "encodeMs": encodeOrm},
+        "fastJson": {"queryMs": queryRows, "encodeMs": encodeRows},
+        "speedup": round((queryOrm + encodeOrm) / (queryRows + encodeRows), 2),
+    }
+
+
+async def compareEndpoints(limit: int, requests: int) -> dict:
+    """Median latency of the list endpoints with FAST_JSON off and on."""
+    import httpx
+
+    from app import fastjson
+    from app.main import app
+
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            login = await client.post(
+                "/auth/login", json={"email": _email(0), "password": BENCH_PASSWORD}
+            )
+            headers = {"Authorization": f"Bearer {login.json()['accessToken']}"}
+            for url in (
+                f"/projects?limit={limit}",
+                f"/projects/1/drawings?limit={limit}",
+                f"/me/drawings?limit={limit}",
+            ):
+                bodies = {}
+                for enabled in (False, True):
+                    fastjson.FAST_JSON = enabled
+                    samples = []
+                    for _ in range(requests):
+                        started = time.perf_counter()
+                        response = await client.get(url, headers=headers)
+                        samples.append(time.perf_counter() - started)
+                    bodies[enabled] = response.content
+                    key = "fastJsonMs" if enabled else "responseModelMs"
+                    results.setdefault(url, {})[key] = round(
+                        statistics.median(samples) * 1000, 3
+                    )
+                results[url]["identical"] = bodies[False] == bodies[True]
+                results[url]["speedup"] = round(
+                    results[url]["responseModelMs"] / results[url]["fastJsonMs"], 2
+                )
+    return results
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.serialization",
+        description="Compare response_model serialization with the FAST_JSON path.",
+    )
+    parser.add_argument("--projects", type=int, default=200, help="for user 0")
+    parser.add_argument("--drawings", type=int, default=200, help="per project")
+    parser.add_argument("--limit", type=int, default=200, help="page size")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="e_eye_bench_") as tmp:
+        workDir = Path(tmp)
+        _configureEnvironment(workDir, workDir / "bench.db")
+        seedDatabase(1, args.projects, args.drawings)
+        report = {
+            "serializer": compareSerializers(args.limit, args.repeat),
+            "endpoints": asyncio.run(compareEndpoints(args.limit, args.repeat)),
+        }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    print(text, file=sys.stderr if args.output else sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
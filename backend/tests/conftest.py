@@ -0,0 +1,60 @@
+import io
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+TEST_PASSWORD = "test-password"
+
+# must run before anything under app/ is imported: settings are read from
+# the environment at import time
+WORK_DIR = Path(tempfile.mkdtemp(prefix="e_eye_test_"))
+os.environ.update(
+    {
+        "DATABASE_URL": f"sqlite:///{WORK_DIR / 'test.db'}",
+        "TILES_DIR": str(WORK_DIR / "tiles"),
+        "PREVIEW_CACHE_DIR": str(WORK_DIR / "preview_cache"),
+        "UPLOAD_SESSIONS_DIR": str(WORK_DIR / "partial_uploads"),
+        "UPLOAD_TMP_DIR": str(WORK_DIR / "upload_tmp"),
+        "QUARANTINE_DIR": str(WORK_DIR / "quarantine"),
+        "RATE_LIMITS_ENABLED": "0",
+    }
+)
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    with TestClient(app) as testClient:
+        yield testClient
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def authHeaders(client, request):
+    email = f"{request.node.name}@example.com"
+    client.post("/users", json={"email": email, "password": TEST_PASSWORD})
+    response = client.post(
+        "/auth/login", json={"email": email, "password": TEST_PASSWORD}
+    )
+    return {"Authorization": f"Bearer {response.json()['accessToken']}"}
+
+
+@pytest.fixture
+def makePng():
+    from PIL import Image
+
+    def make(width: int = 32, height: int = 16) -> bytes:
+        buffer = io.BytesIO()
+        Image.new("RGB", (width, height), (200, 10, 10)).save(buffer, "PNG")
+        return buffer.getvalue()
+
+    return make
@@ -0,0 +1,78 @@
+import io
+import zipfile
+
+
+def _exportProject(client, headers, projectId: int) -> bytes:
+    response = client.get(f"/projects/{projectId}/export", headers=headers)
+    assert response.status_code == 200
+    return response.content
+
+
+def test_roundTripKeepsDrawingWithMissingUpload(client, authHeaders, makePng):
+    from app import storage
+
+    project = client.post(
+        "/projects/create", json={"name": "Missing upload"}, headers=authHeaders
+    ).json()
+    drawing = client.post(
+        f"/projects/{project['id']}/drawings/upload",
+        headers=authHeaders,
+        files={"file": ("sheet.png", makePng(40, 20), "image/png")},
+    ).json()
+    # the upload is gone but its drawing row is still there
+    storage.backend.deleteBlocking(storage.keyForUrl(drawing["filePath"]))
+
+    archive = _exportProject(client, authHeaders, project["id"])
+    response = client.post(
+        "/projects/import",
+        headers=authHeaders,
+        files={"file": ("project.zip", archive, "application/zip")},
+    )
+
+    assert response.status_code == 201
+    assert response.json()["drawings"] == 1
+    assert response.json()["files"] == 0
+    imported = response.json()["project"]["id"]
+    drawings = client.get(
+        f"/projects/{imported}/drawings", headers=authHeaders
+    ).json()
+    assert [(d["name"], d["filePath"]) for d in drawings] == [("sheet.png", "")]
+    fileResponse = client.get(
+        f"/drawings/{drawings[0]['id']}/file", headers=authHeaders
+    )
+    assert fileResponse.status_code == 404
+
+
+def test_importDoesNotReferenceUploadsMissingFromArchive(
+    client, authHeaders, makePng
+):
+    project = client.post(
+        "/projects/create", json={"name": "Source"}, headers=authHeaders
+    ).json()
+    client.post(
+        f"/projects/{project['id']}/drawings/upload",
+        headers=authHeaders,
+        files={"file": ("sheet.png", makePng(), "image/png")},
+    )
+    archive = _exportProject(client, authHeaders, project["id"])
+
+    # drop the shipped file but keep the row naming its hash
+    trimmed = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(archive)) as source, zipfile.ZipFile(
+        trimmed, "w"
+    ) as dest:
+        for info in source.infolist():
+            if not info.filename.startswith("files/"):
+                dest.writestr(info, source.read(info))
+    response = client.post(
+        "/projects/import",
+        headers=authHeaders,
+        files={"file": ("project.zip", trimmed.getvalue(), "application/zip")},
+    )
+
+    assert response.status_code == 201
+    imported = response.json()["project"]["id"]
+    drawings = client.get(
+        f"/projects/{imported}/drawings", headers=authHeaders
+    ).json()
+    assert drawings[0]["filePath"] == ""
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from app import ratelimit
+
+UPLOAD_PATH = "/projects/1/drawings/upload"
+
+
+@pytest.fixture
+def uploadClass(monkeypatch):
+    routeClass = ratelimit.RouteClass(
+        "upload", ipPerMinute=0, userPerMinute=60, burst=1, concurrency=1
+    )
+    monkeypatch.setattr(ratelimit, "RATE_LIMITS_ENABLED", True)
+    monkeypatch.setitem(ratelimit.ROUTE_CLASSES, "upload", routeClass)
+    return routeClass
+
+
+def _middleware(calls: list):
+    async def inner(scope, receive, send):
+        calls.append(await receive())
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    return ratelimit.AdmissionMiddleware(
+        inner,
+        routes={("POST", "/projects/{projectId}/drawings/upload"): "upload"},
+        userKey={"token-a": 1, "token-b": 2}.get,
+    )
+
+
+def _call(middleware, path: str, token: str) -> tuple[int, dict, int]:
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": path,
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+        "client": ("127.0.0.1", 1234),
+    }
+    received = []
+    sent = []
+
+    async def receive():
+        received.append(True)
+        return {"type": "http.request", "body": b"multipart", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    headers = {k.decode(): v.decode() for k, v in sent[0].get("headers", [])}
+    return sent[0]["status"], headers, len(received)
+
+
+def test_limitedUploadIsRejectedBeforeItsBodyIsRead(uploadClass):
+    calls = []
+    middleware = _middleware(calls)
+
+    assert _call(middleware, UPLOAD_PATH, "token-a")[0] == 200
+    status, headers, received = _call(middleware, UPLOAD_PATH, "token-a")
+
+    assert status == 429
+    assert int(headers["retry-after"]) >= 1
+    assert received == 0
+    assert len(calls) == 1
+    # the bucket is per user, taken from the bearer token
+    assert _call(middleware, UPLOAD_PATH, "token-b")[0] == 200
+    assert uploadClass.limitedUser == 1
+
+
+def test_busyUploadIsRejectedBeforeItsBodyIsRead(uploadClass):
+    middleware = _middleware([])
+
+    with uploadClass.admit("10.0.0.1", None):
+        status, headers, received = _call(middleware, UPLOAD_PATH, "token-a")
+
+    assert (status, received) == (503, 0)
+    assert "retry-after" in headers
+    assert uploadClass.inflight == 0
+
+
+def test_unlistedRoutesPassThrough(uploadClass):
+    calls = []
+    middleware = _middleware(calls)
+
+    for _ in range(3):
+        status, _, received = _call(middleware, "/projects/1/drawings", "token-a")
+        assert (status, received) == (200, 1)
+    assert uploadClass.admitted == 0